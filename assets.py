@@ -0,0 +1,240 @@
+"""
+Process-Wide Asset Registry
+
+Loads each texture once per process and hands out the same Texture
+object to every caller afterwards, along with cached left-right flipped
+copies and cached directory listings (so "does this frame exist" checks
+do not touch the disk again). Level transitions therefore do no asset
+I/O once the first level has loaded.
+
+When a window exists, pack_atlas() adds every loaded texture to the
+window's texture atlas up front instead of on first draw.
+
+After use_atlas() is given a packed atlas image (see level_bundle.py),
+textures for the images it holds are cut from that one image, which
+is decoded once, instead of loading each file.
+
+preload() decodes a batch of image files (e.g. everything a level
+needs) on a pool of threads; PNG decompression releases the GIL, so
+they decode in parallel. The decoded pixels are kept and turned into
+textures on the calling thread when they are first asked for, and
+texture_manager() hands out tile texture caches that already hold the
+decoded tileset images. Decode times are recorded per file.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import arcade
+import PIL.Image
+from arcade.texture import ImageData
+
+# Threads used to decode images in parallel
+DECODE_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def decode_image(path):
+    """
+    Open and fully decode an image file to RGBA, and hash its pixels
+    the way arcade does. Runs on a decode thread.
+    Returns (image, hash, milliseconds).
+    """
+    start = time.perf_counter()
+    image = PIL.Image.open(path)
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    else:
+        image.load()
+    image_hash = ImageData.calculate_hash(image)
+    return image, image_hash, (time.perf_counter() - start) * 1000
+
+
+class AssetRegistry:
+    """
+    Cache of textures, flipped textures and directory listings,
+    keyed by absolute path.
+    """
+
+    def __init__(self):
+        """
+        Create an empty registry.
+        """
+        self.textures = {}
+        self.flipped = {}
+        self.listings = {}
+        self.load_count = 0
+        self.load_ms = 0
+        # Packed atlas image, absolute image path -> (x, y, width,
+        # height) inside it, and the cache holding the decoded atlas
+        self.atlas_path = None
+        self.atlas_regions = {}
+        self.atlas_cache = None
+        # Absolute image path -> ImageData decoded by preload(), and
+        # how long each took to decode (milliseconds, on its thread)
+        self.images = {}
+        self.decode_times = {}
+        # Summary of the most recent preload()
+        self.last_preload = None
+
+    def use_atlas(self, atlas_path, regions):
+        """
+        Cut textures for the given images from a packed atlas image
+        from now on. Textures already loaded are kept.
+        """
+        atlas_path = os.path.abspath(atlas_path)
+        if atlas_path == self.atlas_path:
+            return
+        self.atlas_path = atlas_path
+        self.atlas_regions = {os.path.abspath(path): region
+                              for path, region in regions.items()}
+        self.atlas_cache = self.texture_manager()
+
+    def preload(self, paths, workers=DECODE_WORKERS):
+        """
+        Decode every given image file that is not loaded yet, in
+        parallel. Returns a summary dict: files decoded, workers, wall
+        milliseconds and the sum of the per-file decode times.
+        """
+        start = time.perf_counter()
+        wanted = []
+        for path in paths:
+            path = os.path.abspath(path)
+            if (path in self.images or path in self.textures or
+                    path in self.atlas_regions or path in wanted):
+                continue
+            wanted.append(path)
+
+        if wanted:
+            with ThreadPoolExecutor(
+                    max_workers=max(1, min(workers, len(wanted))),
+                    thread_name_prefix="asset-decode") as executor:
+                futures = [(path, executor.submit(decode_image, path))
+                           for path in wanted]
+                # Results are taken in submission order, so the images
+                # are stored the same way however the threads ran
+                for path, future in futures:
+                    try:
+                        image, image_hash, decode_ms = future.result()
+                    except OSError as error:
+                        print(f"Warning: could not decode {path}: {error}")
+                        continue
+                    self.images[path] = ImageData(image, hash=image_hash)
+                    self.decode_times[path] = decode_ms
+
+        self.last_preload = {
+            "files": len(wanted),
+            "workers": min(workers, len(wanted)),
+            "wall_ms": (time.perf_counter() - start) * 1000,
+            "decode_ms": sum(self.decode_times.get(path, 0)
+                             for path in wanted),
+        }
+        return self.last_preload
+
+    def decode_report(self):
+        """
+        Return (path, milliseconds) for every image decoded by
+        preload(), slowest first.
+        """
+        return sorted(self.decode_times.items(), key=lambda item: -item[1])
+
+    def image(self, path):
+        """
+        Return the RGBA PIL image of a file, decoded by preload() or
+        now.
+        """
+        image_data = self.images.get(os.path.abspath(path))
+        if image_data is not None:
+            return image_data.image
+        return PIL.Image.open(path).convert("RGBA")
+
+    def texture_manager(self):
+        """
+        Return a new arcade.TextureCacheManager whose image cache
+        already holds every image decoded by preload(), so cutting
+        tile textures from those images decodes nothing.
+        """
+        manager = arcade.TextureCacheManager()
+        for path, image_data in list(self.images.items()):
+            manager.image_data_cache.put(
+                arcade.Texture.create_image_cache_name(
+                    str(arcade.resources.resolve(path))), image_data)
+        return manager
+
+    def listdir(self, directory):
+        """
+        Return the (cached) file names in a directory, in os.listdir
+        order, or an empty list if it does not exist.
+        """
+        directory = os.path.abspath(directory)
+        names = self.listings.get(directory)
+        if names is None:
+            try:
+                names = os.listdir(directory)
+            except FileNotFoundError:
+                names = []
+            self.listings[directory] = names
+        return names
+
+    def exists(self, path):
+        """
+        Return True if a file exists, using the cached listing of its
+        directory.
+        """
+        directory, name = os.path.split(os.path.abspath(path))
+        return name in self.listdir(directory)
+
+    def texture(self, path):
+        """
+        Return the texture for an image file, loading it on first use.
+        """
+        path = os.path.abspath(path)
+        texture = self.textures.get(path)
+        if texture is None:
+            start = time.perf_counter()
+            region = self.atlas_regions.get(path)
+            image_data = self.images.get(path)
+            if region is not None:
+                x, y, width, height = region
+                texture = self.atlas_cache.load_or_get_texture(
+                    self.atlas_path, x=x, y=y, width=width, height=height)
+            elif image_data is not None:
+                # Decoded ahead of time by preload()
+                texture = arcade.Texture(image_data)
+                texture.file_path = path
+            else:
+                texture = arcade.load_texture(path)
+            self.load_ms += (time.perf_counter() - start) * 1000
+            self.load_count += 1
+            self.textures[path] = texture
+        return texture
+
+    def texture_flipped(self, path):
+        """
+        Return the left-right flipped texture for an image file.
+        """
+        path = os.path.abspath(path)
+        texture = self.flipped.get(path)
+        if texture is None:
+            texture = self.texture(path).flip_left_right()
+            self.flipped[path] = texture
+        return texture
+
+    def texture_pair(self, path):
+        """
+        Return (right, left) facing textures for an image file.
+        """
+        return self.texture(path), self.texture_flipped(path)
+
+    def pack_atlas(self, atlas):
+        """
+        Add every loaded texture (and flipped copy) to a texture atlas.
+        Textures already in the atlas are skipped by the atlas itself.
+        """
+        for texture in list(self.textures.values()) + list(
+                self.flipped.values()):
+            atlas.add(texture)
+
+
+# The registry shared by the whole process
+ASSETS = AssetRegistry()
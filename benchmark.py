@@ -0,0 +1,337 @@
+"""
+Benchmark Suite
+
+Measures, for each level:
+- tile map load time, with a cold and a warm level cache
+- Player construction time
+- setup_enemies() time
+- steady-state update (GameWorld.step) frame times, p50/p99
+- draw (GameView.on_draw) frame times, p50/p99, when a window can be
+  opened
+- peak Python memory while loading and simulating the level
+
+Update and draw frames replay the same seeded input script (see
+replay.py), so runs are comparable between commits. Results are written
+as JSON and compared against a stored baseline.
+
+Command line:
+    python benchmark.py                       run, compare to baseline
+    python benchmark.py --levels 3 --steps 600
+    python benchmark.py --save-baseline       store results as baseline
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import arcade
+
+import game
+from level_cache import load_level, load_level_data
+from replay import KEY_PRESS, record_script
+
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(GAME_DIR, "benchmark_baseline.json")
+RESULTS_PATH = os.path.join(GAME_DIR, "benchmark_results.json")
+
+LEVELS = (1, 2, 3)
+STEPS = 1200
+WARMUP_STEPS = 60
+REPEATS = 5
+SCRIPT_SEED = 7
+
+# A metric more than this much slower than the baseline is a regression
+REGRESSION_THRESHOLD = 0.10
+# Single-sample metrics that are reported but too noisy to flag
+NOISY_METRICS = ("first_ms", "max_ms")
+
+
+def percentile(samples, fraction):
+    """
+    Return the nearest-rank percentile of a list of samples.
+    """
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1,
+                       round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def frame_summary(samples):
+    """
+    Summarise frame times (in ms) as p50, p99, mean and max.
+    """
+    return {
+        "p50_ms": percentile(samples, 0.50),
+        "p99_ms": percentile(samples, 0.99),
+        "mean_ms": statistics.fmean(samples),
+        "max_ms": max(samples),
+    }
+
+
+def timed(function, repeats=REPEATS):
+    """
+    Call a function several times and return the first and median
+    durations in milliseconds.
+    """
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return {"first_ms": durations[0],
+            "median_ms": statistics.median(durations)}
+
+
+def new_world(level):
+    """
+    Return a set-up GameWorld for a level, with its load logging
+    silenced.
+    """
+    world = game.GameWorld(level)
+    with contextlib.redirect_stdout(io.StringIO()):
+        world.setup()
+    return world
+
+
+def feed_events(world, events):
+    """
+    Apply one recorded step's key events to a world.
+    """
+    for kind, key in events:
+        if kind == KEY_PRESS:
+            world.key_press(key)
+        else:
+            world.key_release(key)
+
+
+def bench_load(level):
+    """
+    Time loading a level's tile map with a cold and a warm cache.
+    The cache is kept in a temporary directory so the game's own
+    .level_cache is left alone.
+    """
+    map_path = os.path.join(GAME_DIR, f"Level{level}.tmx")
+
+    def load(cache_dir):
+        level_data = load_level_data(map_path, cache_dir)
+        return load_level(map_path, scaling=game.TILE_SCALING,
+                          layer_options=game.LAYER_OPTIONS,
+                          skip_layers=game.LOAD_SKIPPED_LAYERS,
+                          level_data=level_data)[1]
+
+    # The first load starts from an empty cache and fills it
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = load(cache_dir)
+        warm = [load(cache_dir) for _ in range(REPEATS)]
+    return {
+        "cold_ms": cold["total_ms"],
+        "warm_ms": statistics.median(stats["total_ms"] for stats in warm),
+        "warm_read_ms": statistics.median(
+            stats["read_ms"] for stats in warm),
+    }
+
+
+def bench_update(level, log):
+    """
+    Time GameWorld.step over a replayed input script.
+    """
+    world = new_world(level)
+    samples = []
+    for index, (delta_time, events) in enumerate(log.steps):
+        feed_events(world, events)
+        start = time.perf_counter()
+        world.step(delta_time)
+        if index >= WARMUP_STEPS:
+            samples.append((time.perf_counter() - start) * 1000)
+    return frame_summary(samples)
+
+
+def bench_memory(level, log):
+    """
+    Return the peak traced Python memory (in KiB) while loading a
+    level and replaying the input script.
+    """
+    tracemalloc.start()
+    try:
+        world = new_world(level)
+        for delta_time, events in log.steps:
+            feed_events(world, events)
+            world.step(delta_time)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024
+
+
+def bench_draw(window, level, log):
+    """
+    Time GameView.on_draw over a replayed input script, waiting for
+    the GPU to finish each frame.
+    """
+    window.world.level = level
+    with contextlib.redirect_stdout(io.StringIO()):
+        window.setup()
+    window.show_instructions = False
+    samples = []
+    for index, (delta_time, events) in enumerate(log.steps):
+        feed_events(window.world, events)
+        window.on_update(delta_time)
+        start = time.perf_counter()
+        window.on_draw()
+        window.ctx.finish()
+        if index >= WARMUP_STEPS:
+            samples.append((time.perf_counter() - start) * 1000)
+        window.flip()
+    return frame_summary(samples)
+
+
+def open_window():
+    """
+    Return a hidden GameView to draw with, or None when no display
+    is available.
+    """
+    try:
+        window = game.GameView()
+    except Exception as error:  # No display / GL context
+        print(f"Draw benchmarks skipped: {error}")
+        return None
+    window.set_visible(False)
+    return window
+
+
+def run(levels, steps):
+    """
+    Run every benchmark for the given levels and return the results.
+    """
+    window = open_window()
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "arcade": arcade.version.VERSION,
+            "steps": steps,
+            "warmup_steps": WARMUP_STEPS,
+            "script_seed": SCRIPT_SEED,
+        },
+        "levels": {},
+    }
+    characters_path = os.path.join(GAME_DIR, "characters")
+
+    for level in levels:
+        print(f"Level{level}...")
+        entry = {"load": bench_load(level)}
+        world = new_world(level)
+        entry["player"] = timed(lambda: game.Player(characters_path))
+        entry["setup_enemies"] = timed(world.setup_enemies)
+
+        log = record_script(new_world(level), steps, SCRIPT_SEED)
+        entry["update"] = bench_update(level, log)
+        entry["draw"] = (bench_draw(window, level, log)
+                         if window is not None else None)
+        entry["peak_memory_kib"] = bench_memory(level, log)
+        results["levels"][f"Level{level}"] = entry
+
+    if window is not None:
+        window.close()
+    return results
+
+
+def rounded(value):
+    """
+    Round every float in a nested result structure to 4 places.
+    """
+    if isinstance(value, dict):
+        return {key: rounded(item) for key, item in value.items()}
+    if isinstance(value, float):
+        return round(value, 4)
+    return value
+
+
+def flatten(results):
+    """
+    Return {"Level1.update.p50_ms": value, ...} for every numeric metric.
+    """
+    metrics = {}
+    for level_name, entry in results["levels"].items():
+        for group, values in entry.items():
+            if isinstance(values, dict):
+                for name, value in values.items():
+                    metrics[f"{level_name}.{group}.{name}"] = value
+            elif values is not None:
+                metrics[f"{level_name}.{group}"] = values
+    return metrics
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Print each metric against the baseline and return the names of
+    metrics that regressed by more than the threshold.
+    """
+    current = flatten(results)
+    previous = flatten(baseline)
+    regressions = []
+    print(f"\n{'metric':<38}{'baseline':>11}{'current':>11}{'change':>9}")
+    for name, value in current.items():
+        old = previous.get(name)
+        if not old:
+            print(f"{name:<38}{'-':>11}{value:>11.3f}")
+            continue
+        change = (value - old) / old
+        flag = ""
+        if change > threshold and not name.endswith(NOISY_METRICS):
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<38}{old:>11.3f}{value:>11.3f}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Game benchmark suite")
+    parser.add_argument("--levels", type=int, nargs="+", default=LEVELS)
+    parser.add_argument("--steps", type=int, default=STEPS,
+                        help="scripted frames per level")
+    parser.add_argument("--output", default=RESULTS_PATH,
+                        help="where to write the JSON results")
+    parser.add_argument("--baseline", default=BASELINE_PATH,
+                        help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--threshold", type=float,
+                        default=REGRESSION_THRESHOLD,
+                        help="relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    results = rounded(run(args.levels, args.steps))
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more "
+                  f"than {args.threshold:.0%}")
+            sys.exit(1)
+    else:
+        print(f"No baseline at {args.baseline} "
+              "(run with --save-baseline to create one)")
+
+
+if __name__ == "__main__":
+    main()
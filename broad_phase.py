@@ -0,0 +1,130 @@
+"""
+Uniform Grid Broad-Phase for Moving Entities
+
+Enemies move every frame, so a static spatial hash would have to be
+updated sprite by sprite. Instead the grid is rebuilt from scratch once
+per frame from the enemy manager's position arrays: every enemy that
+could touch something this frame is put in each CELL_SIZE square its
+bounding box covers. Each query (an attack, the player) then only
+looks at the enemies sharing its cells, and runs arcade's exact hit box
+test on those candidates alone, instead of testing every enemy.
+
+The grid counts candidate pairs and actual hits per frame, which shows
+how much work the broad-phase saves.
+"""
+
+import math
+
+import arcade
+import numpy as np
+
+# Side length of a grid cell in pixels (a little larger than an enemy)
+CELL_SIZE = 128
+
+
+class UniformGrid:
+    """
+    Grid of enemy sprites rebuilt every frame.
+    Candidates are returned in the order their enemies were added to
+    the manager, which is also their sprite list order, so results
+    match check_for_collision_with_list().
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        """
+        Create an empty grid.
+        """
+        self.cell_size = cell_size
+        # (column, row) -> list of (serial, sprite)
+        self.cells = {}
+        # Sprite -> cells it was put in, so it can be taken out again
+        self.cells_of = {}
+        # Counters for the current frame
+        self.candidates = 0
+        self.hits = 0
+        self.queries = 0
+
+    def rebuild(self, manager, left, bottom, right, top):
+        """
+        Put every awake enemy whose centre is inside a world-space
+        region into the grid (the region must contain every sprite that
+        will be queried, widened by the enemies' half size, and have
+        been passed to the manager's activate()) and reset the frame
+        counters.
+        """
+        self.cells.clear()
+        self.cells_of.clear()
+        self.candidates = 0
+        self.hits = 0
+        self.queries = 0
+        count = manager.awake_count
+        if count == 0:
+            return
+
+        position = manager.position[:count]
+        inside = ((position >= (left, bottom)) &
+                  (position <= (right, top))).all(axis=1)
+        rows = np.flatnonzero(inside)
+        if len(rows) == 0:
+            return
+
+        # Bounding boxes from the largest enemy's half size
+        size = self.cell_size
+        half_width = manager.half_width
+        half_height = manager.half_height
+        cells = self.cells
+        sprite_at = manager.sprite_at
+        serials = manager.serial[rows].tolist()
+        xs = position[rows, 0].tolist()
+        ys = position[rows, 1].tolist()
+        for index, serial, x, y in zip(rows.tolist(), serials, xs, ys):
+            sprite = sprite_at[index]
+            entry = (serial, sprite)
+            covered = []
+            for column in range(math.floor((x - half_width) / size),
+                                math.floor((x + half_width) / size) + 1):
+                for row in range(math.floor((y - half_height) / size),
+                                 math.floor((y + half_height) / size) + 1):
+                    key = (column, row)
+                    cell = cells.get(key)
+                    if cell is None:
+                        cell = cells[key] = []
+                    cell.append(entry)
+                    covered.append(key)
+            self.cells_of[sprite] = covered
+
+    def discard(self, sprite):
+        """
+        Take a sprite (e.g. a defeated enemy) out of the grid.
+        """
+        for key in self.cells_of.pop(sprite, ()):
+            self.cells[key] = [entry for entry in self.cells[key]
+                               if entry[1] is not sprite]
+
+    def query(self, sprite):
+        """
+        Return the enemies whose hit boxes overlap a sprite's.
+        """
+        size = self.cell_size
+        cells = self.cells
+        found = {}
+        for column in range(math.floor(sprite.left / size),
+                            math.floor(sprite.right / size) + 1):
+            for row in range(math.floor(sprite.bottom / size),
+                             math.floor(sprite.top / size) + 1):
+                for serial, other in cells.get((column, row), ()):
+                    found[serial] = other
+
+        self.queries += 1
+        self.candidates += len(found)
+        hits = [found[serial] for serial in sorted(found)
+                if arcade.check_for_collision(sprite, found[serial])]
+        self.hits += len(hits)
+        return hits
+
+    def stats_text(self):
+        """
+        Return a one-line summary of this frame's counters, for display.
+        """
+        return (f"pairs: {self.candidates} candidates, {self.hits} hits "
+                f"({self.queries} queries)")
@@ -0,0 +1,280 @@
+"""
+Chunk-Baked Tile Rendering
+
+Static tile layers never change once a level is loaded, so instead of
+submitting every tile sprite each frame they are composited (in layer
+order) into fixed-size chunk textures at load time. Each frame only
+the chunks that intersect the camera view are drawn, so draw cost
+depends on screen size rather than level size.
+
+Chunks with identical contents share one texture, which keeps memory
+down for large solid areas such as the inside of Level3's walls.
+
+A renderer created with streamed=True bakes nothing up front; it is a
+region consumer (see region_streamer.py) that bakes chunks as they
+come near the camera and releases their textures when they are
+evicted.
+"""
+
+import hashlib
+import time
+
+import arcade
+import PIL.Image
+
+from assets import ASSETS
+from level_cache import (FLIPPED_DIAGONALLY, FLIPPED_HORIZONTALLY,
+                         FLIPPED_VERTICALLY, GID_MASK)
+
+# Chunk size in tiles (32x32 tiles of 16px = 512x512 pixel textures)
+CHUNK_TILES = 32
+
+
+def _tile_image(level, gid, images):
+    """
+    Return the (cached) PIL image for a GID with flip flags applied.
+    Returns None for GIDs that no tileset defines.
+    """
+    if gid in images:
+        return images[gid]
+
+    info = level.tiles.get(gid & GID_MASK)
+    image = None
+    if info is not None:
+        image_path, x, y, width, height = info
+        if image_path not in images:
+            images[image_path] = ASSETS.image(image_path)
+        image = images[image_path].crop((x, y, x + width, y + height))
+        if gid & FLIPPED_DIAGONALLY:
+            image = image.transpose(PIL.Image.Transpose.TRANSPOSE)
+        if gid & FLIPPED_HORIZONTALLY:
+            image = image.transpose(PIL.Image.Transpose.FLIP_LEFT_RIGHT)
+        if gid & FLIPPED_VERTICALLY:
+            image = image.transpose(PIL.Image.Transpose.FLIP_TOP_BOTTOM)
+    images[gid] = image
+    return image
+
+
+class ChunkRenderer:
+    """
+    Draws a set of static tile layers from baked chunk textures,
+    culling chunks outside the camera view.
+    """
+
+    def __init__(self, level, layer_names, scaling=1,
+                 chunk_tiles=CHUNK_TILES, streamed=False):
+        """
+        Bake the given layers of a level into chunk textures, or with
+        streamed=True leave baking to a region streamer.
+        """
+        self.level = level
+        self.layer_names = [name for name in layer_names
+                            if name in level.layers]
+        self.scaling = scaling
+        self.chunk_tiles = chunk_tiles
+        self.chunk_width = chunk_tiles * level.tile_width * scaling
+        self.chunk_height = chunk_tiles * level.tile_height * scaling
+        self.columns = -(-level.width // chunk_tiles)
+        self.rows = -(-level.height // chunk_tiles)
+
+        # (chunk_column, chunk_row) -> sprite, chunk_row 0 at the bottom
+        self.chunks = {}
+        self.unique_textures = 0
+        self.bake_ms = 0
+
+        # Chunks currently being drawn and the range they cover
+        self.visible = None
+        self.visible_range = None
+
+        # Streaming: digest -> [texture, chunks using it], and the tile
+        # image cache used by the streaming thread
+        self.streamed = streamed
+        self.shared = {}
+        self.images = {}
+
+        if not streamed:
+            self.bake()
+
+    def bake(self):
+        """
+        Composite every non-empty chunk into a texture.
+        """
+        start = time.perf_counter()
+        level = self.level
+        tiles = self.chunk_tiles
+        tile_width = level.tile_width
+        tile_height = level.tile_height
+        grids = [level.layers[name] for name in self.layer_names]
+        images = {}
+        textures = {}
+
+        for chunk_row in range(self.rows):
+            # Map rows are stored top-down; chunk rows count bottom-up
+            row_end = level.height - chunk_row * tiles
+            row_start = max(row_end - tiles, 0)
+            for chunk_column in range(self.columns):
+                column_start = chunk_column * tiles
+                column_end = min(column_start + tiles, level.width)
+                gathered = self._gather(grids, column_start, row_start,
+                                        column_end, row_end)
+                if gathered is None:
+                    continue
+
+                # Reuse the texture of an identical chunk
+                digest, cells = gathered
+                texture = textures.get(digest)
+                if texture is None:
+                    texture = self._bake_chunk(
+                        cells, row_end - row_start,
+                        tile_width, tile_height, images, digest)
+                    textures[digest] = texture
+
+                self.chunks[(chunk_column, chunk_row)] = self._chunk_sprite(
+                    texture, chunk_column, chunk_row)
+
+        self.unique_textures = len(textures)
+        self.bake_ms = (time.perf_counter() - start) * 1000
+
+    def _gather(self, grids, column_start, row_start, column_end, row_end):
+        """
+        Gather one chunk's cells from every layer (layer by layer, top
+        row first). Returns (digest, cells), or None if the chunk is
+        empty.
+        """
+        width = self.level.width
+        key = hashlib.sha1()
+        cells = []
+        for grid in grids:
+            for row in range(row_start, row_end):
+                start_index = row * width + column_start
+                span = grid[start_index:start_index +
+                            column_end - column_start]
+                key.update(bytes(span))
+                cells.append(span)
+        if not any(any(span) for span in cells):
+            return None
+        return key.hexdigest(), cells
+
+    def _chunk_sprite(self, texture, chunk_column, chunk_row):
+        """
+        Create the sprite drawing a chunk texture in place.
+        """
+        sprite = arcade.Sprite(texture, scale=self.scaling)
+        sprite.left = chunk_column * self.chunk_width
+        sprite.bottom = chunk_row * self.chunk_height
+        return sprite
+
+    def build_region(self, column_start, row_start, column_end, row_end):
+        """
+        Bake one chunk on the streaming thread (regions must be the
+        same size as chunks). Chunks whose texture is already shared
+        are not baked again.
+        """
+        grids = [self.level.layers[name] for name in self.layer_names]
+        gathered = self._gather(grids, column_start, row_start,
+                                column_end, row_end)
+        if gathered is None:
+            return None, 0
+        digest, cells = gathered
+        if digest in self.shared:
+            return (digest, cells, row_end - row_start, None), 0
+        texture = self._bake_chunk(
+            cells, row_end - row_start, self.level.tile_width,
+            self.level.tile_height, self.images, digest)
+        return ((digest, cells, row_end - row_start, texture),
+                texture.width * texture.height * 4)
+
+    def install(self, key, product):
+        """
+        Start drawing a baked chunk.
+        """
+        if product is None:
+            return
+        digest, cells, row_count, texture = product
+        entry = self.shared.get(digest)
+        if entry is None:
+            # Its shared texture was released after the region was
+            # built, so bake it here
+            if texture is None:
+                texture = self._bake_chunk(
+                    cells, row_count, self.level.tile_width,
+                    self.level.tile_height, self.images, digest)
+            entry = self.shared[digest] = [texture, 0]
+        entry[1] += 1
+        self.chunks[key] = self._chunk_sprite(entry[0], *key)
+        self.unique_textures = len(self.shared)
+        self.visible_range = None
+
+    def evict(self, key, product):
+        """
+        Stop drawing a chunk, releasing its texture once no chunk uses
+        it (the GPU atlas frees a texture's space once nothing
+        references it).
+        """
+        if product is None:
+            return
+        self.chunks.pop(key)
+        digest = product[0]
+        entry = self.shared[digest]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.shared[digest]
+        self.unique_textures = len(self.shared)
+        self.visible_range = None
+
+    def _bake_chunk(self, cells, row_count, tile_width, tile_height,
+                    images, digest):
+        """
+        Composite one chunk's cells (layer by layer, top row first)
+        into a texture.
+        """
+        column_count = len(cells[0])
+        image = PIL.Image.new(
+            "RGBA", (column_count * tile_width, row_count * tile_height))
+        for index, span in enumerate(cells):
+            row = index % row_count
+            for column, gid in enumerate(span):
+                if gid == 0:
+                    continue
+                tile = _tile_image(self.level, gid, images)
+                if tile is None:
+                    continue
+                # Tiles are anchored to the bottom-left of their cell
+                image.alpha_composite(
+                    tile, dest=(column * tile_width,
+                                (row + 1) * tile_height - tile.height))
+        return arcade.Texture(
+            image, hash=f"chunk-{digest}",
+            hit_box_algorithm=arcade.hitbox.algo_bounding_box)
+
+    def update_visible(self, left, bottom, right, top):
+        """
+        Rebuild the visible chunk list if the view now covers a
+        different range of chunks.
+        """
+        chunk_range = (
+            max(int(left // self.chunk_width), 0),
+            max(int(bottom // self.chunk_height), 0),
+            min(int(right // self.chunk_width), self.columns - 1),
+            min(int(top // self.chunk_height), self.rows - 1),
+        )
+        if self.visible is None:
+            self.visible = arcade.SpriteList()
+        elif chunk_range == self.visible_range:
+            return
+        self.visible_range = chunk_range
+
+        first_column, first_row, last_column, last_row = chunk_range
+        self.visible.clear()
+        for chunk_row in range(first_row, last_row + 1):
+            for chunk_column in range(first_column, last_column + 1):
+                sprite = self.chunks.get((chunk_column, chunk_row))
+                if sprite is not None:
+                    self.visible.append(sprite)
+
+    def draw(self, left, bottom, right, top):
+        """
+        Draw the chunks intersecting a world-space view rectangle.
+        """
+        self.update_visible(left, bottom, right, top)
+        self.visible.draw()
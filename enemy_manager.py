@@ -0,0 +1,402 @@
+"""
+Vectorized Enemy Simulation
+
+Patrolling enemies are kept as a struct of NumPy arrays (position,
+velocity, patrol bounds, HP and damage flash timer), one row per live
+enemy, and updated with a handful of array operations per frame
+instead of one Python update() call per sprite.
+
+Each enemy still has a sprite for drawing and collision checks. Only
+enemies inside a given region (the camera view plus everything that
+can collide with an enemy this frame) have their position copied from
+the arrays; sprites outside it may be stale, but nothing can touch or
+see them there. The manager remembers where each sprite was last put,
+so a stale sprite that the region moves over is synced as well and no
+sprite inside the region is ever stale.
+
+Enemies whose whole patrol area is far from that region are put to
+sleep and not updated at all. A patrol is a ping-pong along a lattice
+of positions (start + n * speed on each axis), so after any number of
+frames its position and direction follow in closed form (see
+patrol_advance()); a sleeping enemy is moved to exactly where frame by
+frame updates would have put it when it wakes up. Awake rows are kept
+at the front of the arrays, so per-frame work only touches them.
+"""
+
+import math
+
+import numpy as np
+
+# Damage flash length in seconds, and flashes per second
+FLASH_DURATION = 0.3
+FLASH_RATE = 20
+
+# Rows allocated when the manager is created with no capacity hint
+DEFAULT_CAPACITY = 16
+
+# Distance outside the active region within which enemies wake up,
+# and (larger, so enemies near the edge do not keep toggling) beyond
+# which they fall asleep
+WAKE_MARGIN = 128
+SLEEP_MARGIN = 512
+
+# Size of the cells sleeping enemies are filed under, so waking only
+# looks at the sleepers near the active region
+SLEEP_CELL_SIZE = 1024
+
+
+def patrol_advance(position, velocity, low, high, steps):
+    """
+    Return the (position, velocity) of one axis of a patrol after
+    steps frames, exactly as EnemyManager.update() would produce them:
+    each frame the position moves by velocity, and the velocity turns
+    back once the position reaches high while moving up or low while
+    moving down.
+
+    The position only ever takes values position + speed * offset for
+    integer offsets. Offsets at or past top turn the enemy down and
+    offsets at or below bottom turn it up, so after at most two turns
+    it bounces between top and bottom forever; whole periods of that
+    bounce are skipped with a modulo.
+    """
+    speed = abs(velocity)
+    if speed == 0 or steps <= 0:
+        return position, velocity
+    top = math.ceil((high - position) / speed)
+    turn_up = math.floor((low - position) / speed)
+    # Lowest offset of the steady bounce (below top even if the
+    # bounds are closer together than one step)
+    bottom = min(top - 1, turn_up)
+    period = 2 * (top - bottom)
+
+    offset = 0
+    direction = 1 if velocity > 0 else -1
+    while steps:
+        # Frames until the next turn
+        if direction > 0:
+            run = max(1, top - offset)
+        else:
+            run = max(1, offset - turn_up)
+        if steps < run:
+            offset += direction * steps
+            break
+        offset += direction * run
+        steps -= run
+        direction = -direction
+        if ((direction < 0 and offset == top) or
+                (direction > 0 and offset == bottom)):
+            steps %= period
+    return position + speed * offset, speed * direction
+
+
+class EnemyManager:
+    """
+    Owns every live enemy of a level: the simulation arrays and the
+    sprite list used to draw them and test collisions.
+    Row i of every array belongs to self.sprite_at[i].
+    """
+
+    def __init__(self, sprites, capacity=DEFAULT_CAPACITY):
+        """
+        Create an empty manager adding its sprites to a sprite list.
+        """
+        self.sprites = sprites
+        self.sprite_at = []
+        self.count = 0
+        # Rows [0, awake_count) are simulated; the rest are asleep
+        self.awake_count = 0
+        # Number of update() calls so far
+        self.frame = 0
+        # Sleeping sprite -> (left, bottom, right, top) of everywhere
+        # it can be, and SLEEP_CELL_SIZE cell -> sprites reaching it
+        self.sleeper_reach = {}
+        self.sleep_cells = {}
+        # Increases with every add(), so serial order is the order the
+        # sprites were added (and their order in the sprite list)
+        self.next_serial = 0
+        # Counts the changes to anything but the awake enemies'
+        # positions and velocities (rows, HP, flashes, sleep), so a
+        # copy of the arrays knows when it has to be refreshed
+        self.changes = 0
+        # Largest sprite half width/height, for region tests
+        self.half_width = 0
+        self.half_height = 0
+        self._allocate(max(capacity, 1))
+
+    def _allocate(self, capacity):
+        """
+        Create (or grow) the arrays to hold capacity enemies.
+        Per-axis fields are (capacity, 2) arrays of x and y.
+        """
+        old = getattr(self, "position", None)
+        fields = {}
+        # sprite_position is where each sprite was last put
+        for name in ("position", "velocity", "speed", "low", "high",
+                     "sprite_position"):
+            fields[name] = np.zeros((capacity, 2))
+        fields["flash_timer"] = np.zeros(capacity)
+        fields["hp"] = np.zeros(capacity, dtype=np.int32)
+        fields["max_hp"] = np.zeros(capacity, dtype=np.int32)
+        fields["flashing"] = np.zeros(capacity, dtype=bool)
+        fields["serial"] = np.zeros(capacity, dtype=np.int64)
+        # Frame a sleeping enemy's position and velocity are from
+        fields["slept_at"] = np.zeros(capacity, dtype=np.int64)
+
+        for name, array in fields.items():
+            if old is not None:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+        self.fields = tuple(fields)
+        self.capacity = capacity
+
+    def _swap_rows(self, first, second):
+        """
+        Swap two rows of every array, and their sprites.
+        """
+        if first == second:
+            return
+        rows = [first, second]
+        for name in self.fields:
+            array = getattr(self, name)
+            array[rows] = array[rows[::-1]]
+        sprite_at = self.sprite_at
+        sprite_at[first], sprite_at[second] = (sprite_at[second],
+                                               sprite_at[first])
+        sprite_at[first].index = first
+        sprite_at[second].index = second
+
+    def add(self, sprite, x, y, left, right, bottom, top,
+            speed_x, speed_y, hp):
+        """
+        Add an (awake) enemy patrolling the given bounds, starting at
+        (x, y) and moving at (speed_x, speed_y).
+        """
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+        index = self.count
+        self.position[index] = (x, y)
+        self.velocity[index] = (speed_x, speed_y)
+        self.speed[index] = (abs(speed_x), abs(speed_y))
+        self.low[index] = (left, bottom)
+        self.high[index] = (right, top)
+        self.hp[index] = hp
+        self.max_hp[index] = hp
+        self.flash_timer[index] = 0
+        self.flashing[index] = False
+        self.sprite_position[index] = (x, y)
+        self.serial[index] = self.next_serial
+        self.next_serial += 1
+        self.count += 1
+        self.changes += 1
+
+        sprite.manager = self
+        sprite.index = index
+        sprite.position = (x, y)
+        self.sprite_at.append(sprite)
+        self.sprites.append(sprite)
+        self.half_width = max(self.half_width, sprite.width / 2)
+        self.half_height = max(self.half_height, sprite.height / 2)
+
+        # Move it in front of the sleeping rows
+        self._swap_rows(index, self.awake_count)
+        self.awake_count += 1
+
+    def remove(self, sprite):
+        """
+        Remove a (defeated) enemy, moving other rows into its place.
+        """
+        index = sprite.index
+        if index < self.awake_count:
+            # Keep the awake rows together
+            self.awake_count -= 1
+            self._swap_rows(index, self.awake_count)
+            index = self.awake_count
+        else:
+            self._file_sleeper(sprite, None)
+        self._swap_rows(index, self.count - 1)
+        self.sprite_at.pop()
+        self.count -= 1
+        self.changes += 1
+        sprite.manager = None
+        sprite.index = -1
+        sprite.remove_from_sprite_lists()
+
+    def damage(self, index, amount):
+        """
+        Apply damage to an enemy and start its damage flash.
+        Returns True if the enemy should be destroyed.
+        """
+        self.hp[index] -= amount
+        self.flashing[index] = True
+        self.flash_timer[index] = 0
+        self.changes += 1
+        return self.hp[index] <= 0
+
+    def update(self, delta_time):
+        """
+        Move every awake enemy, reverse it at its patrol bounds and
+        advance damage flashes.
+        """
+        self.frame += 1
+        count = self.awake_count
+        if count == 0:
+            return
+        position = self.position[:count]
+        velocity = self.velocity[:count]
+        position += velocity
+
+        # Reverse direction once a bound is reached while moving
+        # towards it (checked after moving, like Enemy.update did).
+        # Both masks use the velocity before either reversal, so an
+        # axis turns at most once per frame.
+        speed = self.speed[:count]
+        turn_back = (position >= self.high[:count]) & (velocity > 0)
+        turn_forward = (position <= self.low[:count]) & (velocity < 0)
+        np.negative(speed, out=velocity, where=turn_back)
+        np.copyto(velocity, speed, where=turn_forward)
+
+        # Damage flash: alternate transparency, then go back to opaque
+        if not self.flashing[:count].any():
+            return
+        self.changes += 1
+        flashing = np.flatnonzero(self.flashing[:count])
+        timers = self.flash_timer[flashing] + delta_time
+        finished = timers >= FLASH_DURATION
+        timers[finished] = 0
+        self.flash_timer[flashing] = timers
+        self.flashing[flashing[finished]] = False
+        dim = ~finished & ((timers * FLASH_RATE).astype(np.int64) % 2 == 1)
+        for index, is_dim in zip(flashing.tolist(), dim.tolist()):
+            self.sprite_at[index].alpha = 128 if is_dim else 255
+
+    def motion(self, index):
+        """
+        Return an enemy's current (x, y, velocity x, velocity y),
+        working it out for a sleeping enemy without waking it.
+        """
+        x, y = self.position[index].tolist()
+        velocity_x, velocity_y = self.velocity[index].tolist()
+        if index < self.awake_count:
+            return x, y, velocity_x, velocity_y
+        steps = self.frame - int(self.slept_at[index])
+        low_x, low_y = self.low[index].tolist()
+        high_x, high_y = self.high[index].tolist()
+        x, velocity_x = patrol_advance(x, velocity_x, low_x, high_x, steps)
+        y, velocity_y = patrol_advance(y, velocity_y, low_y, high_y, steps)
+        return x, y, velocity_x, velocity_y
+
+    def _reach(self, count):
+        """
+        Return (lowest, highest) per-axis bounds of every position the
+        first count enemies can be at, or be drawn at, from now on
+        (their patrol bounds, overshot by up to one step, plus their
+        current and last drawn positions).
+        """
+        position = self.position[:count]
+        shown = self.sprite_position[:count]
+        speed = self.speed[:count]
+        lowest = np.minimum(np.minimum(self.low[:count] - speed,
+                                       position), shown)
+        highest = np.maximum(np.maximum(self.high[:count] + speed,
+                                        position), shown)
+        return lowest, highest
+
+    def _sleep_cell_range(self, left, bottom, right, top):
+        """
+        Return the SLEEP_CELL_SIZE cells a rectangle overlaps.
+        """
+        size = SLEEP_CELL_SIZE
+        return [(column, row)
+                for column in range(math.floor(left / size),
+                                    math.floor(right / size) + 1)
+                for row in range(math.floor(bottom / size),
+                                 math.floor(top / size) + 1)]
+
+    def _file_sleeper(self, sprite, reach):
+        """
+        File a sleeping sprite under the cells its reach overlaps, or
+        take it out of them if reach is None.
+        """
+        old_reach = self.sleeper_reach.pop(sprite, None)
+        if old_reach is not None:
+            for key in self._sleep_cell_range(*old_reach):
+                self.sleep_cells[key].discard(sprite)
+        if reach is not None:
+            self.sleeper_reach[sprite] = reach
+            for key in self._sleep_cell_range(*reach):
+                self.sleep_cells.setdefault(key, set()).add(sprite)
+
+    def activate(self, left, bottom, right, top):
+        """
+        Wake sleeping enemies that can come within WAKE_MARGIN of a
+        world-space region and put to sleep those that cannot come
+        within SLEEP_MARGIN of it. Call it with the region passed to
+        sync(), before syncing.
+        """
+        wake_left = left - WAKE_MARGIN
+        wake_bottom = bottom - WAKE_MARGIN
+        wake_right = right + WAKE_MARGIN
+        wake_top = top + WAKE_MARGIN
+        waking = set()
+        for key in self._sleep_cell_range(wake_left, wake_bottom,
+                                          wake_right, wake_top):
+            for sprite in self.sleep_cells.get(key, ()):
+                low_x, low_y, high_x, high_y = self.sleeper_reach[sprite]
+                if (high_x >= wake_left and low_x <= wake_right and
+                        high_y >= wake_bottom and low_y <= wake_top):
+                    waking.add(sprite)
+        # Lowest rows first, so swaps never move a row still to do
+        for index in sorted(sprite.index for sprite in waking):
+            self._file_sleeper(self.sprite_at[index], None)
+            x, y, velocity_x, velocity_y = self.motion(index)
+            self.position[index] = (x, y)
+            self.velocity[index] = (velocity_x, velocity_y)
+            self._swap_rows(index, self.awake_count)
+            self.awake_count += 1
+            self.changes += 1
+
+        # Flashing enemies stay awake until the flash ends
+        awake = self.awake_count
+        lowest, highest = self._reach(awake)
+        near = ((highest >= (left - SLEEP_MARGIN, bottom - SLEEP_MARGIN)) &
+                (lowest <= (right + SLEEP_MARGIN,
+                            top + SLEEP_MARGIN))).all(axis=1)
+        far = np.flatnonzero(~near & ~self.flashing[:awake])
+        if len(far) == 0:
+            return
+        self.changes += 1
+        self.slept_at[far] = self.frame
+        reaches = np.hstack((lowest[far], highest[far])).tolist()
+        # Highest rows first, so swaps never move a row still to do
+        for index, reach in zip(far[::-1].tolist(), reaches[::-1]):
+            self._file_sleeper(self.sprite_at[index], tuple(reach))
+            self.awake_count -= 1
+            self._swap_rows(index, self.awake_count)
+
+    def sync(self, left, bottom, right, top):
+        """
+        Copy positions to the sprites of enemies inside a world-space
+        region, and to any out-of-date sprite that is inside it.
+        Sleeping enemies are never inside a region just passed to
+        activate(), so only awake rows are checked.
+        """
+        count = self.awake_count
+        if count == 0:
+            return
+        position = self.position[:count]
+        shown = self.sprite_position[:count]
+        low = (left, bottom)
+        high = (right, top)
+        inside = ((position >= low) & (position <= high)).all(axis=1)
+        shown_inside = ((shown >= low) & (shown <= high)).all(axis=1)
+        moved = (shown != position).any(axis=1)
+        indices = np.flatnonzero((inside | shown_inside) & moved)
+        if len(indices) == 0:
+            return
+        shown[indices] = position[indices]
+
+        sprite_at = self.sprite_at
+        centers = zip(position[indices, 0].tolist(),
+                      position[indices, 1].tolist())
+        for index, center in zip(indices.tolist(), centers):
+            sprite_at[index].position = center
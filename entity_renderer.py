@@ -0,0 +1,214 @@
+"""
+Culled, Batched Drawing of Moving Entities
+
+Enemies, their health bars and projectiles are drawn from retained
+sprite lists holding only what is inside the camera view. Each frame
+the on-screen set is worked out (from the enemy manager's arrays for
+enemies) and only the differences are applied to the lists, so drawing
+every dynamic entity takes three sprite list draws however many exist
+in the level.
+
+Health bars are pairs of solid colour sprites (red behind, green in
+front) that are only moved or resized when their enemy's HP or
+position changes, instead of two immediate-mode rectangles per damaged
+enemy per frame.
+"""
+
+import arcade
+import numpy as np
+
+# Enemy health bar size, and its gap above the enemy sprite
+HP_BAR_WIDTH = 30
+HP_BAR_HEIGHT = 4
+HP_BAR_GAP = 10
+
+
+class VisibleSprites:
+    """
+    A sprite list kept equal to the set of sprites it is given each
+    frame, changing only the sprites that came or went.
+    """
+
+    def __init__(self):
+        """
+        Create an empty list.
+        """
+        self.sprite_list = arcade.SpriteList()
+
+    def show(self, sprites):
+        """
+        Make the list hold exactly the given sprites.
+        Sprites already shown keep their place; new ones go on top.
+        """
+        shown = set(self.sprite_list)
+        wanted = set(sprites)
+        for sprite in shown - wanted:
+            self.sprite_list.remove(sprite)
+        for sprite in sprites:
+            if sprite not in shown:
+                self.sprite_list.append(sprite)
+
+    def clear(self):
+        """
+        Remove every sprite.
+        """
+        self.sprite_list.clear()
+
+    def draw(self):
+        """
+        Draw the shown sprites in one batch.
+        """
+        self.sprite_list.draw()
+
+
+class HealthBars:
+    """
+    Retained health bars for damaged enemies.
+    """
+
+    def __init__(self):
+        """
+        Create an empty set of bars.
+        """
+        self.sprite_list = arcade.SpriteList()
+        # Enemy -> [background, foreground, (hp, max hp, x, y)]
+        self.bars = {}
+        # Bar sprite pairs not in use
+        self.free = []
+
+    def show(self, enemies):
+        """
+        Show bars for exactly the given (damaged) enemies, moving or
+        resizing a bar only when its enemy's HP or position changed.
+        """
+        wanted = set(enemies)
+        for enemy in [enemy for enemy in self.bars if enemy not in wanted]:
+            background, foreground, _ = self.bars.pop(enemy)
+            self.sprite_list.remove(background)
+            self.sprite_list.remove(foreground)
+            self.free.append((background, foreground))
+
+        for enemy in enemies:
+            bar = self.bars.get(enemy)
+            if bar is None:
+                if self.free:
+                    background, foreground = self.free.pop()
+                else:
+                    background = arcade.SpriteSolidColor(
+                        HP_BAR_WIDTH, HP_BAR_HEIGHT, color=arcade.color.RED)
+                    foreground = arcade.SpriteSolidColor(
+                        HP_BAR_WIDTH, HP_BAR_HEIGHT,
+                        color=arcade.color.GREEN)
+                self.sprite_list.append(background)
+                self.sprite_list.append(foreground)
+                bar = self.bars[enemy] = [background, foreground, None]
+
+            state = (enemy.current_hp, enemy.max_hp,
+                     enemy.center_x, enemy.center_y)
+            if state != bar[2]:
+                self._place(bar[0], bar[1], enemy, state)
+                bar[2] = state
+
+    def _place(self, background, foreground, enemy, state):
+        """
+        Position a bar centred just above an enemy, with the green part
+        as wide as the enemy's remaining health.
+        """
+        hp, max_hp, x, y = state
+        left = x - HP_BAR_WIDTH // 2
+        bottom = y + enemy.height // 2 + HP_BAR_GAP
+        background.left = left
+        background.bottom = bottom
+        health_width = HP_BAR_WIDTH * max(hp, 0) / max_hp
+        foreground.visible = health_width > 0
+        if health_width > 0:
+            foreground.width = health_width
+        foreground.left = left
+        foreground.bottom = bottom
+
+    def clear(self):
+        """
+        Remove every bar.
+        """
+        self.show([])
+
+    def draw(self):
+        """
+        Draw every bar in one batch.
+        """
+        self.sprite_list.draw()
+
+
+class EntityRenderer:
+    """
+    Draws a GameWorld's enemies, enemy health bars and projectiles,
+    culled to the camera view.
+    """
+
+    def __init__(self):
+        """
+        Create empty batches.
+        """
+        self.enemies = VisibleSprites()
+        self.health_bars = HealthBars()
+        self.projectiles = VisibleSprites()
+
+    def clear(self):
+        """
+        Forget every shown sprite (e.g. after a level change).
+        """
+        self.enemies.clear()
+        self.health_bars.clear()
+        self.projectiles.clear()
+
+    def update(self, world, left, bottom, right, top):
+        """
+        Choose the entities overlapping a world-space view rectangle.
+        """
+        # Enemies: only awake ones can be in view, and their sprites
+        # there are synced, so test the drawn positions in one go.
+        # The view is extended down so bars above enemies just below
+        # it are kept.
+        manager = world.enemy_manager
+        count = manager.awake_count
+        shown = manager.sprite_position[:count]
+        half_width = manager.half_width
+        half_height = manager.half_height
+        bar_reach = half_height + HP_BAR_GAP + HP_BAR_HEIGHT
+        in_view = ((shown[:, 0] >= left - half_width) &
+                   (shown[:, 0] <= right + half_width) &
+                   (shown[:, 1] >= bottom - bar_reach) &
+                   (shown[:, 1] <= top + half_height))
+        rows = np.flatnonzero(in_view)
+        damaged = manager.hp[rows] < manager.max_hp[rows]
+        sprite_at = manager.sprite_at
+        visible = [sprite_at[index] for index in rows.tolist()]
+        self.enemies.show(visible)
+        self.health_bars.show([
+            enemy for enemy, is_damaged in zip(visible, damaged.tolist())
+            if is_damaged])
+
+        self.projectiles.show([
+            projectile for projectile in world.projectiles.active
+            if (projectile.center_x + projectile.width / 2 >= left and
+                projectile.center_x - projectile.width / 2 <= right and
+                projectile.center_y + projectile.height / 2 >= bottom and
+                projectile.center_y - projectile.height / 2 <= top)])
+
+    def draw_enemies(self):
+        """
+        Draw the enemies in view.
+        """
+        self.enemies.draw()
+
+    def draw_health_bars(self):
+        """
+        Draw the health bars of damaged enemies in view.
+        """
+        self.health_bars.draw()
+
+    def draw_projectiles(self):
+        """
+        Draw the projectiles in view.
+        """
+        self.projectiles.draw()
@@ -0,0 +1,200 @@
+"""
+Per-Phase Frame Timing
+
+Named timing scopes wrapped around each phase of a frame:
+
+    with profiler.scope("physics"):
+        physics_engine.update()
+
+While the profiler is enabled, each scope adds its duration to the
+current frame; end_frame() folds the frame into rolling averages and
+maxima and, optionally, streams it to a CSV file. While it is disabled,
+scope() returns a shared no-op context manager, so instrumented code
+costs one method call and an empty with block per phase.
+"""
+
+import csv
+import time
+from collections import deque
+
+import arcade
+
+# Number of frames the rolling averages and maxima cover
+WINDOW_FRAMES = 120
+
+# Frames between overlay text refreshes (keeps the overlay cheap)
+OVERLAY_REFRESH_FRAMES = 15
+
+
+class _NullScope:
+    """
+    Context manager that does nothing (used while disabled).
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _TimingScope:
+    """
+    Context manager that adds its duration to a profiler phase.
+    """
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = (time.perf_counter() - self.start) * 1000
+        frame = self.profiler.frame
+        frame[self.name] = frame.get(self.name, 0) + elapsed
+        return False
+
+
+class FrameProfiler:
+    """
+    Collects per-phase frame times in milliseconds.
+    Phases are reported in the order they were first seen.
+    """
+
+    def __init__(self, enabled=False, window=WINDOW_FRAMES):
+        """
+        Create a profiler, disabled unless requested.
+        """
+        self.enabled = enabled
+        self.window = window
+        # Phase times for the frame in progress
+        self.frame = {}
+        # Phase name -> deque of recent frame times
+        self.history = {}
+        self.frame_count = 0
+        self.csv_file = None
+        self.csv_writer = None
+
+    def scope(self, name):
+        """
+        Return a context manager timing one phase of the frame.
+        """
+        if not self.enabled:
+            return _NULL_SCOPE
+        return _TimingScope(self, name)
+
+    def end_frame(self):
+        """
+        Close the current frame: update the rolling statistics and
+        write the frame to the CSV stream, if one is open.
+        """
+        if not self.enabled:
+            return
+        frame = self.frame
+        for name, elapsed in frame.items():
+            samples = self.history.get(name)
+            if samples is None:
+                samples = self.history[name] = deque(maxlen=self.window)
+            samples.append(elapsed)
+        if self.csv_writer:
+            for name, elapsed in frame.items():
+                self.csv_writer.writerow(
+                    (self.frame_count, name, f"{elapsed:.4f}"))
+        self.frame_count += 1
+        self.frame = {}
+
+    def summary(self):
+        """
+        Return (phase, average ms, maximum ms) for every phase over the
+        rolling window.
+        """
+        return [(name, sum(samples) / len(samples), max(samples))
+                for name, samples in self.history.items() if samples]
+
+    def open_csv(self, path):
+        """
+        Stream every frame to a CSV file with frame, phase and ms
+        columns, and enable the profiler.
+        """
+        self.close_csv()
+        self.csv_file = open(path, "w", newline="")
+        self.csv_writer = csv.writer(self.csv_file)
+        self.csv_writer.writerow(("frame", "phase", "ms"))
+        self.enabled = True
+
+    def close_csv(self):
+        """
+        Flush and close the CSV stream, if one is open.
+        """
+        if self.csv_file:
+            self.csv_file.close()
+        self.csv_file = None
+        self.csv_writer = None
+
+
+class ProfilerOverlay:
+    """
+    Text overlay listing each phase's rolling average and maximum.
+    Draw it with the GUI camera active.
+    """
+
+    def __init__(self, profiler, x, top, font_size=12, status_lines=None):
+        """
+        Create an overlay whose first line is at (x, top).
+        status_lines, if given, is a callable returning extra lines
+        (e.g. background loading status) shown below the phases.
+        """
+        self.profiler = profiler
+        self.status_lines = status_lines
+        self.x = x
+        self.top = top
+        self.font_size = font_size
+        self.line_height = font_size + 6
+        self.lines = []
+        self.frames_until_refresh = 0
+
+    def refresh(self):
+        """
+        Rebuild the text lines from the profiler's current summary.
+        """
+        rows = [f"{'phase':<18}{'avg ms':>8}{'max ms':>8}"]
+        for name, average, maximum in self.profiler.summary():
+            rows.append(f"{name:<18}{average:>8.3f}{maximum:>8.3f}")
+        if self.status_lines:
+            rows.extend(self.status_lines())
+
+        # Reuse Text objects; only add new ones when phases appear
+        while len(self.lines) < len(rows):
+            self.lines.append(arcade.Text(
+                "", self.x, self.top - len(self.lines) * self.line_height,
+                arcade.color.WHITE, self.font_size, font_name="Courier New"))
+        for index, line in enumerate(self.lines):
+            line.text = rows[index] if index < len(rows) else ""
+
+    def draw(self):
+        """
+        Draw the overlay, refreshing its text every few frames.
+        """
+        if self.frames_until_refresh <= 0:
+            self.refresh()
+            self.frames_until_refresh = OVERLAY_REFRESH_FRAMES
+        self.frames_until_refresh -= 1
+
+        if not self.lines:
+            return
+        width = 36 * self.font_size * 0.62
+        bottom = self.top - len(self.lines) * self.line_height
+        arcade.draw_lrbt_rectangle_filled(
+            self.x - 6, self.x + width, bottom,
+            self.top + self.line_height, (0, 0, 0, 180))
+        for line in self.lines:
+            line.draw()
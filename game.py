@@ -11,9 +11,36 @@ The game includes multiple levels, enemy combat,
 checkpoints, and character-specific abilities.
 """
 
-import arcade
+import time
+
+# Import time is measured from here (see --profile-startup)
+IMPORT_START = time.perf_counter()
+
+import argparse
 import os
 
+import arcade
+
+from chunk_renderer import ChunkRenderer
+from assets import ASSETS
+from frame_profiler import FrameProfiler, ProfilerOverlay
+from enemy_manager import EnemyManager
+from projectiles import ProjectilePool, ProjectileType
+from broad_phase import UniformGrid
+from entity_renderer import EntityRenderer
+from hud import Hud
+from level_preloader import (PREPARE_STAGES, LevelPreloader,
+                             prepare_level_steps)
+from region_streamer import RegionStreamer
+from replay import InputLog, InputRecorder, ReplayDriver
+from rewind import CAPTURE_BUDGET_US, CAPTURE_PEAK_US, RewindBuffer
+from startup_loader import StagedLoader, StartupProfile, run_steps
+from tile_collision import build_collision_list
+from tile_physics import TileGridPhysicsEngine
+from trigger_zones import TriggerZones
+
+IMPORT_MS = (time.perf_counter() - IMPORT_START) * 1000
+
 # Window configuration constants
 WINDOW_WIDTH = 1280
 WINDOW_HEIGHT = 780
@@ -27,12 +54,52 @@ GRAVITY = 0.5
 PLAYER_JUMP_SPEED = 11
 ARCHER_DASH_SPEED = 15
 
+# Where the player starts until a level sets its spawn point
+PLAYER_SPAWN_X = 40
+PLAYER_SPAWN_Y = 200
+
+# Resolve player movement against the tile grid (swept, so fast dashes
+# can't tunnel) instead of arcade's sprite-list platformer engine
+USE_TILE_PHYSICS = True
+
 # Health and combat constants
 MAX_HEALTH = 3
 DAMAGE_COOLDOWN = 1.0
 ARROW_SPEED = 8
 FIRE_DURATION = 3.0
 ATTACK_COOLDOWN = 0.5
+# Tile layers that are only drawn (from baked chunks), never collided with
+DRAW_ONLY_LAYERS = ("Platforms", "Background")
+
+# Tile layers the gameplay checks ask about through TileLayerGrid
+# lookups (see tile_query.py) rather than sprite collision
+QUERY_LAYERS = ("Climbable", "Danger", "Checkpoint", "Exit")
+
+# Layers with no sprites built at load time
+LOAD_SKIPPED_LAYERS = DRAW_ONLY_LAYERS + QUERY_LAYERS
+
+# Bake the chunks region by region around the camera (see
+# region_streamer.py) instead of for the whole map when a level loads
+STREAM_REGIONS = True
+
+# Sprite list options for layers that are built as sprites
+LAYER_OPTIONS = {
+    "Start": {"use_spatial_hash": True},
+}
+LAST_LEVEL = 3
+
+# Held to step back through the rewind history
+REWIND_KEY = arcade.key.R
+
+# Stages GameWorld.setup_steps() adds to the level's preparation
+WORLD_SETUP_STAGES = 5
+
+# Loading screen: milliseconds of loading stages run per frame, and
+# the progress bar's size
+LOADING_FRAME_BUDGET_MS = 50
+LOADING_BAR_WIDTH = 600
+LOADING_BAR_HEIGHT = 24
+
 Knight = "knight"
 Wizard = "wizard"
 Archer = "archer"
@@ -93,98 +160,38 @@ LEVEL_ENEMIES = {
     ]
 }
 
+# Lines of the instructions overlay (toggled with I)
+INSTRUCTIONS = [
+    "CONTROLS:",
+    "A/D or Arrows - Move",
+    "W/Up - Jump",
+    "1 - Switch to Archer",
+    "2 - Switch to Knight",
+    "3 - Switch to Wizard",
+    "E - Attack",
+    "Space - Character Specific Ability.",
+    "KNIGHT - Ability: Climb, Attack: Forward Slash",
+    "ARCHER - Ability: Dash, Attack: Arrow Shoot",
+    "WIZARD - Ability: Levitate, Attack: Firey Terrain",
+    "Hint 1: You can only levitate while your on the ground.",
+    "Hint 2: You can't fall while Dashing",
+    "Hint 3: You won't fall if your climbing on a wall.",
+    "Bonus Hint: Kill all the enemies on level 3 to win!",
+    "ESC - Reset position, hold R - Rewind",
+    "I - Toggle instructions",
+    "F3 - Toggle frame timings",
+]
 
-class Arrow(arcade.Sprite):
-    """
-    Arrow projectile fired by the Archer character.
-
-    """
-    
-    def __init__(self, texture, scale=1.5):
-        """
-        Initialize an Arrow sprite.
-        
-        """
-        super().__init__()
-        self.texture = texture
-        self.scale = scale
-        self.speed = ARROW_SPEED
-        
-    def update(self, delta_time=1/60):
-        """
-        Update arrow position based on its velocity.
-        """
-        self.center_x += self.change_x
-        self.center_y += self.change_y
-
-
-class Fire(arcade.Sprite):
-    """
-    Fire spell projectile created by the Wizard character.
-    Features flickering animation between two textures 
-    and automatic removal after duration.
-    """
-    
-    def __init__(self, texture1, texture2, scale=1.5):
-        """
-        Initialize a Fire spell sprite.
-        """
-        super().__init__()
-        self.texture1 = texture1
-        self.texture2 = texture2
-        self.texture = texture1
-        self.scale = scale
-        self.duration = FIRE_DURATION
-        self.timer = 0.0
-        self.flicker_timer = 0.0
-        self.flicker_rate = 0.15
-        self.current_texture = 1
-        
-    def update(self, delta_time):
-        """
-        Update fire animation and handle automatic removal.
-        """
-        # Update main timer
-        self.timer += delta_time
-        if self.timer >= self.duration:
-            self.remove_from_sprite_lists()
-            return
-        
-        # Handle flickering animation between textures
-        self.flicker_timer += delta_time
-        if self.flicker_timer >= self.flicker_rate:
-            if self.current_texture == 1:
-                self.texture = self.texture2
-                self.current_texture = 2
-            else:
-                self.texture = self.texture1
-                self.current_texture = 1
-            self.flicker_timer = 0.0
-
-
-class KnightSlash(arcade.Sprite):
-    """
-    Melee attack sprite for the Knight character.
-    Automatically removes itself after a short duration.
-    """
-    
-    def __init__(self, texture, scale=2):
-        """
-        Initialize a Knight slash attack sprite.
-        """
-        super().__init__()
-        self.texture = texture
-        self.scale = scale
-        self.duration = 0.3  # Short duration for visual effect
-        self.timer = 0.0
-        
-    def update(self, delta_time):
-        """
-        Update slash timer and handle automatic removal.
-        """
-        self.timer += delta_time
-        if self.timer >= self.duration:
-            self.remove_from_sprite_lists()
+# Projectile types - one per character's attack
+# Format: (damage, speed, lifetime, pierce, flicker_rate, spawn_offset,
+# hits_walls, culled_off_screen)
+# Speed is in pixels per frame, lifetime and flicker rate in seconds
+# (None = no limit / no flicker), pierce is how many enemies it can hit
+PROJECTILE_TYPES = {
+    Knight: (3, 0, 0.3, 1, None, (20, 0), False, False),
+    Archer: (1, ARROW_SPEED, None, 1, None, (10, 0), True, True),
+    Wizard: (2, 0, FIRE_DURATION, 1, 0.15, (25, -5), False, False),
+}
 
 
 class Player:
@@ -196,6 +203,8 @@ class Player:
     def __init__(self, characters_path):
         """
         Initialize the player with all character sprites and abilities.
+        Textures come from the shared asset registry, so only the first
+        Player in a process loads anything from disk.
         """
         # Character management
         self.character_sprites = []
@@ -208,16 +217,31 @@ class Player:
         # Animation system
         self.walk_textures_by_character = {}
         self.attack_textures_by_character = {}
+        self.movement_threshold = 20
+        self.float_duration = 2
+        self.max_health = MAX_HEALTH
+        
+        self.spawn_x = PLAYER_SPAWN_X
+        self.spawn_y = PLAYER_SPAWN_Y
+        self.load_characters(characters_path)
+        self.reset_state()
+        
+    def reset_state(self):
+        """
+        Put the player back in its starting state: first character,
+        full health, no active abilities, at the default spawn point.
+        Called when a level starts, so the same Player (and its
+        textures) can be kept across levels.
+        """
+        # Animation system
         self.walk_animation_index = 0
         self.climb_animation_index = 0
         self.facing_direction = "right"
         self.movement_accumulator = 0
         self.climb_movement_accumulator = 0
-        self.movement_threshold = 20
         
         # Wizard floating ability
         self.is_floating = False
-        self.float_duration = 2
         self.float_timer = 0
         
         # Knight climbing ability
@@ -237,29 +261,42 @@ class Player:
         self.attack_on_cooldown = False
         
         # Health and spawning
-        self.spawn_x = 40
-        self.spawn_y = 200
-        self.load_characters(characters_path)
-        self.max_health = MAX_HEALTH
+        self.spawn_x = PLAYER_SPAWN_X
+        self.spawn_y = PLAYER_SPAWN_Y
         self.health = self.max_health
         self.damage_timer = 0
         self.is_invincible = False
         
+        # Every character back at the spawn point with its standing
+        # texture, and out of the previous level's sprite lists
+        for sprite in self.character_sprites:
+            sprite.remove_from_sprite_lists()
+            sprite.texture = sprite.base_texture
+            sprite.alpha = 255
+            sprite.center_x = self.spawn_x
+            sprite.center_y = self.spawn_y
+            sprite.change_x = 0
+            sprite.change_y = 0
+        self.current_character_index = 0
+        self.sprite = self.character_sprites[self.current_character_index]
+        
     def load_characters(self, characters_path):
         """
         Load all character sprites and their
         textures from the characters directory.
         """
         # Load character sprites from PNG files
-        for filename in os.listdir(characters_path):
+        for filename in ASSETS.listdir(characters_path):
             if not filename.lower().endswith('.png'):
                 continue
             sprite_path = os.path.join(characters_path, filename)
             character_name = os.path.splitext(filename)[0]
             
             # Create sprite and set initial properties
-            sprite = arcade.Sprite(sprite_path, scale=TILE_SCALING)
+            sprite = arcade.Sprite(ASSETS.texture(sprite_path),
+            scale=TILE_SCALING)
             sprite.character_name = character_name
+            sprite.base_texture = sprite.texture
             sprite.center_x = self.spawn_x
             sprite.center_y = self.spawn_y
             self.character_sprites.append(sprite)
@@ -306,13 +343,11 @@ class Player:
         for i in range(0, frame_count + 1):
             path = os.path.join(character_path,
             f"{character_name}_walking{i}.png")
-            if not os.path.exists(path):
+            if not ASSETS.exists(path):
                 continue
-            # Load right-facing texture and 
-            # create left-facing by flipping
-            right_texture = arcade.load_texture(path)
+            # Right-facing texture and its flipped left-facing copy
+            right_texture, left_texture = ASSETS.texture_pair(path)
             walk_textures["right"].append(right_texture)
-            left_texture = right_texture.flip_left_right()
             walk_textures["left"].append(left_texture)
         return walk_textures
     
@@ -329,9 +364,9 @@ class Player:
             # Knight has single attack texture
             attack_path = os.path.join(character_path, 
             "knight_attack1.png")
-            if os.path.exists(attack_path):
-                right_texture = arcade.load_texture(attack_path)
-                left_texture = right_texture.flip_left_right()
+            if ASSETS.exists(attack_path):
+                right_texture, left_texture = ASSETS.texture_pair(
+                attack_path)
                 attack_textures = {
                     "right": right_texture,
                     "left": left_texture
@@ -340,9 +375,9 @@ class Player:
             # Archer has single attack texture (bow drawing)
             attack_path = os.path.join(character_path,
             "archer_attack1.png")
-            if os.path.exists(attack_path):
-                right_texture = arcade.load_texture(attack_path)
-                left_texture = right_texture.flip_left_right()
+            if ASSETS.exists(attack_path):
+                right_texture, left_texture = ASSETS.texture_pair(
+                attack_path)
                 attack_textures = {
                     "right": right_texture,
                     "left": left_texture
@@ -354,12 +389,11 @@ class Player:
             attack_path2 = os.path.join(character_path, 
             "wizard_attack2.png")
             
-            if os.path.exists(attack_path1) and os.path.exists(attack_path2):
-                right_texture1 = arcade.load_texture(attack_path1)
-                left_texture1 = right_texture1.flip_left_right()
-                
-                right_texture2 = arcade.load_texture(attack_path2)
-                left_texture2 = right_texture2.flip_left_right()
+            if ASSETS.exists(attack_path1) and ASSETS.exists(attack_path2):
+                right_texture1, left_texture1 = ASSETS.texture_pair(
+                attack_path1)
+                right_texture2, left_texture2 = ASSETS.texture_pair(
+                attack_path2)
                 
                 attack_textures = {
                     "right": (right_texture1, right_texture2),
@@ -376,8 +410,8 @@ class Player:
         for i in range(1, 3):
             climb_path = os.path.join(characters_path, Knight,
             f"knight_climbing{i}.png")
-            if os.path.exists(climb_path):
-                climbing_texture = arcade.load_texture(climb_path)
+            if ASSETS.exists(climb_path):
+                climbing_texture = ASSETS.texture(climb_path)
                 climbing_textures.append(climbing_texture)
         
         # Add climbing textures to knight's texture dictionary
@@ -507,12 +541,8 @@ class Player:
             if self.sprite.change_y > 0:
                 test_y = self.sprite.center_y + self.sprite.height // 2 + 2
                 
-                can_climb_higher = False
-                for wall in climbable_walls:
-                    if (wall.left <= self.sprite.center_x <= wall.right and
-                        wall.bottom <= test_y <= wall.top):
-                        can_climb_higher = True
-                        break
+                can_climb_higher = climbable_walls.any_in_rect(
+                self.sprite.center_x, test_y, self.sprite.center_x, test_y)
                 
                 if can_climb_higher:
                     self.sprite.center_y += self.sprite.change_y
@@ -571,7 +601,7 @@ class Player:
         Check if the knight character is touching a climbable wall.
         """
         if self.sprite == self.knight_sprite:
-            return arcade.check_for_collision_with_list(self.sprite, climbable_walls)
+            return climbable_walls.overlaps(self.sprite)
         return False
 
     def reset(self):
@@ -635,85 +665,12 @@ class Player:
         
         character_name = self.sprite.character_name
         
-        # Create appropriate attack based on character
-        if character_name == Knight:
-            return self.create_knight_slash()
-        elif character_name == Archer:
-            return self.create_archer_arrow()
-        elif character_name == Wizard:
-            return self.create_wizard_fire()
-            
+        # The attack's projectile type is named after the character
+        # (see PROJECTILE_TYPES); None if it has no attack textures
+        if character_name in self.attack_textures_by_character:
+            return character_name
         return None
     
-    def create_knight_slash(self):
-        """
-        Create a knight slash attack sprite.
-        """
-        if Knight not in self.attack_textures_by_character:
-            return None
-            
-        slash_texture = (self.attack_textures_by_character[Knight]
-        [self.facing_direction])
-        slash = KnightSlash(slash_texture, scale=ATTACK_SCALING)
-        
-        # Position slash in front of knight
-        offset_x = 20 if self.facing_direction == "right" else -20
-        slash.center_x = self.sprite.center_x + offset_x
-        slash.center_y = self.sprite.center_y
-        
-        return slash
-    
-    def create_archer_arrow(self):
-        """
-        Creates an arrow projectile for the archer character.
-        """
-        # Check if archer attack textures are loaded
-        if Archer not in self.attack_textures_by_character:
-            return None
-            
-        # Get the appropriate arrow texture based on facing direction
-        arrow_texture = (self.attack_textures_by_character[Archer]
-        [self.facing_direction])
-        arrow = Arrow(arrow_texture, scale=ATTACK_SCALING)
-        
-        # Position arrow slightly offset from 
-        # player center based on facing direction
-        offset_x = 10 if self.facing_direction == "right" else -10
-        arrow.center_x = self.sprite.center_x + offset_x
-        arrow.center_y = self.sprite.center_y
-        
-        # Set arrow velocity (horizontal movement only)
-        arrow.change_x = (
-            ARROW_SPEED
-            if self.facing_direction == "right"
-            else -ARROW_SPEED
-        )
-        arrow.change_y = 0
-        
-        return arrow
-
-    def create_wizard_fire(self):
-        """
-        Creates a fire attack for the wizard character.
-        """
-            
-        # Get fire textures (tuple of two textures for animation)
-        fire_textures = self.attack_textures_by_character[Wizard][self.facing_direction]
-        
-        # Handle the tuple of textures properly
-        if isinstance(fire_textures, tuple) and len(fire_textures) >= 2:
-            fire = Fire(fire_textures[0], fire_textures[1], scale=ATTACK_SCALING)
-        else:
-            return None
-        
-        # Position fire with larger offset and slight vertical adjustment
-        offset_x = 25 if self.facing_direction == "right" else -25
-        offset_y = -5
-        fire.center_x = self.sprite.center_x + offset_x
-        fire.center_y = self.sprite.center_y + offset_y
-        
-        return fire
-
     def take_damage(self):
         """
         Handles player taking damage, including invincibility frames
@@ -743,170 +700,152 @@ class Player:
 
 class Enemy(arcade.Sprite):
     """
-    Enemy sprite class that handles movement, health, damage,
-    and boundary constraints.
+    Enemy sprite used for drawing and collision checks.
+    Movement, health and the damage flash are simulated by the
+    level's EnemyManager, which also keeps this sprite's position
+    in sync while it is on screen or near the player.
     """
     
     def __init__(self, image_path, scale=TILE_SCALING):
         """
-        Initialize an enemy sprite with movement,
-        health, and visual properties.
+        Initialize an enemy sprite. It is given a manager and
+        an index into the manager's arrays when added to one.
         """
-        super().__init__(image_path, scale)
-        
-        # Movement properties
-        self.speed_x = 0   # Horizontal movement speed
-        self.speed_y = 0   # Vertical movement speed
-        self.change_x = self.speed_x
-        self.change_y = self.speed_y
-        
-        # Default movement boundaries (can be overridden per enemy)
-        self.boundary_left = 0
-        self.boundary_right = 0
-        self.boundary_top = 0
-        self.boundary_bottom = 0
+        super().__init__(ASSETS.texture(image_path), scale)
         
         # Health system based on enemy type
         filename = os.path.basename(image_path)
         # Get HP from config or default to 1
-        self.max_hp = ENEMY_HP.get(filename, 1)  
-        self.current_hp = self.max_hp
-        
-        # Damage visualization system
-        self.damage_flash_timer = 0
-        self.is_flashing = False
+        self.start_hp = ENEMY_HP.get(filename, 1)
         
-    def update(self, delta_time=1/60):
-        """
-        Update enemy position, handle boundary collisions,
-        and manage damage flash effects.
-        """
-        # Update position based on velocity
-        self.center_x += self.change_x
-        self.center_y += self.change_y
+        # Set by EnemyManager.add()
+        self.manager = None
+        self.index = -1
         
-        # Handle horizontal boundary collisions (reverse direction 
-        # when hitting walls)
-        if self.center_x >= self.boundary_right and self.change_x > 0:  
-            self.change_x = -abs(self.speed_x)  # Move left
-        elif self.center_x <= self.boundary_left and self.change_x < 0: 
-            self.change_x = abs(self.speed_x)   # Move right
-            
-        # Handle vertical boundary collisions
-        # (for flying/jumping enemies)
-        if self.center_y >= self.boundary_top and self.change_y > 0:
-            self.change_y = -abs(self.speed_y)  # Move down
-        elif self.center_y <= self.boundary_bottom and self.change_y < 0:
-            self.change_y = abs(self.speed_y)   # Move up
-            
-        # Handle damage flash animation
-        if self.is_flashing:
-            self.damage_flash_timer += delta_time
-            if self.damage_flash_timer >= 0.3:  # Flash duration
-                # End flashing effect
-                self.is_flashing = False
-                self.damage_flash_timer = 0
-                self.alpha = 255  # Full opacity
-            else:
-                # Create flashing effect by alternating transparency
-                flash_rate = 20  # How fast the flashing occurs
-                if int(self.damage_flash_timer * flash_rate) % 2:
-                    self.alpha = 128  # Semi-transparent
-                else:
-                    self.alpha = 255  # Full opacity
+    @property
+    def current_hp(self):
+        """Current health, from the manager's arrays."""
+        return int(self.manager.hp[self.index])
+    
+    @property
+    def max_hp(self):
+        """Starting health, from the manager's arrays."""
+        return int(self.manager.max_hp[self.index])
     
     def take_damage(self, damage=1):
         """
         Apply damage to the enemy and trigger visual feedback.
+        Returns True if the enemy should be destroyed.
         """
-        self.current_hp -= damage
-        self.is_flashing = True      # Start damage flash effect
-        self.damage_flash_timer = 0  # Reset flash timer
-        
-        # Return True if enemy should be destroyed
-        if self.current_hp <= 0:
-            return True 
-        return False
-    
-    def draw_hp_bar(self):
-        """
-        Draw a health bar above the enemy when damaged.
-        Only displays when enemy has taken damage (current_hp < max_hp).
-        """
-        if self.current_hp < self.max_hp:
-            # Health bar dimensions and positioning
-            bar_width = 30
-            bar_height = 4
-            # Center horizontally above enemy
-            bar_x = self.center_x - bar_width // 2  
-            # Position above enemy sprite
-            bar_y = self.center_y + self.height // 2 + 10  
-            
-            # Draw red (represents missing health)
-            arcade.draw_lrbt_rectangle_filled(
-                bar_x, bar_x + bar_width,
-                bar_y, bar_y + bar_height,
-                arcade.color.RED
-            )
-            
-            # Draw green foreground (represents current health)
-            health_percentage = self.current_hp / self.max_hp
-            health_width = bar_width * health_percentage
-            arcade.draw_lrbt_rectangle_filled(
-                bar_x, bar_x + health_width,
-                bar_y, bar_y + bar_height,
-                arcade.color.GREEN
-            )
+        return self.manager.damage(self.index, damage)
 
-class GameView(arcade.Window):
+def build_projectile_types(attack_textures):
     """
-    Main game window class that manages the entire game state,
-    including player, enemies,
-    level progression, UI elements, and game logic.
+    Create a ProjectileType for every character that has attack
+    textures, from PROJECTILE_TYPES.
+    """
+    projectile_types = {}
+    for name, textures in attack_textures.items():
+        (damage, speed, lifetime, pierce, flicker_rate, offset,
+        hits_walls, culled) = PROJECTILE_TYPES[name]
+        # Single textures become one-frame animations
+        frames = {
+            facing: texture if isinstance(texture, tuple) else (texture,)
+            for facing, texture in textures.items()
+        }
+        projectile_types[name] = ProjectileType(
+            name, frames, damage, speed=speed, lifetime=lifetime,
+            pierce=pierce, flicker_rate=flicker_rate, offset=offset,
+            scale=ATTACK_SCALING, hits_walls=hits_walls, culled=culled)
+    return projectile_types
+
+
+class GameWorld:
+    """
+    Headless game simulation that owns the level, player, enemies
+    and projectiles. Advanced one step at a time with step(), and
+    driven by key events, so it can run without opening a window
+    (benchmarks, soak tests, automated play). GameView renders it
+    and feeds it input.
     """
     
-    def __init__(self):
-        """window and all game state variables."""
-        super().__init__(WINDOW_WIDTH, WINDOW_HEIGHT, WINDOW_TITLE)
-        
+    def __init__(self, level=1):
+        """Initialize all game state variables."""
         # Core game objects
         self.player = None
         self.tile_map = None
         self.scene = None
         
-        # Camera system
-        self.camera = None      # World camera (follows player)
-        self.gui_camera = None  # UI camera (stays fixed)
-        
         # Game state variables
-        self.score = 0
-        self.score_text = None
         self.end_of_map = 0
-        self.level = 1
-        self.reset_score = True
+        self.level = level
         self.map_bottom = 0
-        self.show_instructions = True
         self.game_won = False
-        
-        # Level-specific sprite lists
+        self.steps = 0
+        
+        # Point the camera follows, and the (left, bottom, right, top)
+        # view around it (computed once per step; used to cull
+        # far-away arrows and to choose which enemies to sync)
+        self.camera_position = (0, 0)
+        self.view_rect = (0, 0, 0, 0)
+        
+        # Level-specific collision data
+        self.platform_walls = None  # Merged rectangles (arcade engine)
+        self.wall_grid = None       # Solid tile grid for raycasts
+        self.tile_grids = {}        # Layer name -> TileLayerGrid
         self.climbable_walls = None
+        self.danger = None
         self.checkpoints = None
+        # Trigger zones of the hazard, exit and checkpoint layers
+        # (exit and checkpoint zones are None when a level lacks them)
+        self.hazard_zones = None
+        self.exit_zones = None
+        self.checkpoint_zones = None
+        # (level, zone index) of every checkpoint reached so far
         self.activated_checkpoints = set()
         self.enemies = arcade.SpriteList()
+        self.enemy_manager = EnemyManager(self.enemies)
+        # Enemies near anything that can touch them, rebuilt each step
+        # and used for every attack and player vs enemy test
+        self.enemy_grid = UniformGrid()
         self.exits = None 
         
-        # Attack/projectile sprite lists
-        self.knight_attacks = arcade.SpriteList()
-        self.archer_arrows = arcade.SpriteList()
-        self.wizard_fires = arcade.SpriteList()
+        # Attack projectiles (pooled, one sprite list for every kind)
+        self.projectiles = ProjectilePool()
+        self.projectile_types = {}
         
         # Physics engine
         self.physics_engine = None
+
+        # Timings from the most recent level load
+        self.load_stats = {}
+        
+        # Extra per-level products built along with the map (e.g. a
+        # renderer's baked chunks): name -> callable(level_data), with
+        # the results for the current level in level_extras
+        self.level_builders = {}
+        self.level_extras = {}
+        
+        # Background loader for the next level (see enable_preloading)
+        self.preloader = None
+        
+        # Streams the current level's regions around the camera, with
+        # extra region consumers (e.g. a renderer's chunks) created by
+        # region_consumers: name -> callable(level_data)
+        self.streamer = None
+        self.region_consumers = {}
+        
+        # Per-phase step timings (disabled unless profiling)
+        self.profiler = FrameProfiler()
         
-        # UI elements
-        self.health_bar_list = arcade.SpriteList()
-        self.heart_full_texture = None
-        self.heart_empty_texture = None
+        # Recent states of the current level, stepped back through
+        # while REWIND_KEY is held (None disables recording)
+        self.rewind = RewindBuffer()
+        self.rewinding = False
+        
+        # Called with no arguments after every level load, so a
+        # renderer can rebuild its level graphics
+        self.on_level_loaded = None
         
     def setup(self):
         """
@@ -914,71 +853,237 @@ class GameView(arcade.Window):
         enemies, and physics.
         Called when starting a new level or restarting the game.
         """
-        # Define which map layers require collision detection
-        layer_options = {
-            "Platforms": {"use_spatial_hash": True},  
-            "Climbable": {"use_spatial_hash": True},  
-            "Danger": {"use_spatial_hash": True},     
-            "Exit": {"use_spatial_hash": True},       
-            "Start": {"use_spatial_hash": True}      
-        }
-        # Load the Tiled map file for the current level
-        map_path = os.path.join(os.path.dirname(__file__),
-        f"Level{self.level}.tmx")
-        self.tile_map = arcade.load_tilemap(
-            map_path,
-            scaling=TILE_SCALING,
-            layer_options=layer_options,
-        )
+        run_steps(self.setup_steps())
+    
+    def setup_stage_count(self):
+        """
+        Return how many stages setup_steps() yields when it has to
+        prepare the level itself.
+        """
+        return (PREPARE_STAGES + len(self.level_builders) +
+                WORLD_SETUP_STAGES)
+    
+    def setup_steps(self):
+        """
+        setup() as a staged generator (see startup_loader.py): yields
+        a (category, label) pair before each stage, so a window can
+        build the level across frames behind a loading screen.
+        """
+        # Stop streaming the previous level
+        if self.streamer:
+            self.streamer.close()
+            self.streamer = None
+        
+        # Take the level from the background preloader when it has
+        # it ready, otherwise load it now (first level, or no preloader)
+        prepared = None
+        if self.preloader:
+            prepared = self.preloader.take(self.level)
+            if prepared:
+                prepared.load_stats["preload"] = {
+                    "prepare_ms": prepared.prepare_ms,
+                    "wait_ms": self.preloader.last_wait_ms,
+                }
+        if prepared is None:
+            prepared = yield from prepare_level_steps(
+                self.level,
+                scaling=TILE_SCALING,
+                layer_options=LAYER_OPTIONS,
+                skip_layers=LOAD_SKIPPED_LAYERS,
+                query_layers=QUERY_LAYERS,
+                level_enemies=LEVEL_ENEMIES,
+                builders=self.level_builders,
+                preload_images=self.sprite_images(),
+            )
+        
+        # Tiled map (loaded through the compiled level cache)
+        yield "scene build", "Building the scene"
+        self.tile_map = prepared.tile_map
+        self.load_stats = prepared.load_stats
+        self.level_extras = prepared.extras
         self.scene = arcade.Scene.from_tilemap(self.tile_map)
         
-        # Initialize player with character assets
-        characters_path = os.path.join(os.path.dirname(__file__), 
-        "characters")
-        self.player = Player(characters_path)
+        # Solid platform tiles for raycasts (merged into collision
+        # rectangles only if the arcade engine needs them)
+        self.platform_walls = None
+        self.wall_grid = prepared.wall_grid
+        
+        # With a packed bundle, character and enemy textures are cut
+        # from its atlas image rather than loaded file by file
+        bundle = prepared.bundle
+        if bundle is not None:
+            ASSETS.use_atlas(bundle.atlas_path, bundle.frame_regions)
+        
+        # Create the player once; later levels keep it (and its
+        # textures) and only reset its state
+        yield "asset load", "Loading characters"
+        if self.player is None:
+            characters_path = os.path.join(os.path.dirname(__file__),
+            "characters")
+            self.player = Player(characters_path)
+            self.projectile_types = build_projectile_types(
+            self.player.attack_textures_by_character)
+        else:
+            self.player.reset_state()
         
         # Set player spawn point from map data
-        self.set_player_spawn_from_start_layer()
+        if bundle is not None and bundle.spawn is not None:
+            self.set_player_spawn(bundle.spawn[0] * TILE_SCALING,
+                                  bundle.spawn[1] * TILE_SCALING)
+        else:
+            self.set_player_spawn_from_start_layer()
         
         # Add player to the scene
         self.scene.add_sprite("Player", self.player.sprite)
         
-        # Assign map layers to appropriate variables for game logic
-        self.climbable_walls = self.scene["Climbable"]
-        self.danger = self.scene["Danger"]
-        
-        # Handle optional map layers (some levels may not have these)
-        if "Exit" in self.scene:
-            self.exits = self.scene["Exit"]
-        else:
-            self.exits = arcade.SpriteList()
-
-        if "Checkpoint" in self.scene:
-            self.checkpoints = self.scene["Checkpoint"]
-        else:
-            self.checkpoints = arcade.SpriteList()
+        # Assign map layer grids to appropriate variables for game
+        # logic (optional layers are None when a level lacks them)
+        self.tile_grids = prepared.tile_grids
+        self.climbable_walls = self.tile_grids["Climbable"]
+        self.danger = self.tile_grids["Danger"]
+        self.exits = self.tile_grids.get("Exit")
+        self.checkpoints = self.tile_grids.get("Checkpoint")
         
         # Setup enemies for this level
-        self.setup_enemies()
+        yield "scene build", "Placing enemies"
+        if bundle is not None:
+            self.setup_enemies(bundle.enemies)
+        else:
+            self.setup_enemies()
+        
+        # Hazards, exits and checkpoints act through their trigger
+        # zones' handlers, called only when the player's zones change
+        yield "physics setup", "Setting up physics and triggers"
+        self.hazard_zones = TriggerZones(self.danger,
+        on_stay=self.on_hazard_stay)
+        self.exit_zones = None
+        if self.exits is not None:
+            self.exit_zones = TriggerZones(self.exits,
+            on_enter=self.on_exit_entered)
+        self.checkpoint_zones = None
+        if self.checkpoints is not None:
+            self.checkpoint_zones = TriggerZones(self.checkpoints,
+            on_enter=self.on_checkpoint_entered,
+            on_stay=self.on_checkpoint_stay)
         
         # Initialize physics engine for platformer movement
-        self.physics_engine = arcade.PhysicsEnginePlatformer(
-            self.player.sprite, walls=self.scene["Platforms"], 
-            gravity_constant=GRAVITY
-        )
+        self.physics_engine = self.create_physics_engine()
 
-        # Setup camera system
-        self.camera = arcade.Camera2D()
-        self.gui_camera = arcade.Camera2D()
-        self.background_color = arcade.csscolor.DARK_SLATE_BLUE
-        
         # Calculate map boundaries
         self.end_of_map = (self.tile_map.width * 
         self.tile_map.tile_width) * self.tile_map.scaling
-        
-        # Setup UI elements
-        self.setup_health_bar()
+        self.camera_position = self.player.sprite.position
+        self.view_rect = self.camera_view_rect()
+        
+        # Stream the registered consumers' regions around the camera,
+        # starting with the ones it shows (worlds without consumers,
+        # such as headless ones, have nothing to stream)
+        yield "scene build", "Building level graphics"
+        if STREAM_REGIONS and self.region_consumers:
+            level = self.tile_map.level
+            self.streamer = RegionStreamer(level, scaling=TILE_SCALING)
+            for name, create in self.region_consumers.items():
+                self.streamer.add_consumer(name, create(level))
+            self.streamer.update(*self.view_rect)
+        
+        # Start the level's rewind history
+        if self.rewind:
+            self.rewind.reset(self)
+        
+        # Let the renderer rebuild its level graphics
+        if self.on_level_loaded:
+            self.on_level_loaded()
+        
+        # Start preparing the next level while this one is played
+        if self.preloader and self.level < LAST_LEVEL:
+            self.preloader.request(self.level + 1)
 
+    def enable_preloading(self):
+        """
+        Prepare each next level on a background thread while the
+        current one is played, so level switches only swap data in.
+        Register level_builders before calling this.
+        """
+        self.preloader = LevelPreloader(
+            builders=self.level_builders,
+            scaling=TILE_SCALING,
+            layer_options=LAYER_OPTIONS,
+            skip_layers=LOAD_SKIPPED_LAYERS,
+            query_layers=QUERY_LAYERS,
+            level_enemies=LEVEL_ENEMIES,
+        )
+
+    def load_report(self):
+        """
+        Return lines describing the most recent level load: map cache,
+        image decoding and, when it came from the preloader, how long
+        it was prepared for and how long the switch waited.
+        """
+        stats = self.load_stats
+        lines = [f"Loaded {stats['map']} (cache {stats['cache']}): "
+                 f"read {stats['read_ms']:.1f} ms, "
+                 f"build {stats['build_ms']:.1f} ms"]
+        decode = stats.get("decode")
+        if decode and decode["files"]:
+            lines.append(f"Decoded {decode['files']} images on "
+                         f"{decode['workers']} threads in "
+                         f"{decode['wall_ms']:.1f} ms "
+                         f"({decode['decode_ms']:.1f} ms of decoding)")
+        preload = stats.get("preload")
+        if preload:
+            lines.append(f"Level{self.level} was preloaded in "
+                         f"{preload['prepare_ms']:.1f} ms; the switch "
+                         f"waited {preload['wait_ms']:.1f} ms for it")
+        return lines
+
+    def create_physics_engine(self):
+        """
+        Create the platformer physics engine for the current player
+        sprite and level.
+        """
+        if USE_TILE_PHYSICS:
+            return TileGridPhysicsEngine(
+                self.player.sprite, self.tile_grids["Platforms"],
+                gravity_constant=GRAVITY)
+        # Solid platform tiles merged into collision rectangles
+        if self.platform_walls is None:
+            self.platform_walls, _ = build_collision_list(
+                self.tile_map.level, "Platforms", scaling=TILE_SCALING)
+        return arcade.PhysicsEnginePlatformer(
+            self.player.sprite, walls=self.platform_walls, 
+            gravity_constant=GRAVITY
+        )
+
+    def sprite_images(self):
+        """
+        Return the sprite image files the current level needs: the
+        characters' textures (until the player exists), the health
+        hearts and the level's enemies.
+        """
+        game_dir = os.path.dirname(os.path.abspath(__file__))
+        paths = []
+        if self.player is None:
+            characters_path = os.path.join(game_dir, "characters")
+            for filename in ASSETS.listdir(characters_path):
+                if not filename.lower().endswith('.png'):
+                    continue
+                paths.append(os.path.join(characters_path, filename))
+                # Animation frames are named after their character
+                character_name = os.path.splitext(filename)[0]
+                character_path = os.path.join(characters_path,
+                character_name)
+                paths.extend(
+                    os.path.join(character_path, name)
+                    for name in ASSETS.listdir(character_path)
+                    if name.startswith(character_name + "_") and
+                    name.lower().endswith('.png'))
+        assets_path = os.path.join(game_dir, "Assets")
+        paths.append(os.path.join(assets_path, "heart_full.png"))
+        paths.append(os.path.join(assets_path, "heart_empty.png"))
+        for config in LEVEL_ENEMIES.get(self.level, []):
+            paths.append(os.path.join(assets_path, config[0]))
+        return paths
+    
     def set_player_spawn_from_start_layer(self):
         """
         Find the start position marker in the map 
@@ -990,13 +1095,16 @@ class GameView(arcade.Window):
             start_sprites = self.scene["Start"]
             if len(start_sprites) > 0:
                 start_sprite = start_sprites[0]
-                spawn_x = start_sprite.center_x
-                spawn_y = start_sprite.center_y
-                
-                # Set spawn point and move player there
-                self.player.set_spawn_point(spawn_x, spawn_y)
-                self.player.sprite.center_x = spawn_x
-                self.player.sprite.center_y = spawn_y
+                self.set_player_spawn(start_sprite.center_x,
+                                      start_sprite.center_y)
+
+    def set_player_spawn(self, spawn_x, spawn_y):
+        """
+        Set the player's spawn point and move the player there.
+        """
+        self.player.set_spawn_point(spawn_x, spawn_y)
+        self.player.sprite.center_x = spawn_x
+        self.player.sprite.center_y = spawn_y
 
     def switch_to_next_level(self):
         """
@@ -1004,206 +1112,61 @@ class GameView(arcade.Window):
         Resets player velocity and reinitializes 
         the game with new level data.
         """
-        if self.level < 3:  # Maximum of 3 levels
+        if self.level < LAST_LEVEL:
             self.level += 1
             # Stop player movement before switching
             self.player.sprite.change_x = 0
             self.player.sprite.change_y = 0
             self.setup()  # Reinitialize with new level
         
-    def setup_enemies(self):
+    def setup_enemies(self, enemy_configs=None):
         """
         Initialize all enemies for 
         the current level based on configuration data.
         Sets up enemy positions, movement boundaries,
         and behavior patterns.
+        enemy_configs defaults to the level's LEVEL_ENEMIES entry.
         """
+        # Enemy simulation state lives in the manager's arrays;
+        # self.enemies holds the sprites for drawing and collisions
+        if enemy_configs is None:
+            enemy_configs = LEVEL_ENEMIES.get(self.level, [])
         self.enemies = arcade.SpriteList()
+        self.enemy_manager = EnemyManager(self.enemies,
+        capacity=len(enemy_configs))
         
         # Path to enemy sprite assets
         assets_path = os.path.join(os.path.dirname(__file__),
-        "assets")
+        "Assets")
         
-        # Get enemy configuration for current level
-        enemy_configs = LEVEL_ENEMIES.get(self.level, [])
-        
-        # Create each enemy from configuration data
+        # Create each enemy from configuration data, with its
+        # position, patrol boundaries and speeds
         for (monster_file, x_pos, y_pos, boundary_left, boundary_right, 
         boundary_bottom, boundary_top, speed_x, speed_y) in enemy_configs:
             enemy = Enemy(os.path.join(assets_path, monster_file))
+            self.enemy_manager.add(
+                enemy, x_pos, y_pos,
+                boundary_left, boundary_right, boundary_bottom, boundary_top,
+                speed_x, speed_y, enemy.start_hp)
             
-            # Set initial position
-            enemy.center_x = x_pos
-            enemy.center_y = y_pos
-            
-            # Set movement boundaries for AI patrolling
-            enemy.boundary_left = boundary_left
-            enemy.boundary_right = boundary_right
-            enemy.boundary_bottom = boundary_bottom
-            enemy.boundary_top = boundary_top
-            
-            # Set movement speeds
-            enemy.speed_x = speed_x
-            enemy.speed_y = speed_y
-            enemy.change_x = speed_x
-            enemy.change_y = speed_y
-            
-            self.enemies.append(enemy)
-            
-    def setup_health_bar(self):
+    def step(self, delta_time):
         """
-        Create visual health display using heart sprites.
-        Sets up both full and empty heart textures
-        for each health point.
+        Advance the simulation by one step and record the new state
+        for rewinding, or while REWIND_KEY is held, go back one step
+        instead.
         """
-        self.health_bar_list = arcade.SpriteList()
-        
-        # Health bar display parameters
-        heart_size = 30
-        heart_spacing = 35
-        start_x = 20
-        start_y = WINDOW_HEIGHT - 40
-        
-        # Load heart textures
-        assets_path = os.path.join(os.path.dirname(__file__), "Assets")
-        self.heart_full_texture = arcade.load_texture(os.path.join(
-        assets_path, "heart_full.png"))
-        self.heart_empty_texture = arcade.load_texture(os.path.join(
-        assets_path, "heart_empty.png"))
-        
-        # Create heart sprites for each health point
-        for i in range(self.player.max_health):
-            x = start_x + (i * heart_spacing)
-            
-            # Full heart sprite (shown when player has this health point)
-            full_heart = arcade.Sprite()
-            full_heart.texture = self.heart_full_texture
-            full_heart.center_x = x
-            full_heart.center_y = start_y
-            full_heart.scale = heart_size / self.heart_full_texture.width
-            full_heart.heart_index = i
-            full_heart.is_full = True
-            
-            # Empty heart sprite (shown when player is missing 
-            # this health point)
-            empty_heart = arcade.Sprite()
-            empty_heart.texture = self.heart_empty_texture
-            empty_heart.center_x = x
-            empty_heart.center_y = start_y
-            empty_heart.scale = heart_size / self.heart_empty_texture.width
-            empty_heart.heart_index = i
-            empty_heart.is_full = False
-            
-            self.health_bar_list.append(full_heart)
-            self.health_bar_list.append(empty_heart)
-
-    def update_health_display(self):
-        """
-        Update the visual health bar to reflect current player health.
-        Shows/hides full and empty hearts based on current health value.
-        """
-        for sprite in self.health_bar_list:
-            if hasattr(sprite, 'heart_index'):
-                if sprite.is_full:
-                    # Show full hearts for health points 
-                    # the player still has
-                    sprite.visible = sprite.heart_index < self.player.health
-                else:
-                    # Show empty hearts for health points 
-                    # the player has lost
-                    sprite.visible = sprite.heart_index >= self.player.health
-
-    def draw_instructions(self):
-        """
-        Draw the instruction overlay showing game controls 
-        and character abilities. Only displays when show_instructions is
-        True.
-        """
-        if not self.show_instructions:
+        if self.rewinding and self.rewind:
+            with self.profiler.scope("rewind"):
+                self.rewind.rewind(self)
             return
-            
-        # Draw semi-transparent background for instructions
-        arcade.draw_lrbt_rectangle_filled(
-            10, 650, WINDOW_HEIGHT - 400, WINDOW_WIDTH - 10,
-            (0, 0, 0, 180)  # Black with transparency
-        )
-        
-        # Instruction text content
-        instructions = [
-            "CONTROLS:",
-            "A/D or Arrows - Move",
-            "W/Up - Jump",
-            "1 - Switch to Archer",
-            "2 - Switch to Knight",
-            "3 - Switch to Wizard",
-            "E - Attack",   
-            "Space - Character Specific Ability.",
-            "KNIGHT - Ability: Climb, Attack: Forward Slash",
-            "ARCHER - Ability: Dash, Attack: Arrow Shoot",
-            "WIZARD - Ability: Levitate, Attack: Firey Terrain",
-            "Hint 1: You can only levitate while your on the ground.",
-            "Hint 2: You can't fall while Dashing",
-            "Hint 3: You won't fall if your climbing on a wall.",
-            "Bonus Hint: Kill all the enemies on level 3 to win!",
-            "ESC - Reset position",
-            "I - Toggle instructions",
-        ]
-        
-        # Draw each instruction line
-        y_start = WINDOW_HEIGHT - 40
-        line_height = 22
-        
-        for i, line in enumerate(instructions):
-            if line:  # Skip empty lines
-                arcade.draw_text(
-                    line,
-                    20, y_start - (i * line_height),
-                    arcade.color.WHITE, 14,
-                    font_name="Arial"
-                )
-
-    def on_draw(self):
-        """
-        Render all game elements to the screen.
-        """
-        self.clear()
-        
-        # Check for victory condition
-        if self.game_won:
-            arcade.draw_text(
-                "VICTORY!",
-                WINDOW_WIDTH // 2,
-                WINDOW_HEIGHT // 2,
-                arcade.color.YELLOW,
-                font_size=72,
-                anchor_x="center",
-                anchor_y="center",
-                bold=True,
-            )
-            return 
-            
-        # Render world objects with camera
-        self.camera.use()
-        self.scene.draw()           # Map tiles and platforms
-        self.enemies.draw()         # Enemy sprites
-        
-        # Draw enemy health bars
-        for enemy in self.enemies:
-            enemy.draw_hp_bar()
-        
-        # Draw attack/projectile sprites
-        self.knight_attacks.draw()
-        self.archer_arrows.draw()
-        self.wizard_fires.draw()
-        
-        # Render UI elements without camera (fixed position)
-        self.gui_camera.use()
-        self.health_bar_list.draw()
-        self.draw_instructions()
-
-    def on_update(self, delta_time):
+        self.advance(delta_time)
+        if self.rewind:
+            with self.profiler.scope("rewind_capture"):
+                self.rewind.capture(self)
+    
+    def advance(self, delta_time):
         """
-        Main game loop update function. 
+        Advance the simulation by one step. 
         Handles all game logic including:
         - Player movement and abilities
         - Enemy behavior
@@ -1212,147 +1175,179 @@ class GameView(arcade.Window):
         - Level progression
         - Health and damage systems
         """
+        profiler = self.profiler
+        
         # Update player abilities (dash, float, invincibility timers)
-        self.player.update_abilities(delta_time)
+        with profiler.scope("abilities"):
+            self.player.update_abilities(delta_time)
         
         # Make camera follow player
-        self.camera.position = self.player.sprite.position
+        self.camera_position = self.player.sprite.position
+        self.view_rect = self.camera_view_rect()
+        self.steps += 1
+        
+        # Bring in the regions around the view (waiting only for ones
+        # in view that are not built yet)
+        if self.streamer:
+            with profiler.scope("streaming"):
+                self.streamer.update(*self.view_rect)
         
         # Check for damage from hazards
-        if arcade.check_for_collision_with_list(
-            self.player.sprite, self.danger):
-            self.player.take_damage()
-            self.update_health_display()
+        with profiler.scope("hazards"):
+            self.hazard_zones.update(self.player.sprite)
         
         # Handle climbing mechanics
-        touching_climbable = self.player.is_touching_climbable_wall(
-        self.climbable_walls)
-        if self.player.update_movement():
-            return  # Early return if special movement is active
+        with profiler.scope("movement"):
+            touching_climbable = self.player.is_touching_climbable_wall(
+            self.climbable_walls)
+            if self.player.update_movement():
+                # Early return if special movement is active (enemies
+                # stay put, but the view moved, so sync what it shows)
+                region = self.enemy_sync_region()
+                self.enemy_manager.activate(*region)
+                self.enemy_manager.sync(*region)
+                return
             
         # Adjust physics for climbing (disable gravity when climbing)
-        if (self.player.is_climbing and touching_climbable and
-        self.player.sprite == self.player.knight_sprite):
-            self.physics_engine.gravity_constant = 0
-        else:
-            self.player.is_climbing = False
-            self.physics_engine.gravity_constant = GRAVITY
-            self.physics_engine.update()
+        with profiler.scope("physics"):
+            if (self.player.is_climbing and touching_climbable and
+            self.player.sprite == self.player.knight_sprite):
+                self.physics_engine.gravity_constant = 0
+            else:
+                self.player.is_climbing = False
+                self.physics_engine.gravity_constant = GRAVITY
+                self.physics_engine.update()
             
         # Check for falling off the map
         if self.player.sprite.center_y <= self.map_bottom: 
             self.player.reset()
             
         # Update player animations
-        self.player.update_animations(delta_time, self.player.is_climbing,
-        touching_climbable, self.climbable_walls)
+        with profiler.scope("animations"):
+            self.player.update_animations(delta_time,
+            self.player.is_climbing, touching_climbable,
+            self.climbable_walls)
 
-        # Update all game entities
-        self.enemies.update(delta_time)
-        self.knight_attacks.update(delta_time)
-        self.archer_arrows.update()
-        self.wizard_fires.update(delta_time)
+        # Update all game entities (enemies far from the view sleep
+        # and are woken up exactly where they would have been)
+        with profiler.scope("entities"):
+            self.enemy_manager.update(delta_time)
+            self.projectiles.update(delta_time)
+            region = self.enemy_sync_region()
+            self.enemy_manager.activate(*region)
+            self.enemy_manager.sync(*region)
+            self.enemy_grid.rebuild(self.enemy_manager, *region)
         
         # Handle level progression (levels 1-2 have exits, 
         # lmevel 3 requires killing all enemies)
-        if self.level < 3 and arcade.check_for_collision_with_list(
-        self.player.sprite, self.exits):
-            self.switch_to_next_level()
-        
-        # Clean up arrows that hit walls or go off-screen
-        for arrow in self.archer_arrows:
-            # Calculate camera bounds for cleanup
-            camera_left = self.camera.position.x - WINDOW_WIDTH // 2
-            camera_right = self.camera.position.x + WINDOW_WIDTH // 2
-            camera_bottom = self.camera.position.y - WINDOW_HEIGHT // 2
-            camera_top = self.camera.position.y + WINDOW_HEIGHT // 2
+        with profiler.scope("exits"):
+            if self.exit_zones is not None:
+                self.exit_zones.update(self.player.sprite)
+        
+        # Clean up arrows that hit walls (raycast along each arrow's
+        # path through the tile grid) or go off-screen
+        with profiler.scope("arrow_cleanup"):
+            self.projectiles.cull(self.wall_grid, *self.view_rect)
+        
+        # Handle attack collision with enemies (each projectile type's
+        # damage and pierce come from PROJECTILE_TYPES)
+        with profiler.scope("attacks"):
+            enemies_to_remove = self.projectiles.resolve_hits(
+            self.enemy_grid)
             
-            # Remove arrow if it hits a wall or goes too far off-screen
-            if (arcade.check_for_collision_with_list(
-            arrow, self.scene["Platforms"]) or
-                arrow.center_x < camera_left - 200 or
-                arrow.center_x > camera_right + 200 or
-                arrow.center_y < camera_bottom - 200 or
-                arrow.center_y > camera_top + 200):
-                arrow.remove_from_sprite_lists()
-        
-        # Handle attack collision with enemies
-        enemies_to_remove = []
-        
-        # Knight attacks (high damage, short range)
-        for attack in self.knight_attacks:
-            hit_enemies = arcade.check_for_collision_with_list(
-            attack, self.enemies)
-            for enemy in hit_enemies:
-                if enemy.take_damage(3):  # Knight does 3 damage
-                    enemies_to_remove.append(enemy)
-                attack.remove_from_sprite_lists()
-                break  # Attack is consumed after hitting one enemy
-        
-        # Archer arrows (low damage, long range)
-        for arrow in self.archer_arrows:
-            hit_enemies = arcade.check_for_collision_with_list(
-            arrow, self.enemies)
-            for enemy in hit_enemies:
-                if enemy.take_damage(1):  # Archer does 1 damage
-                    enemies_to_remove.append(enemy)
-                arrow.remove_from_sprite_lists()
-                break  # Arrow is consumed after hitting one enemy
-                
-        # Wizard fire (medium damage, area effect)
-        for fire in self.wizard_fires:
-            hit_enemies = arcade.check_for_collision_with_list(
-            fire, self.enemies)
-            for enemy in hit_enemies:
-                if enemy.take_damage(2):  # Wizard does 2 damage
-                    enemies_to_remove.append(enemy)
-                fire.remove_from_sprite_lists()
-                break  # Fire is consumed after hitting one enemy
-        
-        # Remove defeated enemies from the game
-        for enemy in enemies_to_remove:
-            enemy.remove_from_sprite_lists()
+            # Remove defeated enemies from the game
+            for enemy in enemies_to_remove:
+                if enemy.manager:
+                    self.enemy_manager.remove(enemy)
+                    self.enemy_grid.discard(enemy)
                 
         # Handle player collision with enemies (damage player)
-        if arcade.check_for_collision_with_list(
-        self.player.sprite, self.enemies):
-            if not self.player.is_invincible:
-                self.player.take_damage()
-                self.update_health_display()
+        with profiler.scope("enemy_contact"):
+            if self.enemy_grid.query(self.player.sprite):
+                if not self.player.is_invincible:
+                    self.player.take_damage()
         
         # Handle checkpoint system (heal player and set new spawn point)
-        if self.checkpoints:
-            hit_checkpoints = arcade.check_for_collision_with_list(
-            self.player.sprite, self.checkpoints)
-            if hit_checkpoints: 
-                # Restore full health at checkpoint
-                self.player.health = self.player.max_health
-                self.update_health_display()
-                
-                # Set new spawn points for newly activated checkpoints
-                for checkpoint in hit_checkpoints:
-                    checkpoint_id = (
-                    f"{checkpoint.center_x}_{checkpoint.center_y}")
-                    if checkpoint_id not in self.activated_checkpoints:
-                        self.activated_checkpoints.add(checkpoint_id)
-                        self.player.set_spawn_point(
-                        checkpoint.center_x, checkpoint.center_y)
+        with profiler.scope("checkpoints"):
+            if self.checkpoint_zones is not None:
+                self.checkpoint_zones.update(self.player.sprite)
         
         # Check victory condition for level 3
         if self.level == 3 and len(self.enemies) == 0:
             self.game_won = True
             return
 
-    def on_key_press(self, key, modifiers):
+    def on_hazard_stay(self, zones):
+        """
+        Damage the player every step it spends in a hazard (taking
+        damage is a no-op while it is invincible).
+        """
+        self.player.take_damage()
+
+    def on_exit_entered(self, zones):
+        """
+        Move on to the next level when the player reaches an exit
+        (the last level has none: it is won by defeating every enemy).
+        """
+        if self.level < LAST_LEVEL:
+            self.switch_to_next_level()
+
+    def on_checkpoint_entered(self, zones):
+        """
+        Make newly reached checkpoints the player's spawn point.
+        """
+        for zone in zones:
+            checkpoint_id = (self.level, zone.index)
+            if checkpoint_id not in self.activated_checkpoints:
+                self.activated_checkpoints.add(checkpoint_id)
+                self.player.set_spawn_point(zone.center_x, zone.center_y)
+
+    def on_checkpoint_stay(self, zones):
+        """
+        Keep the player at full health while at a checkpoint.
+        """
+        self.player.health = self.player.max_health
+
+    def camera_view_rect(self):
+        """
+        Return the (left, bottom, right, top) world-space rectangle
+        the camera shows.
+        """
+        camera_x, camera_y = self.camera_position
+        return (camera_x - WINDOW_WIDTH / 2, camera_y - WINDOW_HEIGHT / 2,
+                camera_x + WINDOW_WIDTH / 2, camera_y + WINDOW_HEIGHT / 2)
+
+    def enemy_sync_region(self):
+        """
+        Return the (left, bottom, right, top) region of enemy centres
+        whose sprites must be up to date this step: the camera view
+        (which always contains the player) widened to cover every
+        projectile, so any enemy that can be seen or hit is included.
+        """
+        left, bottom, right, top = self.view_rect
+        for sprite in self.projectiles.active:
+            left = min(left, sprite.left)
+            right = max(right, sprite.right)
+            bottom = min(bottom, sprite.bottom)
+            top = max(top, sprite.top)
+        
+        # Widen by the largest enemy's half size (plus a pixel)
+        manager = self.enemy_manager
+        return (left - manager.half_width - 1,
+                bottom - manager.half_height - 1,
+                right + manager.half_width + 1,
+                top + manager.half_height + 1)
+
+    def key_press(self, key):
         """
         Handle keyboard input for player movement,
         abilities, and game controls.
         """
-        # Toggle instruction display
-        if key == arcade.key.I:
-            self.show_instructions = not self.show_instructions
+        # Step back through the rewind history while held
+        if key == REWIND_KEY:
+            self.rewinding = True
             return
-            
+        
         touching_climbable = self.player.is_touching_climbable_wall(
         self.climbable_walls)
         
@@ -1421,20 +1416,21 @@ class GameView(arcade.Window):
         if key in [arcade.key.E]:
             attack = self.player.perform_attack()
             if attack:
-                # Add attack to appropriate sprite
-                # list based on character
-                character_name = self.player.sprite.character_name
-                if character_name == Knight:
-                    self.knight_attacks.append(attack)
-                elif character_name == Archer:
-                    self.archer_arrows.append(attack)
-                elif character_name == Wizard:
-                    self.wizard_fires.append(attack)
+                # Launch a pooled projectile of the character's type
+                sprite = self.player.sprite
+                self.projectiles.spawn(
+                    self.projectile_types[attack],
+                    sprite.center_x, sprite.center_y,
+                    self.player.facing_direction)
                     
-    def on_key_release(self, key, modifiers):
+    def key_release(self, key):
         """
         Handle keyboard key release events.
         """
+        if key == REWIND_KEY:
+            self.rewinding = False
+            return
+        
         # Stop horizontal movement when releasing movement keys
         if key in [arcade.key.LEFT,
         arcade.key.A, arcade.key.RIGHT, arcade.key.D]:
@@ -1494,20 +1490,462 @@ class GameView(arcade.Window):
         self.player.is_attacking = False
         self.player.attack_timer = 0
         
-        # Add new sprite to scene and update physics engine
+        # Add new sprite to scene and point the physics engine at it
         self.scene.add_sprite("Player", self.player.sprite)
-        self.physics_engine = arcade.PhysicsEnginePlatformer(
-            self.player.sprite, walls=self.scene["Platforms"],
-        gravity_constant=GRAVITY)
+        self.physics_engine.player_sprite = self.player.sprite
+
+class GameView(arcade.Window):
+    """
+    Main game window class. Renders a GameWorld, feeds it keyboard
+    input and draws the UI (health bar, instructions, victory screen).
+    """
+    
+    def __init__(self):
+        """window, world and UI state variables."""
+        super().__init__(WINDOW_WIDTH, WINDOW_HEIGHT, WINDOW_TITLE)
+        
+        # Game simulation (level, player, enemies, projectiles)
+        self.world = GameWorld()
+        self.world.on_level_loaded = self.on_level_loaded
+        self.level_chunks = None  # Baked static tile layers
+        
+        # Chunks are baked region by region on the world's streaming
+        # thread, or otherwise along with each level's map (so the next
+        # level's are baked by the background preloader)
+        if STREAM_REGIONS:
+            self.world.region_consumers["chunks"] = self.create_level_chunks
+        else:
+            self.world.level_builders["chunks"] = self.build_level_chunks
+        self.world.enable_preloading()
+        
+        # Camera system
+        self.camera = None      # World camera (follows player)
+        self.gui_camera = None  # UI camera (stays fixed)
+        
+        # UI state variables
+        self.show_instructions = True
+        
+        # Frame timing overlay (F3), shares the world's profiler
+        self.profiler = self.world.profiler
+        self.profiler_overlay = ProfilerOverlay(
+            self.profiler, WINDOW_WIDTH - 340, WINDOW_HEIGHT - 30,
+            status_lines=lambda: [self.world.preloader.status_text(),
+                                  self.world.enemy_grid.stats_text()] + (
+                [self.world.streamer.status_text()]
+                if self.world.streamer else []) + (
+                [self.world.rewind.status_text(),
+                 self.world.rewind.capture_text()]
+                if self.world.rewind else []))
+        self.show_profiler = False
+        
+        # Enemies, their health bars and projectiles, culled to the
+        # camera view and drawn in one batch each
+        self.entity_renderer = EntityRenderer()
+        
+        # Input recording/replay (see replay.py)
+        self.record_path = None
+        self.recorder = None
+        self.replay = None
+        
+        # UI elements (built in setup)
+        self.hud = None
+        
+        # First level being built across frames (see start_loading),
+        # the loading screen text, and the startup profile to print
+        # when it is done (with --profile-startup)
+        self.loader = None
+        self.loading_text = None
+        self.loading_frame_drawn = False
+        self.startup_profile = None
+        self.asset_timings = False
+        
+    def setup(self):
+        """
+        Load the current level into the world and set up
+        cameras and UI elements.
+        """
+        self.start_loading()
+        self.loader.finish()
+        self.finish_loading()
+    
+    def start_loading(self):
+        """
+        Start building the current level a few stages per frame,
+        showing a loading screen with a progress bar until it is done.
+        """
+        # Setup camera system
+        self.camera = arcade.Camera2D()
+        self.gui_camera = arcade.Camera2D()
+        self.background_color = arcade.csscolor.DARK_SLATE_BLUE
+        
+        self.loader = StagedLoader(self.world.setup_steps(),
+        self.world.setup_stage_count(), self.startup_profile)
+        self.loading_text = arcade.Text(
+            "Loading...", WINDOW_WIDTH // 2,
+            WINDOW_HEIGHT // 2 + LOADING_BAR_HEIGHT, arcade.color.WHITE,
+            font_size=18, anchor_x="center", anchor_y="bottom")
+        self.loading_frame_drawn = False
+    
+    def draw_loading_frame(self):
+        """
+        Draw the loading screen: the stage being built and a progress
+        bar.
+        """
+        self.gui_camera.use()
+        loader = self.loader
+        self.loading_text.text = f"Loading: {loader.label}"
+        self.loading_text.draw()
+        left = (WINDOW_WIDTH - LOADING_BAR_WIDTH) / 2
+        bottom = WINDOW_HEIGHT / 2 - LOADING_BAR_HEIGHT
+        arcade.draw_lrbt_rectangle_filled(
+            left, left + LOADING_BAR_WIDTH * loader.progress,
+            bottom, bottom + LOADING_BAR_HEIGHT, arcade.color.WHITE)
+        arcade.draw_lrbt_rectangle_outline(
+            left, left + LOADING_BAR_WIDTH,
+            bottom, bottom + LOADING_BAR_HEIGHT, arcade.color.WHITE, 2)
+        if not self.loading_frame_drawn:
+            self.loading_frame_drawn = True
+            if self.startup_profile:
+                self.startup_profile.mark(
+                    "first loading frame", startup_ms())
+    
+    def finish_loading(self):
+        """
+        Set up the cameras, HUD and GPU atlas once the level is built.
+        """
+        self.loader = None
+        self.loading_text = None
+        profile = self.startup_profile
+        start = time.perf_counter()
+        
+        self.camera.position = self.world.camera_position
+        if self.record_path:
+            self.recorder = InputRecorder(self.world)
+        
+        # Setup UI elements
+        self.setup_hud()
+        
+        # Upload every loaded texture to the GPU atlas now rather
+        # than on first draw
+        ASSETS.pack_atlas(self.ctx.default_atlas)
+        if profile:
+            profile.add_stage("asset load", "HUD and GPU atlas",
+                              (time.perf_counter() - start) * 1000)
+        if self.asset_timings:
+            print_asset_timings()
+
+    def on_level_loaded(self):
+        """
+        Rebuild level graphics after the world loads a level.
+        """
+        for line in self.world.load_report():
+            print(line)
+        self.entity_renderer.clear()
+        if STREAM_REGIONS:
+            self.level_chunks = self.world.streamer.consumers["chunks"]
+            print(f"Streaming {self.world.streamer.columns}x"
+                  f"{self.world.streamer.rows} regions; "
+                  f"{len(self.level_chunks.chunks)} chunks baked in view")
+            return
+        self.level_chunks = self.world.level_extras["chunks"]
+        print(f"Baked {len(self.level_chunks.chunks)} chunks "
+              f"({self.level_chunks.unique_textures} unique textures) "
+              f"in {self.level_chunks.bake_ms:.1f} ms")
+
+    def build_level_chunks(self, level):
+        """
+        Bake every static tile layer of a level into chunk textures
+        for drawing. Runs on the preloader's thread for later levels,
+        so it must not touch OpenGL.
+        """
+        return ChunkRenderer(level, level.layer_names, scaling=TILE_SCALING)
+
+    def create_level_chunks(self, level):
+        """
+        Create a chunk renderer that bakes a level's chunks as the
+        region streamer brings them in and drops them when they are
+        evicted.
+        """
+        return ChunkRenderer(level, level.layer_names, scaling=TILE_SCALING,
+                             streamed=True)
+
+    def setup_hud(self):
+        """
+        Build the HUD (hearts, instructions and victory message) once.
+        """
+        assets_path = os.path.join(os.path.dirname(__file__), "Assets")
+        self.hud = Hud(
+            WINDOW_WIDTH, WINDOW_HEIGHT, self.world.player.max_health,
+            ASSETS.texture(os.path.join(assets_path, "heart_full.png")),
+            ASSETS.texture(os.path.join(assets_path, "heart_empty.png")),
+            INSTRUCTIONS,
+            # Semi-transparent background for instructions
+            (10, 650, WINDOW_HEIGHT - 420, WINDOW_WIDTH - 10))
+        self.hud.set_health(self.world.player.health)
+        self.hud.set_instructions_visible(self.show_instructions)
+
+    def on_draw(self):
+        """
+        Render all game elements to the screen.
+        """
+        self.clear()
+        
+        # The first level is still being built
+        if self.loader:
+            self.draw_loading_frame()
+            return
+        
+        # Check for victory condition (the HUD shows the message)
+        world = self.world
+        if world.game_won:
+            self.gui_camera.use()
+            self.hud.draw()
+            return 
+            
+        # Render world objects with camera
+        profiler = self.profiler
+        self.camera.use()
+        camera_x, camera_y = self.camera.position
+        view = (camera_x - WINDOW_WIDTH / 2, camera_y - WINDOW_HEIGHT / 2,
+                camera_x + WINDOW_WIDTH / 2, camera_y + WINDOW_HEIGHT / 2)
+        with profiler.scope("draw_tiles"):
+            self.level_chunks.draw(*view)  # Map tiles and platforms
+        
+        # Pick the enemies, bars and projectiles in view
+        with profiler.scope("draw_culling"):
+            self.entity_renderer.update(world, *view)
+        with profiler.scope("draw_sprites"):
+            world.scene["Player"].draw()  # Player sprite
+            self.entity_renderer.draw_enemies()
+        
+        # Draw enemy health bars
+        with profiler.scope("draw_hp_bars"):
+            self.entity_renderer.draw_health_bars()
+        
+        # Draw attack/projectile sprites
+        with profiler.scope("draw_projectiles"):
+            self.entity_renderer.draw_projectiles()
+        
+        # Render UI elements without camera (fixed position)
+        with profiler.scope("draw_ui"):
+            self.gui_camera.use()
+            self.hud.draw()
+        
+        # Frame timing overlay (not timed itself)
+        if self.show_profiler:
+            self.profiler_overlay.draw()
+        profiler.end_frame()
+        
+        # The startup is over once the first game frame is drawn
+        if self.startup_profile:
+            self.startup_profile.mark("first game frame", startup_ms())
+            for line in self.startup_profile.report():
+                print(line)
+            self.startup_profile = None
+
+    def on_update(self, delta_time):
+        """
+        Advance the game world and keep the camera and
+        health display in sync with it.
+        """
+        # Build a little more of the first level each frame, once the
+        # loading screen has been shown
+        if self.loader:
+            if (self.loading_frame_drawn and
+                self.loader.advance(LOADING_FRAME_BUDGET_MS)):
+                self.finish_loading()
+            return
+        # (a won game can still be rewound)
+        if self.world.game_won and not self.world.rewinding:
+            return
+        if self.replay:
+            self.replay.step()
+        elif self.recorder:
+            self.recorder.step(delta_time)
+        else:
+            self.world.step(delta_time)
+        
+        # Make camera follow player
+        self.camera.position = self.world.camera_position
+        
+        # The HUD only changes sprites when these values change
+        self.hud.set_health(self.world.player.health)
+        self.hud.set_won(self.world.game_won)
+
+    def on_key_press(self, key, modifiers):
+        """
+        Handle keyboard input: UI toggles here,
+        everything else is passed to the world.
+        """
+        if self.loader:
+            return
+        # Toggle instruction display
+        if key == arcade.key.I:
+            self.show_instructions = not self.show_instructions
+            self.hud.set_instructions_visible(self.show_instructions)
+            return
+        # Toggle the frame timing overlay (profiles only while shown,
+        # or while streaming to CSV)
+        if key == arcade.key.F3:
+            self.show_profiler = not self.show_profiler
+            self.profiler.enabled = (self.show_profiler or
+                                     self.profiler.csv_file is not None)
+            return
+        if self.replay:
+            return  # Input comes from the replay log
+        if self.recorder:
+            self.recorder.key_press(key)
+        else:
+            self.world.key_press(key)
+                    
+    def on_key_release(self, key, modifiers):
+        """
+        Handle keyboard key release events.
+        """
+        if self.loader or self.replay:
+            return
+        if self.recorder:
+            self.recorder.key_release(key)
+        else:
+            self.world.key_release(key)
+
+    def on_close(self):
+        """
+        Save the input recording and close the frame timing
+        CSV (if any) before closing.
+        """
+        self.profiler.close_csv()
+        self.world.preloader.shutdown()
+        if self.world.streamer:
+            self.world.streamer.close()
+        if self.recorder:
+            self.recorder.log.save(self.record_path)
+            print(f"Saved {len(self.recorder.log.steps)} recorded steps "
+                  f"to {self.record_path}")
+        super().on_close()
+
+def startup_ms():
+    """
+    Return the milliseconds since game.py started importing.
+    """
+    return (time.perf_counter() - IMPORT_START) * 1000
+
+
+def print_asset_timings():
+    """
+    Print how long each image took to decode at startup, slowest first.
+    """
+    report = ASSETS.decode_report()
+    print(f"Decoded {len(report)} images "
+          f"({sum(ms for _, ms in report):.1f} ms of decoding):")
+    game_dir = os.path.dirname(os.path.abspath(__file__))
+    for path, decode_ms in report:
+        print(f"  {decode_ms:8.2f} ms  {os.path.relpath(path, game_dir)}")
+
+
+def run_headless(level=1, steps=3600, delta_time=1 / 60,
+                 profile_csv=None, asset_timings=False,
+                 profile_startup=False):
+    """
+    Step a GameWorld without opening a window and
+    report how many simulation steps per second it ran.
+    With profile_csv, per-phase step timings are streamed to that
+    file and summarised at the end.
+    With profile_startup, a breakdown of the startup is printed
+    before stepping.
+    """
+    profile = None
+    if profile_startup:
+        profile = StartupProfile()
+        profile.add_phase("imports", IMPORT_MS)
+    world = GameWorld(level)
+    StagedLoader(world.setup_steps(), profile=profile).finish()
+    for line in world.load_report():
+        print(line)
+    if profile:
+        profile.mark("level ready", startup_ms())
+        for line in profile.report():
+            print(line)
+    if asset_timings:
+        print_asset_timings()
+    profiler = world.profiler
+    if profile_csv:
+        profiler.open_csv(profile_csv)
+    start = time.perf_counter()
+    for _ in range(steps):
+        world.step(delta_time)
+        profiler.end_frame()
+    elapsed = time.perf_counter() - start
+    print(f"Level {level}: {steps} steps in {elapsed:.2f} s "
+          f"({steps / elapsed:.0f} steps/s)")
+    rewind = world.rewind
+    print(rewind.status_text())
+    print(rewind.capture_text())
+    if rewind.average_capture_us() > CAPTURE_BUDGET_US:
+        print("Warning: rewind capture is over its budget")
+    if rewind.capture_percentile_us(99) > CAPTURE_PEAK_US:
+        print("Warning: rewind capture spikes are over their limit")
+    if profile_csv:
+        profiler.close_csv()
+        for name, average, maximum in profiler.summary():
+            print(f"  {name:<16} avg {average:.3f} ms, max {maximum:.3f} ms")
+    return world
+
 
 def main():
     """
     Main entry point for the game. 
-    Creates the game window and starts the game loop.
+    Creates the game window and starts the game loop,
+    or runs the simulation headless with --headless.
     """
+    parser = argparse.ArgumentParser(description=WINDOW_TITLE)
+    parser.add_argument("--headless", action="store_true",
+                        help="run the simulation without a window")
+    parser.add_argument("--level", type=int, default=1,
+                        help="level to start on")
+    parser.add_argument("--steps", type=int, default=3600,
+                        help="steps to simulate in headless mode")
+    parser.add_argument("--record", metavar="LOG",
+                        help="record input to a replay log")
+    parser.add_argument("--replay", metavar="LOG",
+                        help="play back a replay log in the window")
+    parser.add_argument("--profile-csv", metavar="CSV",
+                        help="stream per-phase frame timings to a CSV file")
+    parser.add_argument("--asset-timings", action="store_true",
+                        help="print each image's decode time at startup")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print a breakdown of the startup time")
+    args = parser.parse_args()
+
+    if args.headless:
+        run_headless(args.level, args.steps, profile_csv=args.profile_csv,
+                     asset_timings=args.asset_timings,
+                     profile_startup=args.profile_startup)
+        return
+
+    # Open the window and draw a loading screen straight away; the
+    # level is built a few stages per frame behind it
+    profile = None
+    if args.profile_startup:
+        profile = StartupProfile()
+        profile.add_phase("imports", IMPORT_MS)
+    start = time.perf_counter()
     window = GameView()
-    window.setup()
+    if profile:
+        profile.add_phase("opening the window",
+                          (time.perf_counter() - start) * 1000)
+    window.startup_profile = profile
+    window.asset_timings = args.asset_timings
+    window.world.level = args.level
+    window.record_path = args.record
+    if args.profile_csv:
+        window.profiler.open_csv(args.profile_csv)
+    if args.replay:
+        log = InputLog.load(args.replay)
+        window.world.level = log.level
+        window.replay = ReplayDriver(window.world, log)
+    window.start_loading()
     arcade.run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,454 @@
+"""
+Gym-Style Environments for Automated Play
+
+GameEnv wraps one headless GameWorld in the usual reset() / step()
+interface, so bots and parameter sweeps can drive the game without a
+window or real key events:
+
+    env = GameEnv(level=1)
+    observation = env.reset()
+    observation, reward, done, info = env.step(action)
+
+An action is a bitmask of held buttons (see the ACTION_* constants)
+plus, in bits 6-7, a character to switch to (0 keeps the current
+one). Buttons are turned into key press and release events on the
+steps they start or stop being held, exactly as a player's keyboard
+would send them, so jumping and attacking need the button released
+and pressed again.
+
+The observation is a float32 vector of OBSERVATION_SIZE values: the
+level, the player's state and the positions (relative to the player)
+and HP of the nearest enemies. The reward is REWARD_KILL per enemy
+defeated, REWARD_LEVEL per level completed, REWARD_WIN for winning and
+REWARD_DAMAGE per health point lost. An episode is done when the game
+is won or after max_steps steps.
+
+VectorGameEnv runs N independent GameEnvs spread over a pool of worker
+processes. Actions, observations, rewards and done flags live in
+shared-memory NumPy arrays, so a step sends one short message to each
+worker and copies no observation data between processes. Finished
+environments are reset automatically (the observation returned for
+them is the first of their next episode).
+
+Command line (reports total steps per second with random actions):
+    python game_env.py --envs 8 --workers 4 --steps 2000 --levels 1 2 3
+"""
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import arcade
+import numpy as np
+
+# Action bits: buttons held during the step...
+ACTION_LEFT = 1
+ACTION_RIGHT = 2
+ACTION_JUMP = 4
+ACTION_DOWN = 8
+ACTION_ABILITY = 16
+ACTION_ATTACK = 32
+BUTTON_MASK = 63
+# ...and the character to switch to (1-3, 0 keeps the current one)
+ACTION_CHARACTER_SHIFT = 6
+ACTION_COUNT = 256
+
+# Key sent for each button, in the order presses are sent
+BUTTON_KEYS = (
+    (ACTION_LEFT, arcade.key.A),
+    (ACTION_RIGHT, arcade.key.D),
+    (ACTION_JUMP, arcade.key.W),
+    (ACTION_DOWN, arcade.key.DOWN),
+    (ACTION_ABILITY, arcade.key.SPACE),
+    (ACTION_ATTACK, arcade.key.E),
+)
+CHARACTER_KEYS = (None, arcade.key.KEY_1, arcade.key.KEY_2,
+                  arcade.key.KEY_3)
+
+# Nearest enemies included in the observation
+OBSERVED_ENEMIES = 4
+# Level, x, y, velocity x, velocity y, health, character index,
+# invincible, climbing, floating, dashing, attack cooldown, enemies
+# left, then (dx, dy, hp) for each observed enemy
+PLAYER_FEATURES = 13
+OBSERVATION_SIZE = PLAYER_FEATURES + 3 * OBSERVED_ENEMIES
+
+REWARD_KILL = 1.0
+REWARD_LEVEL = 10.0
+REWARD_WIN = 50.0
+REWARD_DAMAGE = -1.0
+
+# Steps per episode before it is cut off, and the step length
+MAX_STEPS = 3600
+DELTA_TIME = 1 / 60
+
+
+class GameEnv:
+    """
+    One headless game instance with a gym-style interface.
+    """
+
+    def __init__(self, level=1, max_steps=MAX_STEPS, delta_time=DELTA_TIME,
+                 verbose=False):
+        """
+        Create an environment starting episodes on a level. Warnings
+        printed while loading it are hidden unless verbose is set.
+        """
+        self.level = level
+        self.max_steps = max_steps
+        self.delta_time = delta_time
+        self.verbose = verbose
+        self.world = None
+        self.held = 0
+        self.episode_steps = 0
+        # What the last step's reward was measured against
+        self.last_level = level
+        self.last_health = 0
+        self.last_enemies = 0
+
+    def _quietly(self):
+        """
+        Return a context hiding the game's load warnings unless
+        verbose.
+        """
+        if self.verbose:
+            return contextlib.nullcontext()
+        return contextlib.redirect_stdout(io.StringIO())
+
+    def reset(self):
+        """
+        Start a new episode on a freshly loaded level and return its
+        first observation.
+        """
+        # The game module is imported here so spawned workers only pay
+        # for it once they build an environment
+        import game
+
+        with self._quietly():
+            self.world = game.GameWorld(self.level)
+            # Agents never rewind, so skip recording the history
+            self.world.rewind = None
+            self.world.setup()
+        self.held = 0
+        self.episode_steps = 0
+        self.last_level = self.world.level
+        self.last_health = self.world.player.health
+        self.last_enemies = len(self.world.enemies)
+        return self.observe()
+
+    def apply_action(self, action):
+        """
+        Send the key events that turn the held buttons into the ones
+        an action holds, and switch character if it asks to.
+        """
+        world = self.world
+        action = int(action)
+        held = action & BUTTON_MASK
+        changed = held ^ self.held
+        for button, key in BUTTON_KEYS:
+            if changed & button and not held & button:
+                world.key_release(key)
+        for button, key in BUTTON_KEYS:
+            if changed & button and held & button:
+                world.key_press(key)
+        self.held = held
+
+        character_key = CHARACTER_KEYS[action >> ACTION_CHARACTER_SHIFT & 3]
+        if character_key is not None:
+            world.key_press(character_key)
+            world.key_release(character_key)
+
+    def step(self, action, out=None):
+        """
+        Apply an action for one simulation step.
+        Returns (observation, reward, done, info); the observation is
+        written into out when given (see observe()).
+        """
+        world = self.world
+        self.apply_action(action)
+        world.step(self.delta_time)
+        self.episode_steps += 1
+
+        # Kills only count while the level stays the same (a level
+        # switch replaces the enemies)
+        enemies = len(world.enemies)
+        health = world.player.health
+        reward = 0.0
+        if world.level != self.last_level:
+            reward += REWARD_LEVEL * (world.level - self.last_level)
+        else:
+            reward += REWARD_KILL * max(self.last_enemies - enemies, 0)
+        if health < self.last_health:
+            reward += REWARD_DAMAGE * (self.last_health - health)
+        if world.game_won:
+            reward += REWARD_WIN
+        self.last_level = world.level
+        self.last_health = health
+        self.last_enemies = enemies
+
+        done = world.game_won or self.episode_steps >= self.max_steps
+        info = {"level": world.level, "steps": self.episode_steps,
+                "won": world.game_won}
+        return self.observe(out), reward, done, info
+
+    def observe(self, out=None):
+        """
+        Write the observation vector into out (a float32 array of
+        OBSERVATION_SIZE) or a new array, and return it.
+        """
+        if out is None:
+            out = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+        world = self.world
+        player = world.player
+        sprite = player.sprite
+        x, y = sprite.center_x, sprite.center_y
+        out[:PLAYER_FEATURES] = (
+            world.level, x, y, sprite.change_x, sprite.change_y,
+            player.health, player.current_character_index,
+            player.is_invincible, player.is_climbing, player.is_floating,
+            player.archer_dashing, player.attack_cooldown_timer,
+            len(world.enemies))
+
+        # Nearest enemies first, padded with zeros
+        manager = world.enemy_manager
+        nearby = []
+        for enemy in world.enemies:
+            enemy_x, enemy_y, _, _ = manager.motion(enemy.index)
+            dx = enemy_x - x
+            dy = enemy_y - y
+            nearby.append((dx * dx + dy * dy, dx, dy,
+                           float(manager.hp[enemy.index])))
+        nearby.sort()
+        enemies = out[PLAYER_FEATURES:].reshape(OBSERVED_ENEMIES, 3)
+        enemies[:] = 0
+        for row, (_, dx, dy, hp) in enumerate(nearby[:OBSERVED_ENEMIES]):
+            enemies[row] = (dx, dy, hp)
+        return out
+
+    def close(self):
+        """
+        Release the world.
+        """
+        self.world = None
+
+
+class SharedArrays:
+    """
+    The shared-memory arrays of a VectorGameEnv: actions,
+    observations, rewards and done flags for every environment.
+    """
+
+    # Name -> (per-environment shape, dtype)
+    LAYOUT = {
+        "actions": ((), np.int32),
+        "observations": ((OBSERVATION_SIZE,), np.float32),
+        "rewards": ((), np.float32),
+        "dones": ((), np.bool_),
+    }
+
+    def __init__(self, num_envs, names=None):
+        """
+        Create the arrays for num_envs environments, or attach to
+        existing ones by their shared memory block names.
+        """
+        self.blocks = {}
+        self.owner = names is None
+        for name, (shape, dtype) in self.LAYOUT.items():
+            full_shape = (num_envs,) + shape
+            size = int(np.prod(full_shape)) * np.dtype(dtype).itemsize
+            if names is None:
+                block = shared_memory.SharedMemory(create=True,
+                                                   size=max(size, 1))
+            else:
+                block = shared_memory.SharedMemory(name=names[name])
+            self.blocks[name] = block
+            setattr(self, name, np.ndarray(full_shape, dtype=dtype,
+                                           buffer=block.buf))
+
+    @property
+    def names(self):
+        """
+        Return the block names, for attaching from another process.
+        """
+        return {name: block.name for name, block in self.blocks.items()}
+
+    def close(self):
+        """
+        Detach from the blocks, freeing them if this side created them.
+        """
+        for name in self.LAYOUT:
+            setattr(self, name, None)
+        for block in self.blocks.values():
+            block.close()
+            if self.owner:
+                block.unlink()
+        self.blocks = {}
+
+
+def _worker(connection, names, num_envs, indices, levels, max_steps):
+    """
+    Worker process loop: owns the environments at the given indices
+    and serves "reset", "step" and "close" commands, writing results
+    into the shared arrays and replying with None when done.
+    """
+    arrays = SharedArrays(num_envs, names)
+    envs = {index: GameEnv(levels[index], max_steps=max_steps)
+            for index in indices}
+    try:
+        while True:
+            command = connection.recv()
+            if command == "reset":
+                for index, env in envs.items():
+                    env.reset()
+                    env.observe(arrays.observations[index])
+                    arrays.rewards[index] = 0
+                    arrays.dones[index] = False
+            elif command == "step":
+                for index, env in envs.items():
+                    observation = arrays.observations[index]
+                    _, reward, done, _ = env.step(arrays.actions[index],
+                                                  observation)
+                    arrays.rewards[index] = reward
+                    arrays.dones[index] = done
+                    if done:
+                        env.reset()
+                        env.observe(observation)
+            elif command == "close":
+                break
+            connection.send(None)
+    finally:
+        for env in envs.values():
+            env.close()
+        arrays.close()
+        connection.close()
+
+
+class VectorGameEnv:
+    """
+    N independent GameEnvs stepped together on a pool of worker
+    processes, with batched results in shared-memory arrays.
+    """
+
+    def __init__(self, num_envs, levels=(1,), workers=None,
+                 max_steps=MAX_STEPS):
+        """
+        Start the workers. Environment i plays levels[i % len(levels)].
+        workers defaults to one per CPU (at most one per environment).
+        """
+        self.num_envs = num_envs
+        self.levels = [levels[index % len(levels)]
+                       for index in range(num_envs)]
+        workers = min(workers or os.cpu_count() or 1, num_envs)
+        self.workers = workers
+        self.arrays = SharedArrays(num_envs)
+
+        # Spawned (not forked) workers, so each starts from a clean
+        # interpreter whatever threads this process runs
+        context = multiprocessing.get_context("spawn")
+        self.connections = []
+        self.processes = []
+        for worker in range(workers):
+            indices = list(range(worker, num_envs, workers))
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_worker, daemon=True,
+                args=(child, self.arrays.names, num_envs, indices,
+                      self.levels, max_steps))
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def _broadcast(self, command):
+        """
+        Send a command to every worker and wait until all are done.
+        """
+        for connection in self.connections:
+            connection.send(command)
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self):
+        """
+        Reset every environment. Returns the observations array,
+        (num_envs, OBSERVATION_SIZE), which the next call overwrites.
+        """
+        self._broadcast("reset")
+        return self.arrays.observations
+
+    def step(self, actions):
+        """
+        Step every environment with its action.
+        Returns (observations, rewards, dones): shared arrays the next
+        call overwrites, so copy anything that has to be kept.
+        """
+        self.arrays.actions[:] = actions
+        self._broadcast("step")
+        return (self.arrays.observations, self.arrays.rewards,
+                self.arrays.dones)
+
+    def close(self):
+        """
+        Stop the workers and free the shared memory.
+        """
+        for connection in self.connections:
+            try:
+                connection.send("close")
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join()
+        for connection in self.connections:
+            connection.close()
+        self.connections = []
+        self.processes = []
+        self.arrays.close()
+
+
+def main():
+    """
+    Step a vector of environments with random actions and report the
+    total steps per second.
+    """
+    parser = argparse.ArgumentParser(description="Vectorized game env")
+    parser.add_argument("--envs", type=int, default=8,
+                        help="number of environments")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--steps", type=int, default=2000,
+                        help="steps to run each environment for")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1],
+                        help="levels the environments cycle through")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for the random actions")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    start = time.perf_counter()
+    env = VectorGameEnv(args.envs, args.levels, args.workers)
+    try:
+        env.reset()
+        ready = time.perf_counter()
+        total_reward = 0.0
+        for _ in range(args.steps):
+            actions = rng.integers(0, ACTION_COUNT, args.envs)
+            _, rewards, _ = env.step(actions)
+            total_reward += float(rewards.sum())
+        elapsed = time.perf_counter() - ready
+    finally:
+        env.close()
+    total_steps = args.envs * args.steps
+    print(f"{args.envs} envs on {env.workers} worker processes, "
+          f"started in {ready - start:.2f} s")
+    print(f"{total_steps} steps in {elapsed:.2f} s "
+          f"({total_steps / elapsed:.0f} steps/s total, "
+          f"{args.steps / elapsed:.0f} per env), "
+          f"total reward {total_reward:.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Retained-Mode HUD
+
+Everything on the heads-up display (health hearts, the instructions
+panel and its text, the victory message) is created once. Text lives
+in pyglet batches and the hearts and panel background in one sprite
+list, so a frame costs one sprite list draw plus one text batch draw
+however many lines are shown. Sprites and text are only touched when
+what they show changes: the player's health, whether the instructions
+are visible, or the game being won.
+"""
+
+import arcade
+import pyglet
+
+# Heart layout: size, spacing and the first heart's centre offset from
+# the top-left corner of the window
+HEART_SIZE = 30
+HEART_SPACING = 35
+HEART_MARGIN_X = 20
+HEART_MARGIN_Y = 40
+
+# Instructions text layout
+INSTRUCTIONS_X = 20
+INSTRUCTIONS_MARGIN_Y = 40
+INSTRUCTIONS_LINE_HEIGHT = 22
+INSTRUCTIONS_FONT_SIZE = 14
+
+
+class Hud:
+    """
+    The game's HUD. Call the set_* methods whenever the game state
+    changes (they do nothing if the value is already shown) and draw()
+    every frame with the GUI camera active.
+    """
+
+    def __init__(self, width, height, max_health, heart_full_texture,
+                 heart_empty_texture, instructions, panel_bounds):
+        """
+        Build the HUD for a window of the given size.
+        instructions is a list of text lines; panel_bounds is the
+        (left, right, bottom, top) of the panel drawn behind them.
+        """
+        self.sprites = arcade.SpriteList()
+
+        # One full and one empty heart per health point, only one of
+        # which is visible at a time
+        self.full_hearts = []
+        self.empty_hearts = []
+        for index in range(max_health):
+            x = HEART_MARGIN_X + index * HEART_SPACING
+            y = height - HEART_MARGIN_Y
+            for texture, hearts in ((heart_full_texture, self.full_hearts),
+                                    (heart_empty_texture,
+                                     self.empty_hearts)):
+                heart = arcade.Sprite(texture,
+                                      scale=HEART_SIZE / texture.width,
+                                      center_x=x, center_y=y)
+                hearts.append(heart)
+                self.sprites.append(heart)
+
+        # Semi-transparent panel behind the instructions (drawn over
+        # the hearts, as before)
+        left, right, bottom, top = panel_bounds
+        self.panel = arcade.SpriteSolidColor(
+            right - left, top - bottom, color=(0, 0, 0, 180))
+        self.panel.left = left
+        self.panel.bottom = bottom
+        self.sprites.append(self.panel)
+
+        self.instructions_batch = pyglet.graphics.Batch()
+        self.instruction_lines = [
+            arcade.Text(line, INSTRUCTIONS_X,
+                        height - INSTRUCTIONS_MARGIN_Y -
+                        index * INSTRUCTIONS_LINE_HEIGHT,
+                        arcade.color.WHITE, INSTRUCTIONS_FONT_SIZE,
+                        font_name="Arial", batch=self.instructions_batch)
+            for index, line in enumerate(instructions) if line]
+
+        self.victory_text = arcade.Text(
+            "VICTORY!", width // 2, height // 2, arcade.color.YELLOW,
+            font_size=72, anchor_x="center", anchor_y="center", bold=True)
+
+        # State currently shown (None until first set)
+        self.health = None
+        self.instructions_visible = True
+        self.won = False
+
+    def set_health(self, health):
+        """
+        Show health full hearts followed by empty ones.
+        """
+        if health == self.health:
+            return
+        self.health = health
+        for index, (full, empty) in enumerate(zip(self.full_hearts,
+                                                  self.empty_hearts)):
+            full.visible = index < health
+            empty.visible = index >= health
+
+    def set_instructions_visible(self, visible):
+        """
+        Show or hide the instructions panel.
+        """
+        if visible == self.instructions_visible:
+            return
+        self.instructions_visible = visible
+        self.panel.visible = visible
+
+    def set_won(self, won):
+        """
+        Switch between the normal HUD and the victory message.
+        """
+        self.won = won
+
+    def draw(self):
+        """
+        Draw the HUD: the sprites and the instructions text, or only
+        the victory message once the game is won.
+        """
+        if self.won:
+            self.victory_text.draw()
+            return
+        self.sprites.draw()
+        if self.instructions_visible:
+            self.instructions_batch.draw()
@@ -0,0 +1,478 @@
+"""
+Packed Level Bundles
+
+An offline build step that turns the scattered level assets (TMX maps,
+TSX tilesets with their sometimes broken paths, individual PNGs, and
+the enemy tables in game.py) into:
+
+- one texture atlas image holding every tile used by the levels and
+  every character, enemy and HUD frame, and
+- one binary bundle per level holding its tile grids, spawn, exit and
+  checkpoint positions, enemy definitions and where each tile and
+  frame lives in the atlas.
+
+Every file reference is resolved and checked while building, so a bad
+path or a missing image is reported here instead of at run time.
+Loading a level from its bundle is then one file read, and every
+texture is cut from the one atlas image.
+
+Bundle layout (the same as the compiled level cache): a fixed header
+(magic, format version, metadata length), JSON metadata, then each
+layer's GID grid, 4-byte aligned.
+
+Bundles record the files they were built from and the enemy table
+they copied. A bundle whose sources have changed, or whose enemies no
+longer match the table the game passes in, is ignored (with a warning)
+and the level is loaded from its TMX file as before.
+
+Command line:
+    python level_bundle.py                  build bundles for every level
+    python level_bundle.py --check          only validate the assets
+    python level_bundle.py --levels 1 2     build some levels
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from array import array
+
+from PIL import Image
+
+from level_cache import (CACHE_HEADER, GID_MASK, LevelData, _source_entry,
+                         _sources_current, parse_tmx)
+
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_DIR = os.path.join(GAME_DIR, "bundles")
+BUNDLE_EXTENSION = ".lvlb"
+BUNDLE_MAGIC = b"LVLB"
+BUNDLE_VERSION = 1
+ATLAS_FILE = "atlas.png"
+
+LEVELS = (1, 2, 3)
+
+# Directories whose images (searched recursively) all go in the atlas
+FRAME_DIRS = ("characters", "Assets")
+
+# Atlas packing: maximum row width and the transparent gap kept around
+# every image so neighbours never bleed into each other when sampled
+ATLAS_WIDTH = 1024
+ATLAS_PADDING = 1
+
+# Marker layers whose tile positions are stored in the bundle
+MARKER_LAYERS = {"spawn": "Start", "exits": "Exit",
+                 "checkpoints": "Checkpoint"}
+
+
+class LevelBundle:
+    """
+    A level read from its bundle: the LevelData (tiles point into the
+    atlas), marker positions in unscaled map pixels, enemy definitions
+    and the atlas regions of every frame image.
+    """
+
+    def __init__(self, level, spawn, exits, checkpoints, enemies,
+                 atlas_path, frame_regions, read_ms):
+        """
+        Wrap the contents of a bundle file.
+        """
+        self.level = level
+        # (x, y) of the Start marker, or None if the map has none
+        self.spawn = spawn
+        self.exits = exits
+        self.checkpoints = checkpoints
+        # Tuples in the same form as game.LEVEL_ENEMIES entries
+        self.enemies = enemies
+        self.atlas_path = atlas_path
+        # Absolute image path -> (x, y, width, height) in the atlas
+        self.frame_regions = frame_regions
+        self.read_ms = read_ms
+
+
+def bundle_path_for(level_number, bundle_dir=BUNDLE_DIR):
+    """
+    Return the bundle file path for a level.
+    """
+    return os.path.join(bundle_dir, f"Level{level_number}{BUNDLE_EXTENSION}")
+
+
+def _relative(path):
+    """
+    Return a path relative to the game directory, with / separators,
+    so bundles do not depend on where the game is installed.
+    """
+    return os.path.relpath(path, GAME_DIR).replace(os.sep, "/")
+
+
+def _absolute(path):
+    """
+    Undo _relative().
+    """
+    return os.path.normpath(os.path.join(GAME_DIR, path))
+
+
+class BuildReport:
+    """
+    Errors and warnings found while building.
+    """
+
+    def __init__(self):
+        """
+        Start an empty report.
+        """
+        self.errors = []
+        self.warnings = []
+
+    def error(self, message):
+        """
+        Record a problem that stops the bundles being written.
+        """
+        self.errors.append(message)
+        print(f"Error: {message}")
+
+    def warning(self, message):
+        """
+        Record a problem the game already tolerates.
+        """
+        self.warnings.append(message)
+        print(f"Warning: {message}")
+
+
+def frame_paths():
+    """
+    Return every image under the frame directories, sorted.
+    """
+    paths = []
+    for directory in FRAME_DIRS:
+        for root, _, names in os.walk(os.path.join(GAME_DIR, directory)):
+            paths.extend(os.path.join(root, name) for name in names
+                         if name.lower().endswith(".png"))
+    return sorted(paths)
+
+
+def load_images(paths, report):
+    """
+    Open and decode every image once.
+    Returns path -> RGBA image for the ones that could be read.
+    """
+    images = {}
+    for path in paths:
+        try:
+            with Image.open(path) as image:
+                images[path] = image.convert("RGBA")
+        except OSError as error:
+            report.error(f"cannot read image {_relative(path)}: {error}")
+    return images
+
+
+def validate_level(level_number, level, enemies, report):
+    """
+    Check a parsed level: every tile it uses has a readable image
+    region, it has a Start marker, and its enemies are well formed.
+    """
+    name = f"Level{level_number}"
+    used = set()
+    for layer_name in level.layer_names:
+        gids = {gid & GID_MASK for gid in level.layers[layer_name]} - {0}
+        undefined = sorted(gid for gid in gids if gid not in level.tiles)
+        if undefined and layer_name not in MARKER_LAYERS.values():
+            report.warning(f"{name} layer '{layer_name}' uses undefined "
+                           f"tiles {undefined}; they will be invisible")
+        used.update(gid for gid in gids if gid in level.tiles)
+
+    for gid in sorted(used):
+        image_path, x, y, width, height = level.tiles[gid]
+        if not os.path.exists(image_path):
+            report.error(f"{name} tile {gid}: image "
+                         f"{_relative(image_path)} not found")
+
+    if not any(level.layers.get(MARKER_LAYERS["spawn"], ())):
+        report.error(f"{name} has no Start marker")
+
+    for index, enemy in enumerate(enemies):
+        (monster_file, x, y, left, right, bottom, top,
+         speed_x, speed_y) = enemy
+        where = f"{name} enemy {index} ({monster_file})"
+        if not os.path.exists(os.path.join(GAME_DIR, "Assets",
+                                           monster_file)):
+            report.error(f"{where}: Assets/{monster_file} not found")
+        if left > right or bottom > top:
+            report.error(f"{where}: patrol bounds are inverted")
+        elif not (left <= x <= right and bottom <= y <= top):
+            report.warning(f"{where}: starts outside its patrol bounds")
+    return used
+
+
+def pack_atlas(regions, images):
+    """
+    Shelf-pack image regions into one atlas image.
+    regions are (image_path, x, y, width, height) keys; returns
+    (atlas image, key -> (x, y, width, height) in the atlas).
+    Tallest regions go first so each shelf wastes little height.
+    """
+    placed = {}
+    order = sorted(regions, key=lambda key: (-key[4], -key[3], key))
+    shelf_x = shelf_y = shelf_height = 0
+    width = 0
+    for key in order:
+        _, _, _, region_width, region_height = key
+        cell_width = region_width + 2 * ATLAS_PADDING
+        cell_height = region_height + 2 * ATLAS_PADDING
+        if shelf_x + cell_width > ATLAS_WIDTH and shelf_x > 0:
+            shelf_y += shelf_height
+            shelf_x = shelf_height = 0
+        placed[key] = (shelf_x + ATLAS_PADDING, shelf_y + ATLAS_PADDING,
+                       region_width, region_height)
+        shelf_x += cell_width
+        shelf_height = max(shelf_height, cell_height)
+        width = max(width, shelf_x)
+
+    atlas = Image.new("RGBA", (max(width, 1), max(shelf_y + shelf_height, 1)),
+                      (0, 0, 0, 0))
+    for key, (x, y, region_width, region_height) in placed.items():
+        image_path, source_x, source_y, _, _ = key
+        atlas.paste(images[image_path].crop(
+            (source_x, source_y, source_x + region_width,
+             source_y + region_height)), (x, y))
+    return atlas, placed
+
+
+def marker_positions(level, layer_name):
+    """
+    Return the centre of every marker tile in a layer, in unscaled map
+    pixels, in the order build_sprite_list() creates their sprites.
+    """
+    grid = level.layers.get(layer_name)
+    if grid is None:
+        return []
+    positions = []
+    for index, gid in enumerate(grid):
+        if gid == 0:
+            continue
+        row, column = divmod(index, level.width)
+        info = level.tiles.get(gid & GID_MASK)
+        if info is None:
+            width, height = level.tile_width, level.tile_height
+        else:
+            width, height = info[3], info[4]
+        positions.append((column * level.tile_width + width / 2,
+                          (level.height - row - 1) * level.tile_height +
+                          height / 2))
+    return positions
+
+
+def write_bundle(path, level, metadata):
+    """
+    Write a level's grids and metadata to a bundle file.
+    The file is written to a temporary name and then renamed so a
+    crash never leaves a half-written bundle behind.
+    """
+    metadata = dict(metadata, byteorder=sys.byteorder, layers=[])
+    grids = []
+    offset = 0
+    for name in level.layer_names:
+        grid = level.layers[name]
+        typecode = "H" if max(grid, default=0) <= 0xFFFF else "I"
+        grid = array(typecode, grid)
+        grids.append(grid)
+        metadata["layers"].append([name, offset, typecode])
+        offset += len(grid) * grid.itemsize
+        offset += -offset % 4
+    metadata_bytes = json.dumps(metadata).encode("utf-8")
+    padding = -(CACHE_HEADER.size + len(metadata_bytes)) % 4
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(CACHE_HEADER.pack(
+            BUNDLE_MAGIC, BUNDLE_VERSION, len(metadata_bytes) + padding))
+        file.write(metadata_bytes + b" " * padding)
+        for grid in grids:
+            grid.tofile(file)
+            file.write(b"\0" * (-len(grid) * grid.itemsize % 4))
+    os.replace(temp_path, path)
+
+
+def build(levels=LEVELS, output_dir=BUNDLE_DIR, check_only=False):
+    """
+    Validate every asset the levels use and, unless check_only is set
+    or an error was found, write the atlas and one bundle per level.
+    Returns the BuildReport.
+    """
+    # Imported here so the game can import this module
+    from game import LEVEL_ENEMIES
+
+    report = BuildReport()
+    start = time.perf_counter()
+
+    # Parse and validate every level first
+    parsed = {}
+    regions = set()
+    for level_number in levels:
+        map_path = os.path.join(GAME_DIR, f"Level{level_number}.tmx")
+        if not os.path.exists(map_path):
+            report.error(f"{_relative(map_path)} not found")
+            continue
+        try:
+            level = parse_tmx(map_path)
+        except (OSError, ValueError) as error:
+            report.error(f"cannot parse {_relative(map_path)}: {error}")
+            continue
+        enemies = LEVEL_ENEMIES.get(level_number, [])
+        used = validate_level(level_number, level, enemies, report)
+        regions.update(level.tiles[gid] for gid in used)
+        parsed[level_number] = level, used, enemies
+
+    # Every frame image goes in whole
+    frames = frame_paths()
+    images = load_images(
+        sorted({key[0] for key in regions} | set(frames)), report)
+    for path in frames:
+        if path in images:
+            width, height = images[path].size
+            regions.add((path, 0, 0, width, height))
+    for key in sorted(regions):
+        image_path, x, y, width, height = key
+        image = images.get(image_path)
+        if image is not None and (x + width > image.width or
+                                  y + height > image.height):
+            report.error(f"tile region {key[1:]} lies outside "
+                         f"{_relative(image_path)} "
+                         f"({image.width}x{image.height})")
+
+    if report.errors or check_only:
+        return report
+
+    atlas, placed = pack_atlas(regions, images)
+    os.makedirs(output_dir, exist_ok=True)
+    atlas_path = os.path.join(output_dir, ATLAS_FILE)
+    atlas.save(atlas_path)
+    frame_regions = {_relative(path): placed[(path, 0, 0) +
+                                             images[path].size]
+                     for path in frames if path in images}
+    print(f"Packed {len(placed)} images into {_relative(atlas_path)} "
+          f"({atlas.width}x{atlas.height})")
+
+    for level_number, (level, used, enemies) in parsed.items():
+        sources = ([entry[0] for entry in level.sources] +
+                   sorted({level.tiles[gid][0] for gid in used}) +
+                   frames + [atlas_path])
+        metadata = {
+            "level": level_number,
+            "map_file": _relative(level.map_file),
+            "width": level.width,
+            "height": level.height,
+            "tile_width": level.tile_width,
+            "tile_height": level.tile_height,
+            "atlas": ATLAS_FILE,
+            "tiles": {str(gid): placed[level.tiles[gid]]
+                      for gid in sorted(used)},
+            "frames": frame_regions,
+            "enemies": [list(enemy) for enemy in enemies],
+            "sources": [[_relative(path)] + _source_entry(path)[1:]
+                        for path in dict.fromkeys(sources)],
+        }
+        for key, layer_name in MARKER_LAYERS.items():
+            metadata[key] = marker_positions(level, layer_name)
+        path = bundle_path_for(level_number, output_dir)
+        write_bundle(path, level, metadata)
+        print(f"Wrote {_relative(path)} ({os.path.getsize(path)} bytes, "
+              f"{len(enemies)} enemies)")
+
+    print(f"Built {len(parsed)} bundles in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    return report
+
+
+def read_bundle(path, enemies=None):
+    """
+    Read a level bundle with a single file read.
+    Returns a LevelBundle, or None if the bundle is missing, unreadable,
+    older than the files it was built from or, when enemies (the
+    level's current LEVEL_ENEMIES entry) is given, built from a
+    different enemy table.
+    """
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except OSError:
+        return None
+
+    try:
+        magic, version, metadata_length = CACHE_HEADER.unpack_from(data)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError("bundle format mismatch")
+        metadata_end = CACHE_HEADER.size + metadata_length
+        metadata = json.loads(data[CACHE_HEADER.size:metadata_end])
+        if metadata["byteorder"] != sys.byteorder:
+            raise ValueError("bundle built on another machine")
+    except (ValueError, KeyError) as error:
+        print(f"Warning: ignoring bundle {_relative(path)}: {error}")
+        return None
+
+    sources = [[_absolute(entry[0])] + entry[1:]
+               for entry in metadata["sources"]]
+    is_current, _ = _sources_current(sources)
+    if enemies is not None and (
+            metadata["enemies"] != [list(enemy) for enemy in enemies]):
+        is_current = False
+    if not is_current:
+        print(f"Warning: bundle {_relative(path)} is out of date; "
+              "run python level_bundle.py to rebuild it")
+        return None
+
+    # Tiles are cut from the atlas instead of their own images
+    atlas_path = os.path.join(os.path.dirname(os.path.abspath(path)),
+                              metadata["atlas"])
+    level = LevelData(
+        _absolute(metadata["map_file"]), metadata["width"],
+        metadata["height"], metadata["tile_width"],
+        metadata["tile_height"])
+    level.tiles = {int(gid): (atlas_path, *region)
+                   for gid, region in metadata["tiles"].items()}
+    level.sources = sources
+
+    # Layer grids are zero-copy views into the bytes read
+    cells = level.width * level.height
+    view = memoryview(data)
+    for name, offset, typecode in metadata["layers"]:
+        grid_start = metadata_end + offset
+        grid_end = grid_start + cells * array(typecode).itemsize
+        level.add_layer(name, view[grid_start:grid_end].cast(typecode))
+
+    spawn = metadata["spawn"]
+    return LevelBundle(
+        level,
+        tuple(spawn[0]) if spawn else None,
+        [tuple(position) for position in metadata["exits"]],
+        [tuple(position) for position in metadata["checkpoints"]],
+        [tuple(enemy) for enemy in metadata["enemies"]],
+        atlas_path,
+        {_absolute(name): tuple(region)
+         for name, region in metadata["frames"].items()},
+        (time.perf_counter() - start) * 1000)
+
+
+def main():
+    """
+    Command line entry point.
+    """
+    parser = argparse.ArgumentParser(
+        description="Validate level assets and build packed level bundles")
+    parser.add_argument("--levels", type=int, nargs="+", default=LEVELS)
+    parser.add_argument("--output", default=BUNDLE_DIR,
+                        help="directory for the atlas and bundles")
+    parser.add_argument("--check", action="store_true",
+                        help="validate the assets without writing anything")
+    args = parser.parse_args()
+
+    report = build(args.levels, args.output, check_only=args.check)
+    print(f"{len(report.errors)} errors, {len(report.warnings)} warnings")
+    if report.errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,565 @@
+"""
+Compiled Level Cache
+
+Parses the Tiled level maps (TMX) and their tilesets (TSX) into a
+compact binary form: one uint16/uint32 GID grid per layer plus the
+tileset metadata needed to build tile sprites. The compiled file is written
+next to the game and memory-mapped on later runs, so a warm level load
+skips XML/CSV parsing entirely.
+
+Cache files are keyed on the modification time, size and SHA-1 of the
+TMX file and every TSX file it references. If a file is touched but its
+contents are unchanged the cache is still used (and re-stamped).
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import xml.etree.ElementTree as ElementTree
+from array import array
+
+import arcade
+
+from assets import ASSETS
+
+# Cache file configuration
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(GAME_DIR, ".level_cache")
+CACHE_EXTENSION = ".lvlc"
+CACHE_MAGIC = b"LVLC"
+CACHE_VERSION = 2
+
+# Header layout: magic, format version, metadata length in bytes
+CACHE_HEADER = struct.Struct("<4sII")
+
+# Tiled stores flip flags in the top bits of every GID
+FLIPPED_HORIZONTALLY = 0x80000000
+FLIPPED_VERTICALLY = 0x40000000
+FLIPPED_DIAGONALLY = 0x20000000
+GID_MASK = 0x1FFFFFFF
+
+
+class LevelData:
+    """
+    Raw level data: map size, one GID grid per tile layer and a lookup
+    from GID to the image region that tile is drawn from.
+
+    Layer grids are stored row-major with the top row first, exactly as
+    Tiled writes them. They are either ``array`` objects (freshly
+    parsed) or ``memoryview`` objects over the memory-mapped cache file.
+    Parsed grids are uint32; cached grids are uint16 when they fit.
+    """
+
+    def __init__(self, map_file, width, height, tile_width, tile_height):
+        """
+        Create an empty level description.
+        """
+        self.map_file = map_file
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+
+        # Layer name -> GID grid, kept in map (draw) order
+        self.layer_names = []
+        self.layers = {}
+
+        # GID -> (image_path, x, y, width, height)
+        self.tiles = {}
+
+        # Files the level was compiled from: [path, mtime_ns, size, sha1]
+        self.sources = []
+
+        # Keeps the memory map alive while layers reference it
+        self._mmap = None
+
+    def add_layer(self, name, grid):
+        """
+        Add a tile layer grid, preserving layer order.
+        """
+        if name not in self.layers:
+            self.layer_names.append(name)
+        self.layers[name] = grid
+
+    def gid_at(self, layer_name, column, row):
+        """
+        Return the GID (including flip flags) at a column and row,
+        where row 0 is the top row of the map.
+        """
+        return self.layers[layer_name][row * self.width + column]
+
+
+class CompiledTileMap:
+    """
+    Lightweight stand-in for ``arcade.TileMap`` built from ``LevelData``.
+    Exposes the attributes the game reads from a tile map, including
+    ``sprite_lists`` so it can be passed to ``arcade.Scene.from_tilemap``.
+    """
+
+    def __init__(self, level, scaling, sprite_lists):
+        """
+        Wrap level data and its built sprite lists.
+        """
+        self.level = level
+        self.map_file = level.map_file
+        self.width = level.width
+        self.height = level.height
+        self.tile_width = level.tile_width
+        self.tile_height = level.tile_height
+        self.scaling = scaling
+        self.sprite_lists = sprite_lists
+
+
+def _file_digest(path):
+    """
+    Return the SHA-1 hex digest of a file's contents.
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_entry(path):
+    """
+    Build the cache key entry for one source file.
+    """
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_mtime_ns, stat.st_size,
+            _file_digest(path)]
+
+
+def resolve_asset_path(source, base_dir):
+    """
+    Resolve a file reference from a TMX/TSX file.
+
+    Some maps still reference tilesets through paths from the machine
+    they were made on (e.g. ``../../../../Downloads/...``). When the
+    referenced file does not exist, fall back to a file with the same
+    name next to the referencing file, in ``tiles/`` or in the game
+    directory. Returns None if nothing matches.
+    """
+    path = os.path.normpath(os.path.join(base_dir, source))
+    if os.path.exists(path):
+        return path
+
+    filename = os.path.basename(source.replace("\\", "/"))
+    for directory in (base_dir, os.path.join(base_dir, "tiles"),
+                      GAME_DIR, os.path.join(GAME_DIR, "tiles")):
+        candidate = os.path.join(directory, filename)
+        if os.path.exists(candidate):
+            return os.path.normpath(candidate)
+    return None
+
+
+def _parse_tileset(element, firstgid, base_dir, level):
+    """
+    Add the tiles of one tileset element (inline or from a TSX file)
+    to the level's GID lookup.
+    """
+    tile_width = int(element.get("tilewidth", level.tile_width))
+    tile_height = int(element.get("tileheight", level.tile_height))
+
+    # Single-image tileset (sprite sheet cut into a grid)
+    image = element.find("image")
+    if image is not None:
+        image_path = resolve_asset_path(image.get("source"), base_dir)
+        if image_path is None:
+            print(f"Warning: tileset image {image.get('source')} not found")
+            return
+        tile_count = int(element.get("tilecount", 0))
+        columns = max(int(element.get("columns", 1)), 1)
+        margin = int(element.get("margin", 0))
+        spacing = int(element.get("spacing", 0))
+        for tile_id in range(tile_count):
+            row, column = divmod(tile_id, columns)
+            level.tiles[firstgid + tile_id] = (
+                image_path,
+                margin + column * (tile_width + spacing),
+                margin + row * (tile_height + spacing),
+                tile_width, tile_height)
+        return
+
+    # Collection of images (one image per tile)
+    for tile in element.findall("tile"):
+        tile_image = tile.find("image")
+        if tile_image is None:
+            continue
+        image_path = resolve_asset_path(tile_image.get("source"), base_dir)
+        if image_path is None:
+            print(f"Warning: tile image {tile_image.get('source')} "
+                  "not found")
+            continue
+        level.tiles[firstgid + int(tile.get("id"))] = (
+            image_path, 0, 0,
+            int(tile_image.get("width", tile_width)),
+            int(tile_image.get("height", tile_height)))
+
+
+def parse_tmx(map_path):
+    """
+    Parse a TMX map and its tilesets into ``LevelData``.
+    Only CSV-encoded tile layers are supported (what Tiled writes for
+    this game's maps).
+    """
+    map_path = os.path.abspath(map_path)
+    base_dir = os.path.dirname(map_path)
+    root = ElementTree.parse(map_path).getroot()
+
+    level = LevelData(
+        map_path,
+        int(root.get("width")), int(root.get("height")),
+        int(root.get("tilewidth")), int(root.get("tileheight")))
+    source_paths = [map_path]
+
+    # Tilesets (later tilesets win if two share a firstgid)
+    for tileset in root.findall("tileset"):
+        firstgid = int(tileset.get("firstgid"))
+        source = tileset.get("source")
+        if source is None:
+            _parse_tileset(tileset, firstgid, base_dir, level)
+            continue
+        tileset_path = resolve_asset_path(source, base_dir)
+        if tileset_path is None:
+            print(f"Warning: tileset {source} not found")
+            continue
+        if tileset_path != os.path.normpath(os.path.join(base_dir, source)):
+            print(f"Warning: tileset {source} not found, "
+                  f"using {os.path.relpath(tileset_path, GAME_DIR)}")
+        source_paths.append(tileset_path)
+        tileset_root = ElementTree.parse(tileset_path).getroot()
+        _parse_tileset(tileset_root, firstgid,
+                       os.path.dirname(tileset_path), level)
+
+    # Tile layers
+    for layer in root.findall("layer"):
+        data = layer.find("data")
+        if data is None or data.get("encoding") != "csv":
+            raise ValueError(
+                f"Layer '{layer.get('name')}' in {map_path} is not "
+                "CSV encoded")
+        grid = array("I", map(int, data.text.split(",")))
+        if len(grid) != level.width * level.height:
+            raise ValueError(
+                f"Layer '{layer.get('name')}' in {map_path} has "
+                f"{len(grid)} cells, expected "
+                f"{level.width * level.height}")
+        level.add_layer(layer.get("name"), grid)
+
+    level.sources = [_source_entry(path)
+                     for path in dict.fromkeys(source_paths)]
+    return level
+
+
+def cache_path_for(map_path, cache_dir=CACHE_DIR):
+    """
+    Return the compiled cache file path for a map.
+    """
+    return os.path.join(cache_dir,
+                        os.path.basename(map_path) + CACHE_EXTENSION)
+
+
+def save_cache(level, cache_path):
+    """
+    Write level data to a compiled cache file.
+    The file is written to a temporary name and then renamed so a
+    crash never leaves a half-written cache behind.
+    """
+    metadata = {
+        "map_file": level.map_file,
+        "width": level.width,
+        "height": level.height,
+        "tile_width": level.tile_width,
+        "tile_height": level.tile_height,
+        "byteorder": sys.byteorder,
+        "sources": level.sources,
+        "tiles": {str(gid): list(info) for gid, info in level.tiles.items()},
+        "layers": [],
+    }
+
+    # Lay out the layer grids after the header, 4-byte aligned.
+    # Layers without flip flags or large GIDs are stored as uint16.
+    grids = []
+    offset = 0
+    for name in level.layer_names:
+        grid = level.layers[name]
+        typecode = "H" if max(grid, default=0) <= 0xFFFF else "I"
+        if not isinstance(grid, array) or grid.typecode != typecode:
+            grid = array(typecode, grid)
+        grids.append(grid)
+        metadata["layers"].append([name, offset, typecode])
+        offset += len(grid) * grid.itemsize
+        offset += -offset % 4
+    metadata_bytes = json.dumps(metadata).encode("utf-8")
+    data_start = CACHE_HEADER.size + len(metadata_bytes)
+    padding = -data_start % 4
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temp_path = cache_path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(CACHE_HEADER.pack(
+            CACHE_MAGIC, CACHE_VERSION, len(metadata_bytes) + padding))
+        file.write(metadata_bytes + b" " * padding)
+        for grid in grids:
+            grid.tofile(file)
+            file.write(b"\0" * (-len(grid) * grid.itemsize % 4))
+    os.replace(temp_path, cache_path)
+
+
+def _sources_current(sources):
+    """
+    Check whether every source file still matches its cache key.
+    Returns (is_current, needs_restamp).
+    """
+    needs_restamp = False
+    for path, mtime_ns, size, digest in sources:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False, False
+        if stat.st_mtime_ns == mtime_ns and stat.st_size == size:
+            continue
+        # Timestamp changed: only stale if the contents changed too
+        if stat.st_size != size or _file_digest(path) != digest:
+            return False, False
+        needs_restamp = True
+    return True, needs_restamp
+
+
+def load_cache(map_path, cache_path):
+    """
+    Memory-map a compiled cache file and return its ``LevelData``.
+    Returns None if the cache is missing, unreadable or stale.
+    """
+    try:
+        file = open(cache_path, "rb")
+    except OSError:
+        return None
+
+    with file:
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+    try:
+        magic, version, metadata_length = CACHE_HEADER.unpack_from(mapped)
+        if magic != CACHE_MAGIC or version != CACHE_VERSION:
+            raise ValueError("cache format mismatch")
+        metadata_end = CACHE_HEADER.size + metadata_length
+        metadata = json.loads(bytes(mapped[CACHE_HEADER.size:metadata_end]))
+        if (metadata["byteorder"] != sys.byteorder or
+                metadata["map_file"] != os.path.abspath(map_path)):
+            raise ValueError("cache built for another map or machine")
+    except (ValueError, KeyError, struct.error):
+        mapped.close()
+        return None
+
+    is_current, needs_restamp = _sources_current(metadata["sources"])
+    if not is_current:
+        mapped.close()
+        return None
+
+    level = LevelData(
+        metadata["map_file"], metadata["width"], metadata["height"],
+        metadata["tile_width"], metadata["tile_height"])
+    level.tiles = {int(gid): tuple(info)
+                   for gid, info in metadata["tiles"].items()}
+    level.sources = metadata["sources"]
+    level._mmap = mapped
+
+    # Layer grids are zero-copy views into the mapped file
+    cells = level.width * level.height
+    view = memoryview(mapped)
+    for name, offset, typecode in metadata["layers"]:
+        start = metadata_end + offset
+        end = start + cells * array(typecode).itemsize
+        level.add_layer(name, view[start:end].cast(typecode))
+
+    if needs_restamp:
+        level.sources = [_source_entry(path)
+                         for path, _, _, _ in level.sources]
+        save_cache(level, cache_path)
+    return level
+
+
+def load_level_data(map_path, cache_dir=CACHE_DIR):
+    """
+    Load level data, using the compiled cache in cache_dir when it is
+    current and rebuilding it otherwise.
+    Returns (level, cache_status, milliseconds) where cache_status is
+    "hit" or "miss".
+    """
+    start = time.perf_counter()
+    cache_path = cache_path_for(map_path, cache_dir)
+    level = load_cache(map_path, cache_path)
+    status = "hit"
+    if level is None:
+        status = "miss"
+        level = parse_tmx(map_path)
+        try:
+            save_cache(level, cache_path)
+        except OSError as error:
+            print(f"Warning: could not write level cache: {error}")
+    return level, status, (time.perf_counter() - start) * 1000
+
+
+def _tile_texture(level, gid, texture_manager, textures):
+    """
+    Return the (cached) texture for a GID, applying any flip flags.
+    Returns None if the GID is not defined by any tileset.
+    """
+    if gid in textures:
+        return textures[gid]
+
+    info = level.tiles.get(gid & GID_MASK)
+    texture = None
+    if info is not None:
+        image_path, x, y, width, height = info
+        texture = texture_manager.load_or_get_texture(
+            image_path, x=x, y=y, width=width, height=height)
+        if gid & FLIPPED_DIAGONALLY:
+            texture = texture.flip_diagonally()
+        if gid & FLIPPED_HORIZONTALLY:
+            texture = texture.flip_horizontally()
+        if gid & FLIPPED_VERTICALLY:
+            texture = texture.flip_vertically()
+    textures[gid] = texture
+    return texture
+
+
+def build_region_sprites(level, layer_name, column_start, row_start,
+                         column_end, row_end, scaling=1,
+                         texture_manager=None, textures=None, missing=None):
+    """
+    Build the sprites for one tile layer's cells inside a block of the
+    map (row 0 is the top row; ends are exclusive), in row-major order,
+    placed exactly where ``arcade.load_tilemap`` would put them.
+    GIDs with no tileset entry become invisible placeholder sprites so
+    markers such as Start and Exit keep their positions; their GIDs
+    are added to missing when it is given.
+    """
+    if texture_manager is None:
+        texture_manager = ASSETS.texture_manager()
+    if textures is None:
+        textures = {}
+
+    grid = level.layers[layer_name]
+    width = level.width
+    sprites = []
+
+    for row in range(row_start, row_end):
+        row_index = row * width
+        for column in range(column_start, column_end):
+            gid = grid[row_index + column]
+            if gid == 0:
+                continue
+            if missing is not None and gid & GID_MASK not in level.tiles:
+                missing.add(gid & GID_MASK)
+            sprites.append(build_tile_sprite(
+                level, gid, column, row, scaling, texture_manager,
+                textures))
+    return sprites
+
+
+def build_tile_sprite(level, gid, column, row, scaling=1,
+                      texture_manager=None, textures=None):
+    """
+    Build the sprite for one tile (row 0 is the top row), or an
+    invisible cell-sized placeholder if no tileset defines its GID.
+    """
+    if texture_manager is None:
+        texture_manager = ASSETS.texture_manager()
+    if textures is None:
+        textures = {}
+
+    tile_width = level.tile_width * scaling
+    tile_height = level.tile_height * scaling
+    texture = _tile_texture(level, gid, texture_manager, textures)
+    if texture is None:
+        sprite = arcade.SpriteSolidColor(
+            tile_width, tile_height, color=(0, 0, 0, 0))
+    else:
+        sprite = arcade.Sprite(texture, scale=scaling)
+    sprite.center_x = column * tile_width + sprite.width / 2
+    sprite.center_y = ((level.height - row - 1) * tile_height +
+                       sprite.height / 2)
+    return sprite
+
+
+def build_sprite_list(level, layer_name, scaling=1, use_spatial_hash=False,
+                      texture_manager=None, textures=None, lazy=False):
+    """
+    Build a sprite list for one tile layer (see build_region_sprites).
+    Pass lazy=True when building off the main thread, so no OpenGL
+    resources are created until the list is first drawn.
+    """
+    sprite_list = arcade.SpriteList(use_spatial_hash=use_spatial_hash,
+                                    lazy=lazy)
+    missing = set()
+    sprite_list.extend(build_region_sprites(
+        level, layer_name, 0, 0, level.width, level.height, scaling,
+        texture_manager, textures, missing))
+
+    if missing:
+        print(f"Warning: layer '{layer_name}' uses undefined tiles "
+              f"{sorted(missing)}; using invisible placeholders")
+    return sprite_list
+
+
+def build_tile_map(level, scaling=1, layer_options=None, skip_layers=(),
+                   lazy=False):
+    """
+    Build sprite lists for every tile layer and wrap them in a
+    ``CompiledTileMap``.
+    Layers named in skip_layers (e.g. layers that are only drawn from
+    baked chunks, or streamed in by region) get an empty sprite list
+    instead, with the same options.
+    """
+    layer_options = layer_options or {}
+    texture_manager = ASSETS.texture_manager()
+    textures = {}
+    sprite_lists = {}
+    for name in level.layer_names:
+        options = layer_options.get(name, {})
+        if name in skip_layers:
+            sprite_lists[name] = arcade.SpriteList(
+                use_spatial_hash=options.get("use_spatial_hash", False),
+                lazy=lazy)
+            continue
+        sprite_lists[name] = build_sprite_list(
+            level, name, scaling,
+            use_spatial_hash=options.get("use_spatial_hash", False),
+            texture_manager=texture_manager, textures=textures, lazy=lazy)
+    return CompiledTileMap(level, scaling, sprite_lists)
+
+
+def load_level(map_path, scaling=1, layer_options=None, skip_layers=(),
+               lazy=False, level_data=None):
+    """
+    Load a level through the compiled cache and build its tile map.
+    level_data is an already read (level, cache_status, milliseconds),
+    e.g. from a level bundle, to build from instead of the cache.
+    Returns (tile_map, stats) where stats holds the cache status and
+    load timings in milliseconds.
+    """
+    if level_data is None:
+        level_data = load_level_data(map_path)
+    level, status, read_ms = level_data
+    start = time.perf_counter()
+    tile_map = build_tile_map(level, scaling, layer_options, skip_layers,
+                              lazy)
+    build_ms = (time.perf_counter() - start) * 1000
+    stats = {
+        "map": os.path.basename(map_path),
+        "cache": status,
+        "read_ms": read_ms,
+        "build_ms": build_ms,
+        "total_ms": read_ms + build_ms,
+    }
+    return tile_map, stats
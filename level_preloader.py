@@ -0,0 +1,256 @@
+"""
+Background Level Preloading
+
+Everything a level needs that does not touch OpenGL (map data, tile
+sprite lists, the tile query grids, and any extra products a renderer
+registers, such as baked chunk textures) is gathered into a
+PreparedLevel by prepare_level(), from the level's packed bundle when
+one has been built (see level_bundle.py) and from its TMX file
+otherwise. LevelPreloader runs prepare_level() for the next level on a
+worker thread while the current one is being played, so switching
+levels only has to swap the prepared data in.
+
+Before anything is built, the images the level draws from (its
+tileset images, plus any sprite images the caller names) are decoded
+in parallel into the asset registry.
+
+prepare_level_steps() does the same work as a staged generator (see
+startup_loader.py), so the first level can be built a few stages per
+frame behind a loading screen.
+
+Sprite lists built on the worker are lazy: their OpenGL buffers are
+created on the main thread the first time they are drawn.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from assets import ASSETS
+from level_bundle import bundle_path_for, read_bundle
+from level_cache import GID_MASK, load_level, load_level_data
+from startup_loader import run_steps
+from tile_query import TileLayerGrid
+from tile_raycast import TileRaycaster
+
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Stages prepare_level_steps() yields, not counting one per builder
+PREPARE_STAGES = 4
+
+
+class PreparedLevel:
+    """
+    A level's loaded data, ready to be swapped into a GameWorld.
+    """
+
+    def __init__(self, level_number, tile_map, wall_grid, tile_grids,
+                 load_stats, extras, prepare_ms, bundle=None):
+        """
+        Bundle the products of prepare_level().
+        """
+        self.level_number = level_number
+        # LevelBundle the level was loaded from, or None
+        self.bundle = bundle
+        self.tile_map = tile_map
+        self.wall_grid = wall_grid
+        # Layer name -> TileLayerGrid
+        self.tile_grids = tile_grids
+        self.load_stats = load_stats
+        # Builder name -> result for registered extra builders
+        self.extras = extras
+        self.prepare_ms = prepare_ms
+
+
+def level_map_path(level_number):
+    """
+    Return the path of a level's Tiled map.
+    """
+    return os.path.join(GAME_DIR, f"Level{level_number}.tmx")
+
+
+def level_images(level):
+    """
+    Return the image files of the tiles a level's layers use.
+    """
+    used = set()
+    for name in level.layer_names:
+        used.update(gid & GID_MASK for gid in
+                    np.unique(np.asarray(level.layers[name])).tolist())
+    return sorted({level.tiles[gid][0] for gid in used
+                   if gid in level.tiles})
+
+
+def prepare_level(level_number, **options):
+    """
+    Prepare a level in one go (see prepare_level_steps()) and return
+    its PreparedLevel.
+    """
+    return run_steps(prepare_level_steps(level_number, **options))
+
+
+def prepare_level_steps(level_number, scaling=1, layer_options=None,
+                        skip_layers=(), collision_layer="Platforms",
+                        query_layers=(), builders=None, lazy=False,
+                        use_bundle=True, level_enemies=None,
+                        preload_images=()):
+    """
+    Load a level's map and build its sprite lists, tile query grids
+    (for the collision layer and each of query_layers the map has),
+    wall raycaster and any extra products.
+    builders maps a name to a callable taking the LevelData; results
+    are stored in PreparedLevel.extras under the same name.
+    The level's bundle is used when use_bundle is set and it is
+    current (built from the level's level_enemies entry, when that
+    table is given); its cache status is then "bundle".
+    The level's tileset images and preload_images are decoded in
+    parallel first; load_stats["decode"] holds the preload summary.
+    A generator: yields (category, label) before each stage and
+    returns the PreparedLevel.
+    """
+    start = time.perf_counter()
+    yield "tilemap parse", "Reading the map"
+    bundle = None
+    level_data = None
+    if use_bundle:
+        enemies = None
+        if level_enemies is not None:
+            enemies = level_enemies.get(level_number, [])
+        bundle = read_bundle(bundle_path_for(level_number), enemies)
+    if bundle is not None:
+        level_data = (bundle.level, "bundle", bundle.read_ms)
+    else:
+        level_data = load_level_data(level_map_path(level_number))
+    yield "asset load", "Decoding images"
+    # Sprite images the bundle's atlas holds are cut from it instead
+    images = level_images(level_data[0]) + [
+        path for path in preload_images
+        if bundle is None or os.path.abspath(path) not in bundle.frame_regions]
+    decode = ASSETS.preload(images)
+    yield "scene build", "Building tile sprites"
+    tile_map, load_stats = load_level(
+        level_map_path(level_number), scaling=scaling,
+        layer_options=layer_options, skip_layers=skip_layers, lazy=lazy,
+        level_data=level_data)
+    load_stats["decode"] = decode
+    yield "physics setup", "Building tile query grids"
+    level = tile_map.level
+    tile_grids = {collision_layer: TileLayerGrid(
+        level, collision_layer, scaling, with_shapes=False)}
+    for name in query_layers:
+        if name in level.layers:
+            tile_grids[name] = TileLayerGrid(level, name, scaling)
+    wall_grid = TileRaycaster(tile_grids[collision_layer])
+    extras = {}
+    for name, build in (builders or {}).items():
+        yield "scene build", f"Building {name}"
+        extras[name] = build(tile_map.level)
+    prepare_ms = (time.perf_counter() - start) * 1000
+    return PreparedLevel(level_number, tile_map, wall_grid, tile_grids,
+                         load_stats, extras, prepare_ms, bundle)
+
+
+class LevelPreloader:
+    """
+    Prepares one level at a time on a background thread.
+    Status is "idle", "loading", "ready" or "failed".
+    """
+
+    def __init__(self, builders=None, **prepare_options):
+        """
+        Create a preloader. prepare_options are passed on to
+        prepare_level() for every request.
+        """
+        self.builders = dict(builders or {})
+        self.prepare_options = prepare_options
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="level-preload")
+        self.level_number = None
+        self.future = None
+        self.requested_at = 0
+        # Timings of the most recent swap, in milliseconds
+        self.last_wait_ms = 0
+        self.last_prepare_ms = 0
+
+    def request(self, level_number):
+        """
+        Start preparing a level in the background (no-op if it is
+        already being prepared).
+        """
+        if self.level_number == level_number and self.future is not None:
+            return
+        if self.future is not None:
+            self.future.cancel()
+        self.level_number = level_number
+        self.requested_at = time.perf_counter()
+        self.future = self.executor.submit(
+            prepare_level, level_number, builders=self.builders,
+            lazy=True, **self.prepare_options)
+
+    @property
+    def status(self):
+        """
+        Return the state of the current request.
+        """
+        if self.future is None:
+            return "idle"
+        if not self.future.done():
+            return "loading"
+        if self.future.cancelled() or self.future.exception() is not None:
+            return "failed"
+        return "ready"
+
+    def elapsed_ms(self):
+        """
+        Return how long ago the current request was made.
+        """
+        if self.future is None:
+            return 0
+        return (time.perf_counter() - self.requested_at) * 1000
+
+    def status_text(self):
+        """
+        Return a one-line description of the preload, for display.
+        """
+        if self.future is None:
+            return "preload: idle"
+        status = self.status
+        if status == "ready":
+            prepare_ms = self.future.result().prepare_ms
+            return (f"preload: Level{self.level_number} ready "
+                    f"({prepare_ms:.0f} ms)")
+        return (f"preload: Level{self.level_number} {status} "
+                f"({self.elapsed_ms():.0f} ms)")
+
+    def take(self, level_number):
+        """
+        Return the prepared level, waiting for it if it is still
+        loading. Returns None if that level was not requested or its
+        preparation failed (the caller then loads it directly).
+        """
+        if self.level_number != level_number or self.future is None:
+            return None
+        future, self.future = self.future, None
+        self.level_number = None
+
+        start = time.perf_counter()
+        try:
+            prepared = future.result()
+        except Exception as error:
+            print(f"Warning: preloading Level{level_number} failed: "
+                  f"{error}")
+            return None
+        self.last_wait_ms = (time.perf_counter() - start) * 1000
+        self.last_prepare_ms = prepared.prepare_ms
+        return prepared
+
+    def shutdown(self):
+        """
+        Stop the worker thread, abandoning any pending request.
+        """
+        if self.future is not None:
+            self.future.cancel()
+        self.future = None
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,248 @@
+"""
+Pooled Projectile System
+
+All attacks (knight slashes, arrows, fire) are Projectile sprites
+described by a ProjectileType: speed, lifetime, damage, pierce,
+flicker textures and spawn offset. Projectiles come from a
+preallocated pool and go back to it when they expire or are used up,
+so firing does not allocate sprites. Every live projectile is in one
+sprite list, which is updated, culled, hit-tested and drawn in one
+pass each.
+"""
+
+import arcade
+
+# Projectiles preallocated per pool
+POOL_CAPACITY = 64
+
+# How far past the view edges a projectile may go before it is culled
+CULL_MARGIN = 200
+
+
+class ProjectileType:
+    """
+    Data describing one kind of projectile.
+    """
+
+    def __init__(self, name, textures, damage, speed=0, lifetime=None,
+                 pierce=1, flicker_rate=None, offset=(0, 0), scale=1,
+                 hits_walls=False, culled=False):
+        """
+        textures maps "right"/"left" to a sequence of textures (more
+        than one flickers every flicker_rate seconds). speed is in
+        pixels per frame along the facing direction; lifetime is in
+        seconds, or None to live until it hits something or is culled.
+        pierce is the number of enemies it can hit before it is used
+        up. hits_walls projectiles stop at solid tiles; culled ones are
+        removed once they leave the area around the view.
+        """
+        self.name = name
+        self.textures = {facing: tuple(frames)
+                         for facing, frames in textures.items()}
+        self.damage = damage
+        self.speed = speed
+        self.lifetime = lifetime
+        self.pierce = pierce
+        self.flicker_rate = flicker_rate
+        self.offset = offset
+        self.scale = scale
+        self.hits_walls = hits_walls
+        self.culled = culled
+
+
+class Projectile(arcade.Sprite):
+    """
+    A pooled projectile sprite. Its kind is set each time it is
+    launched.
+    """
+
+    def __init__(self, index=-1):
+        """
+        Create an idle projectile, number index of its pool.
+        """
+        super().__init__()
+        self.index = index
+        self.kind = None
+        self.frames = ()
+        self.frame = 0
+        self.timer = 0.0
+        self.flicker_timer = 0.0
+        self.hits_left = 0
+        self.enemies_hit = set()
+        # Offset from the centre to the front of the hit box along
+        # the direction of motion (the point wall raycasts follow)
+        self.front_x = 0.0
+        self.front_y = 0.0
+
+    def launch(self, kind, x, y, facing):
+        """
+        Reset the projectile as a new one of a kind, fired from (x, y)
+        towards facing ("right" or "left").
+        """
+        direction = 1 if facing == "right" else -1
+        offset_x, offset_y = kind.offset
+        self.kind = kind
+        self.frames = kind.textures[facing]
+        self.frame = 0
+        self.texture = self.frames[0]
+        self.scale = kind.scale
+        self.center_x = x + offset_x * direction
+        self.center_y = y + offset_y
+        self.change_x = kind.speed * direction
+        self.change_y = 0
+        if kind.speed:
+            front = self.right if direction > 0 else self.left
+            self.front_x = front - self.center_x
+        else:
+            self.front_x = 0.0
+        self.front_y = 0.0
+        self.timer = 0.0
+        self.flicker_timer = 0.0
+        self.hits_left = kind.pierce
+        self.enemies_hit.clear()
+
+
+class ProjectilePool:
+    """
+    Preallocated projectiles plus the sprite list of live ones.
+    """
+
+    def __init__(self, capacity=POOL_CAPACITY):
+        """
+        Allocate capacity idle projectiles.
+        """
+        # Every projectile the pool has created, by index
+        self.projectiles = [Projectile(index) for index in range(capacity)]
+        self.free = list(self.projectiles)
+        self.active = arcade.SpriteList(capacity=capacity)
+        # Projectiles created because the pool ran dry
+        self.allocations = 0
+        # Counts spawns, releases and rearrangements
+        self.changes = 0
+
+    def __len__(self):
+        return len(self.active)
+
+    def spawn(self, kind, x, y, facing):
+        """
+        Launch a projectile of a kind and return it.
+        """
+        if self.free:
+            projectile = self.free.pop()
+        else:
+            projectile = Projectile(len(self.projectiles))
+            self.projectiles.append(projectile)
+            self.allocations += 1
+        projectile.launch(kind, x, y, facing)
+        self.active.append(projectile)
+        self.changes += 1
+        return projectile
+
+    def release(self, projectile):
+        """
+        Return a live projectile to the pool.
+        """
+        self.active.remove(projectile)
+        self.free.append(projectile)
+        self.changes += 1
+
+    def rearrange(self, active, free):
+        """
+        Make the given projectiles the live ones, in order, and the
+        free ones, in order (the last is reused first), e.g. to go back
+        to a rewind snapshot. Together they must be every projectile.
+        """
+        for projectile in list(self.active):
+            self.active.remove(projectile)
+        self.active.extend(active)
+        self.free[:] = free
+        self.changes += 1
+
+    def of_kind(self, name):
+        """
+        Return the live projectiles of a kind, oldest first.
+        """
+        return [projectile for projectile in self.active
+                if projectile.kind.name == name]
+
+    def update(self, delta_time):
+        """
+        Move every projectile, expire those past their lifetime and
+        advance flicker animations.
+        """
+        expired = []
+        for projectile in self.active:
+            kind = projectile.kind
+            if kind.speed:
+                projectile.center_x += projectile.change_x
+            if kind.lifetime is not None:
+                projectile.timer += delta_time
+                if projectile.timer >= kind.lifetime:
+                    expired.append(projectile)
+                    continue
+            if kind.flicker_rate is not None:
+                projectile.flicker_timer += delta_time
+                if projectile.flicker_timer >= kind.flicker_rate:
+                    projectile.frame = ((projectile.frame + 1) %
+                                        len(projectile.frames))
+                    projectile.texture = projectile.frames[projectile.frame]
+                    projectile.flicker_timer = 0.0
+        for projectile in expired:
+            self.release(projectile)
+
+    def cull(self, wall_grid, left, bottom, right, top):
+        """
+        Release projectiles that hit a wall (hits_walls kinds) or are
+        more than CULL_MARGIN outside a view rectangle (culled kinds).
+        Wall hits are found by casting the segment the front of each
+        projectile swept this frame through a TileRaycaster, so a wall
+        cannot be skipped between frames.
+        Returns (kind name, x, y) for every wall impact point.
+        """
+        removed = []
+        impacts = []
+        cast = wall_grid.cast
+        for projectile in self.active:
+            kind = projectile.kind
+            x = projectile.center_x
+            y = projectile.center_y
+            if kind.culled and (
+                    x < left - CULL_MARGIN or x > right + CULL_MARGIN or
+                    y < bottom - CULL_MARGIN or y > top + CULL_MARGIN):
+                removed.append(projectile)
+            elif kind.hits_walls:
+                # Segment the front of the hit box swept this frame
+                x += projectile.front_x
+                y += projectile.front_y
+                hit = cast(x - projectile.change_x, y - projectile.change_y,
+                           x, y)
+                if hit is not None:
+                    impacts.append((kind.name, hit[0], hit[1]))
+                    removed.append(projectile)
+        for projectile in removed:
+            self.release(projectile)
+        return impacts
+
+    def resolve_hits(self, grid):
+        """
+        Apply every projectile's damage to the enemies it touches
+        (found with a broad-phase UniformGrid), using up projectiles as
+        their pierce runs out.
+        Returns the enemies that were defeated (possibly repeated).
+        """
+        defeated = []
+        spent = []
+        for projectile in self.active:
+            for enemy in grid.query(projectile):
+                if enemy in projectile.enemies_hit:
+                    continue
+                if enemy.take_damage(projectile.kind.damage):
+                    defeated.append(enemy)
+                projectile.hits_left -= 1
+                if projectile.hits_left <= 0:
+                    spent.append(projectile)
+                    break
+                projectile.enemies_hit.add(enemy)
+        for projectile in spent:
+            self.release(projectile)
+        return defeated
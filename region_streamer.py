@@ -0,0 +1,243 @@
+"""
+Region Streaming
+
+Instead of baking every chunk texture when a level loads, the map is
+split into square regions of REGION_TILES x REGION_TILES cells that
+are built around the camera as the player moves and dropped again once
+they are far away, so the memory a level's graphics take depends on
+the view size rather than the map size.
+
+What a region holds comes from its consumers: objects with
+
+    build_region(column_start, row_start, column_end, row_end)
+        -> (product, bytes)   runs on the streaming thread
+    install(key, product)     main thread, when the region is ready
+    evict(key, product)       main thread, when it is dropped
+
+Regions within LOAD_MARGIN regions of the view are requested ahead of
+time and built on a background thread. A region the view itself
+overlaps is needed now: if it is not ready the main thread waits for
+it, so what the simulation sees never depends on thread timing.
+Loaded regions are kept while they are within KEEP_MARGIN regions of
+the view (so walking back and forth over a boundary does not rebuild
+anything), and beyond that only while the estimated total stays under
+the memory budget, farthest first.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Region size in tiles (the same as a baked chunk, so one region is
+# one chunk texture)
+REGION_TILES = 32
+
+# Regions this far (in regions) around the view are loaded ahead...
+LOAD_MARGIN = 1
+# ...and loaded regions this close are never evicted
+KEEP_MARGIN = 2
+
+# Estimated bytes regions may hold before far ones are evicted
+MEMORY_BUDGET = 96 * 1024 * 1024
+
+
+class RegionStreamer:
+    """
+    Loads and evicts a level's regions around a moving view.
+    Call update() with the view rectangle every step and close() when
+    the level is left.
+    """
+
+    def __init__(self, level, scaling=1, region_tiles=REGION_TILES,
+                 budget=MEMORY_BUDGET, load_margin=LOAD_MARGIN,
+                 keep_margin=KEEP_MARGIN):
+        """
+        Create a streamer for a level with no regions loaded.
+        """
+        self.level = level
+        self.region_tiles = region_tiles
+        self.region_width = region_tiles * level.tile_width * scaling
+        self.region_height = region_tiles * level.tile_height * scaling
+        self.columns = -(-level.width // region_tiles)
+        self.rows = -(-level.height // region_tiles)
+        # Tiles larger than a cell stick out of their cell (up and to
+        # the right), so the view is widened by that much when working
+        # out which regions it needs
+        self.overhang = max([0] + [
+            max(width - level.tile_width, height - level.tile_height)
+            for _, _, _, width, height in level.tiles.values()]) * scaling
+        self.budget = budget
+        self.load_margin = load_margin
+        self.keep_margin = max(keep_margin, load_margin)
+
+        # Name -> consumer, in install order
+        self.consumers = {}
+        # (region_column, region_row) -> (products, bytes), region_row 0
+        # at the bottom of the map like the chunks
+        self.loaded = {}
+        # (region_column, region_row) -> future of products, bytes
+        self.pending = {}
+        self.memory = 0
+        # Region range of the view at the last update
+        self.view_range = None
+
+        # Counters for the status line
+        self.loads = 0
+        self.evictions = 0
+        self.stalls = 0
+        self.stall_ms = 0
+        self.peak_memory = 0
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="region-stream")
+
+    def add_consumer(self, name, consumer):
+        """
+        Register a consumer. Add consumers before the first update().
+        """
+        self.consumers[name] = consumer
+
+    def region_range(self, left, bottom, right, top, margin=0):
+        """
+        Return the (first_column, first_row, last_column, last_row) of
+        the regions a world rectangle overlaps, widened by margin
+        regions and clipped to the map.
+        """
+        return (
+            max(int(left // self.region_width) - margin, 0),
+            max(int(bottom // self.region_height) - margin, 0),
+            min(int(right // self.region_width) + margin, self.columns - 1),
+            min(int(top // self.region_height) + margin, self.rows - 1),
+        )
+
+    def _build(self, key):
+        """
+        Build every consumer's product for a region.
+        Runs on the streaming thread.
+        """
+        region_column, region_row = key
+        tiles = self.region_tiles
+        height = self.level.height
+        # Map rows are stored top-down; region rows count bottom-up
+        row_end = height - region_row * tiles
+        row_start = max(row_end - tiles, 0)
+        column_start = region_column * tiles
+        column_end = min(column_start + tiles, self.level.width)
+
+        products = {}
+        size = 0
+        for name, consumer in self.consumers.items():
+            products[name], product_size = consumer.build_region(
+                column_start, row_start, column_end, row_end)
+            size += product_size
+        return products, size
+
+    def _install(self, key, future):
+        """
+        Hand a built region to its consumers.
+        """
+        products, size = future.result()
+        for name, consumer in self.consumers.items():
+            consumer.install(key, products[name])
+        self.loaded[key] = (products, size)
+        self.memory += size
+        self.peak_memory = max(self.peak_memory, self.memory)
+        self.loads += 1
+
+    def _evict(self, key):
+        """
+        Drop a loaded region.
+        """
+        products, size = self.loaded.pop(key)
+        for name, consumer in self.consumers.items():
+            consumer.evict(key, products[name])
+        self.memory -= size
+        self.evictions += 1
+
+    def update(self, left, bottom, right, top):
+        """
+        Bring the regions around a world-space view rectangle in and
+        evict far ones. Regions the view overlaps are loaded before
+        this returns.
+        """
+        left -= self.overhang
+        bottom -= self.overhang
+        view_range = self.region_range(left, bottom, right, top)
+        if view_range != self.view_range:
+            self.view_range = view_range
+            first_column, first_row, last_column, last_row = (
+                self.region_range(left, bottom, right, top,
+                                  self.load_margin))
+            for region_row in range(first_row, last_row + 1):
+                for region_column in range(first_column, last_column + 1):
+                    key = (region_column, region_row)
+                    if key not in self.loaded and key not in self.pending:
+                        self.pending[key] = self.executor.submit(
+                            self._build, key)
+
+            # Wait for any region in view that is not built yet
+            first_column, first_row, last_column, last_row = view_range
+            for region_row in range(first_row, last_row + 1):
+                for region_column in range(first_column, last_column + 1):
+                    key = (region_column, region_row)
+                    future = self.pending.pop(key, None)
+                    if future is None:
+                        continue
+                    if not future.done():
+                        start = time.perf_counter()
+                        future.result()
+                        self.stalls += 1
+                        self.stall_ms += (time.perf_counter() - start) * 1000
+                    self._install(key, future)
+            self._trim()
+
+        # Install regions the background thread has finished
+        if self.pending:
+            for key in [key for key, future in self.pending.items()
+                        if future.done()]:
+                self._install(key, self.pending.pop(key))
+            self._trim()
+
+    def _distance(self, key):
+        """
+        Return how many regions a region lies outside the view range.
+        """
+        first_column, first_row, last_column, last_row = self.view_range
+        region_column, region_row = key
+        return max(first_column - region_column, region_column - last_column,
+                   first_row - region_row, region_row - last_row, 0)
+
+    def _trim(self):
+        """
+        Evict regions beyond the keep margin, farthest first, until the
+        estimated memory is within budget.
+        """
+        if self.memory <= self.budget:
+            return
+        far = sorted((key for key in self.loaded
+                      if self._distance(key) > self.keep_margin),
+                     key=self._distance, reverse=True)
+        for key in far:
+            if self.memory <= self.budget:
+                break
+            self._evict(key)
+
+    def status_text(self):
+        """
+        Return a one-line summary of the streaming state, for display.
+        """
+        return (f"regions: {len(self.loaded)} loaded "
+                f"({self.memory / 1048576:.0f} MB, "
+                f"peak {self.peak_memory / 1048576:.0f} MB), "
+                f"{len(self.pending)} pending, {self.stalls} stalls")
+
+    def close(self):
+        """
+        Stop streaming, abandoning pending regions and evicting every
+        loaded one.
+        """
+        for future in self.pending.values():
+            future.cancel()
+        self.pending.clear()
+        self.executor.shutdown(wait=True)
+        for key in list(self.loaded):
+            self._evict(key)
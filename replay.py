@@ -0,0 +1,289 @@
+"""
+Deterministic Input Recording and Replay
+
+Records the key events a GameWorld receives, grouped by the simulation
+step they arrive before, together with each step's delta time and a
+hash of the world state after the step. Replaying a log feeds the same
+events and delta times back into a fresh world and compares the state
+hashes step by step, so any divergence is flagged at the exact step it
+first happens.
+
+Log file layout: a fixed header (magic, version, level, step count)
+followed by a zlib-compressed body holding, per step, the delta time
+and its events, then one CRC32 state hash per step.
+
+Command line:
+    python replay.py play LOG            replay headless and verify
+    python replay.py script LOG --level N --steps N [--seed S]
+                                         record a scripted random run
+"""
+
+import argparse
+import random
+import struct
+import time
+import zlib
+from array import array
+
+import arcade
+
+LOG_MAGIC = b"RPLY"
+LOG_VERSION = 1
+
+# magic, version, level, step count
+LOG_HEADER = struct.Struct("<4sHHI")
+# delta time, number of events
+STEP_RECORD = struct.Struct("<dH")
+# event kind, key code
+EVENT_RECORD = struct.Struct("<BI")
+
+KEY_PRESS = 0
+KEY_RELEASE = 1
+
+# Keys the scripted runs choose from
+SCRIPT_KEYS = (
+    arcade.key.A, arcade.key.D, arcade.key.W, arcade.key.SPACE,
+    arcade.key.E, arcade.key.KEY_1, arcade.key.KEY_2, arcade.key.KEY_3,
+)
+
+
+def state_hash(world):
+    """
+    Return a CRC32 of the world's mutable state: level, player
+    position, velocity and ability state, enemies and projectiles.
+    """
+    player = world.player
+    sprite = player.sprite
+    values = [
+        world.level, world.steps, int(world.game_won),
+        player.current_character_index, player.health,
+        sprite.center_x, sprite.center_y, sprite.change_x, sprite.change_y,
+        int(player.is_invincible), player.damage_timer,
+        int(player.is_floating), player.float_timer,
+        int(player.is_climbing), int(player.archer_dashing),
+        player.dash_timer, player.dash_cooldown_timer,
+        int(player.is_attacking), player.attack_timer,
+        player.attack_cooldown_timer,
+    ]
+    manager = world.enemy_manager
+    for enemy in world.enemies:
+        index = enemy.index
+        values += (*manager.motion(index), manager.hp[index])
+    for kind in ("knight", "archer", "wizard"):
+        projectiles = world.projectiles.of_kind(kind)
+        values.append(len(projectiles))
+        for projectile in projectiles:
+            values += (projectile.center_x, projectile.center_y)
+    packed = struct.pack(f"<{len(values)}d", *values)
+    return zlib.crc32(packed)
+
+
+class InputLog:
+    """
+    A recorded session: the starting level, each step's delta time
+    and key events, and the state hash after each step.
+    """
+
+    def __init__(self, level=1):
+        """
+        Create an empty log for a session starting on a level.
+        """
+        self.level = level
+        # One (delta_time, [(kind, key), ...]) entry per step
+        self.steps = []
+        self.hashes = array("I")
+
+    def save(self, path):
+        """
+        Write the log to a file.
+        """
+        body = bytearray()
+        for delta_time, events in self.steps:
+            body += STEP_RECORD.pack(delta_time, len(events))
+            for kind, key in events:
+                body += EVENT_RECORD.pack(kind, key)
+        body += self.hashes.tobytes()
+        with open(path, "wb") as file:
+            file.write(LOG_HEADER.pack(
+                LOG_MAGIC, LOG_VERSION, self.level, len(self.steps)))
+            file.write(zlib.compress(bytes(body), 9))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read a log from a file.
+        """
+        with open(path, "rb") as file:
+            data = file.read()
+        magic, version, level, step_count = LOG_HEADER.unpack_from(data)
+        if magic != LOG_MAGIC or version != LOG_VERSION:
+            raise ValueError(f"{path} is not a version {LOG_VERSION} "
+                             "replay log")
+
+        log = cls(level)
+        body = zlib.decompress(data[LOG_HEADER.size:])
+        offset = 0
+        for _ in range(step_count):
+            delta_time, event_count = STEP_RECORD.unpack_from(body, offset)
+            offset += STEP_RECORD.size
+            events = []
+            for _ in range(event_count):
+                events.append(EVENT_RECORD.unpack_from(body, offset))
+                offset += EVENT_RECORD.size
+            log.steps.append((delta_time, events))
+        log.hashes.frombytes(body[offset:offset + step_count * 4])
+        return log
+
+
+class InputRecorder:
+    """
+    Input source that forwards key events and steps to a world while
+    recording them. Must be attached right after world.setup().
+    """
+
+    def __init__(self, world):
+        """
+        Start recording a world from its current level.
+        """
+        self.world = world
+        self.log = InputLog(world.level)
+        self.pending = []
+
+    def key_press(self, key):
+        """
+        Record and forward a key press.
+        """
+        self.pending.append((KEY_PRESS, key))
+        self.world.key_press(key)
+
+    def key_release(self, key):
+        """
+        Record and forward a key release.
+        """
+        self.pending.append((KEY_RELEASE, key))
+        self.world.key_release(key)
+
+    def step(self, delta_time):
+        """
+        Step the world and record the step's events and state hash.
+        """
+        events, self.pending = self.pending, []
+        self.world.step(delta_time)
+        self.log.steps.append((delta_time, events))
+        self.log.hashes.append(state_hash(self.world))
+
+
+class ReplayDriver:
+    """
+    Feeds a recorded log back into a world step by step and checks
+    the state hash after every step.
+    """
+
+    def __init__(self, world, log):
+        """
+        Prepare to replay a log into a freshly set up world.
+        """
+        self.world = world
+        self.log = log
+        self.position = 0
+        # Index of the first step whose state hash did not match
+        self.divergence = None
+
+    @property
+    def finished(self):
+        """
+        True once every recorded step has been replayed.
+        """
+        return self.position >= len(self.log.steps)
+
+    def step(self):
+        """
+        Replay the next step. Returns False when the log is finished.
+        """
+        if self.finished:
+            return False
+        delta_time, events = self.log.steps[self.position]
+        for kind, key in events:
+            if kind == KEY_PRESS:
+                self.world.key_press(key)
+            else:
+                self.world.key_release(key)
+        self.world.step(delta_time)
+
+        if (self.divergence is None and
+                state_hash(self.world) != self.log.hashes[self.position]):
+            self.divergence = self.position
+            print(f"Replay diverged at step {self.position}")
+        self.position += 1
+        return True
+
+    def run(self):
+        """
+        Replay the whole log. Returns the first divergent step or None.
+        """
+        while self.step():
+            pass
+        return self.divergence
+
+
+def record_script(world, steps, seed=0, delta_time=1 / 60):
+    """
+    Drive a world with a seeded pseudo-random key script and return
+    the recorded log. The same seed always produces the same run.
+    """
+    rng = random.Random(seed)
+    recorder = InputRecorder(world)
+    releases = {}
+    for step in range(steps):
+        for key in releases.pop(step, ()):
+            recorder.key_release(key)
+        if step % 12 == 0:
+            key = rng.choice(SCRIPT_KEYS)
+            recorder.key_press(key)
+            releases.setdefault(step + rng.randint(1, 30), []).append(key)
+        recorder.step(delta_time)
+    return recorder.log
+
+
+def main():
+    """
+    Command line entry point for replaying and scripting logs.
+    """
+    from game import GameWorld
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+    play = commands.add_parser("play", help="replay a log headless")
+    play.add_argument("log")
+    script = commands.add_parser("script", help="record a scripted run")
+    script.add_argument("log")
+    script.add_argument("--level", type=int, default=1)
+    script.add_argument("--steps", type=int, default=3600)
+    script.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == "script":
+        world = GameWorld(args.level)
+        world.setup()
+        log = record_script(world, args.steps, args.seed)
+        log.save(args.log)
+        print(f"Recorded {len(log.steps)} steps to {args.log}")
+        return
+
+    log = InputLog.load(args.log)
+    world = GameWorld(log.level)
+    world.setup()
+    driver = ReplayDriver(world, log)
+    start = time.perf_counter()
+    divergence = driver.run()
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {len(log.steps)} steps in {elapsed:.2f} s "
+          f"({len(log.steps) / elapsed:.0f} steps/s)")
+    if divergence is None:
+        print("No divergence: every state hash matched")
+    else:
+        raise SystemExit(f"Diverged at step {divergence}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,556 @@
+"""
+Rewind History
+
+After every simulation step the world's mutable state is packed into
+one float64 vector: the player (sprite position and velocity, texture,
+every ability timer and flag), the enemy manager's rows (serial,
+position, velocity, HP, damage flash), the projectile pool, the
+trigger zones the player is inside and the activated checkpoints.
+Holding the rewind key steps back through these one frame per step.
+
+A ring buffer holds the last HISTORY_FRAMES frames. Every
+KEYFRAME_INTERVAL frames a whole vector (a keyframe) is stored; the
+frames in between only store the 64-bit words that changed since the
+frame before (their indices, then their values), which is usually a
+few words per moving entity. A frame is rebuilt by applying its
+keyframe's following deltas in order.
+
+Sleeping enemies (see enemy_manager.py) are stored as their frozen
+rows plus the frame they fell asleep on, so they cost nothing per
+frame; they are woken up exactly where they would be when restored.
+
+Capturing starts from a copy of the previous vector and only rewrites
+what can have changed: the player, the enemies' positions and
+velocities and the live projectiles every frame, everything else only
+when the enemy manager's or projectile pool's change counter moved (or
+a trigger zone list was replaced). Its cost is measured
+(capture_text()) against CAPTURE_BUDGET_US on average and, frame by
+frame, against CAPTURE_PEAK_US for the 99th percentile of delta
+frames. Keyframes only copy the whole vector instead of comparing it
+with the previous one, so they are timed separately and exempt from
+the per-frame limit.
+"""
+
+import time
+from bisect import bisect_right
+from collections import deque
+from operator import attrgetter
+
+import numpy as np
+
+from enemy_manager import FLASH_RATE
+
+# Frames of history kept (five minutes at 60 steps per second)
+HISTORY_FRAMES = 5 * 60 * 60
+
+# A whole state vector is stored every this many frames
+KEYFRAME_INTERVAL = 120
+
+# Microseconds a capture should take on average
+CAPTURE_BUDGET_US = 50
+
+# Microseconds 99% of delta (non-keyframe) captures should stay under
+CAPTURE_PEAK_US = 250
+
+# Recent delta capture timings kept for percentiles
+CAPTURE_SAMPLES = 3600
+
+# Player attributes stored, with the type they are restored as
+PLAYER_FIELDS = (
+    ("current_character_index", int), ("health", int),
+    ("is_invincible", bool), ("damage_timer", float),
+    ("is_floating", bool), ("float_timer", float),
+    ("is_climbing", bool),
+    ("archer_dashing", bool), ("archer_dash_on_cd", bool),
+    ("dash_timer", float), ("dash_direction", int),
+    ("dash_cooldown_timer", float),
+    ("is_attacking", bool), ("attack_timer", float),
+    ("attack_on_cooldown", bool), ("attack_cooldown_timer", float),
+    ("walk_animation_index", int), ("climb_animation_index", int),
+    ("movement_accumulator", float),
+    ("climb_movement_accumulator", float),
+    ("spawn_x", float), ("spawn_y", float),
+)
+
+# Player sprite attributes stored, with the type they are restored as
+SPRITE_FIELDS = (
+    ("center_x", float), ("center_y", float),
+    ("change_x", float), ("change_y", float), ("alpha", int),
+)
+
+# Words before the player fields: world steps, game won, enemy
+# manager frame, facing (1 right, -1 left) and player texture id
+WORLD_WORDS = 5
+HEADER_WORDS = WORLD_WORDS + len(SPRITE_FIELDS) + len(PLAYER_FIELDS)
+
+# Words per enemy row: 1 + serial (0 for an empty row), x, y, velocity
+# x, velocity y, HP, flash timer, flashing, frame it fell asleep on
+# (-1 while awake)
+ENEMY_WORDS = 9
+
+# Words per pooled projectile before the serials of the enemies it has
+# already hit: place in the pool (1 + its position among the live ones,
+# or -1 - its position in the free list), kind, facing, x, y, change x,
+# front x, front y, timer, flicker timer, frame, hits left. Pooled
+# sprites keep the hit box of the first texture they were given, so
+# which one is reused next is part of the state too.
+PROJECTILE_WORDS = 12
+
+
+class RewindBuffer:
+    """
+    The rewind history of the current level. Call reset() when a
+    level is loaded, capture() after every step and rewind() to go
+    back one step.
+    """
+
+    def __init__(self, capacity=HISTORY_FRAMES,
+                 keyframe_interval=KEYFRAME_INTERVAL):
+        """
+        Create an empty history of up to capacity frames.
+        """
+        self.capacity = capacity
+        self.keyframe_interval = keyframe_interval
+        self.get_player = attrgetter(*[name for name, _ in PLAYER_FIELDS])
+        self.get_sprite = attrgetter(*[name for name, _ in SPRITE_FIELDS])
+
+        # Player textures by id (they are numbered as first seen, and
+        # kept across levels)
+        self.textures = []
+        self.texture_ids = {}
+
+        # Capture timings, in seconds: totals, recent delta captures
+        # and the slowest keyframe
+        self.captures = 0
+        self.capture_time = 0.0
+        self.delta_times = deque(maxlen=CAPTURE_SAMPLES)
+        self.keyframe_max = 0.0
+        self.clear()
+
+    def clear(self):
+        """
+        Forget every stored frame.
+        """
+        # Frame n is stored in slot n % capacity as bytes: a whole
+        # vector for keyframes, changed word indices then values for
+        # the others
+        self.entries = [None] * self.capacity
+        self.newest = -1
+        self.count = 0
+        self.stored_bytes = 0
+        # Frame numbers of the stored keyframes, oldest first
+        self.keyframes = deque()
+        # The newest frame's vector, and a spare one to encode into
+        self.previous = None
+        self.current = None
+        # The change counters and zone lists the newest frame's vector
+        # was written from (None: write everything)
+        self.copied = None
+
+    def reset(self, world):
+        """
+        Start a new history for the level the world has just loaded.
+        """
+        self.clear()
+        manager = world.enemy_manager
+        count = manager.count
+        order = np.argsort(manager.serial[:count])
+        # Enemy serial -> sprite, patrol bounds and starting HP (every
+        # enemy is added when the level loads, so serials are 0..n-1)
+        self.enemy_sprites = [manager.sprite_at[index]
+                              for index in order.tolist()]
+        self.enemy_serials = {sprite: serial for serial, sprite
+                              in enumerate(self.enemy_sprites)}
+        self.enemy_low = manager.low[order].tolist()
+        self.enemy_high = manager.high[order].tolist()
+        self.enemy_max_hp = manager.max_hp[order].tolist()
+
+        self.kinds = sorted(world.projectile_types.values(),
+                            key=attrgetter("name"))
+        self.kind_ids = {kind: index for index, kind in enumerate(self.kinds)}
+        self.hit_slots = max([kind.pierce - 1 for kind in self.kinds] + [0])
+        self.slot_words = PROJECTILE_WORDS + self.hit_slots
+
+        # The trigger zone sets the player can be inside, then one
+        # word per zone for each, then one per checkpoint zone for
+        # whether it was activated
+        self.zone_sets = [zones for zones in (world.hazard_zones,
+                                              world.exit_zones,
+                                              world.checkpoint_zones)
+                          if zones is not None]
+        self.enemy_start = HEADER_WORDS
+        self.zone_start = self.enemy_start + len(self.enemy_sprites) * (
+            ENEMY_WORDS)
+        self.checkpoint_start = self.zone_start + sum(
+            len(zones.zones) for zones in self.zone_sets)
+        checkpoint_count = 0
+        if world.checkpoint_zones is not None:
+            checkpoint_count = len(world.checkpoint_zones.zones)
+        self.projectile_start = self.checkpoint_start + checkpoint_count
+
+    def _texture_id(self, texture):
+        """
+        Return the id of a player texture, numbering new ones.
+        """
+        texture_id = self.texture_ids.get(texture)
+        if texture_id is None:
+            texture_id = self.texture_ids[texture] = len(self.textures)
+            self.textures.append(texture)
+        return texture_id
+
+    def _encode(self, world):
+        """
+        Pack the world's state into self.current and return it.
+        Only the parts that can have changed since the newest frame
+        are written; the rest is copied from it.
+        """
+        player = world.player
+        sprite = player.sprite
+        manager = world.enemy_manager
+        pool = world.projectiles
+        size = self.projectile_start + len(pool.projectiles) * (
+            self.slot_words)
+        vector = self.current
+        previous = self.previous
+        if vector is None or len(vector) != size:
+            vector = self.current = np.zeros(size)
+        if previous is not None and len(previous) == size:
+            vector[:] = previous
+        else:
+            self.copied = None
+
+        # World and player
+        vector[:HEADER_WORDS] = (
+            world.steps, world.game_won, manager.frame,
+            1 if player.facing_direction == "right" else -1,
+            self._texture_id(sprite.texture),
+            *self.get_sprite(sprite), *self.get_player(player))
+
+        # Enemies, in the manager's row order, then empty rows. Rows
+        # only move (and HP, flashes and sleep only change) when the
+        # manager counts a change.
+        enemies = vector[self.enemy_start:self.zone_start].reshape(
+            -1, ENEMY_WORDS)
+        count = manager.count
+        enemies[:count, 1:3] = manager.position[:count]
+        enemies[:count, 3:5] = manager.velocity[:count]
+        copied = self.copied
+        if copied is None or copied[0] != manager.changes:
+            awake = manager.awake_count
+            enemies[:count, 0] = manager.serial[:count]
+            enemies[:count, 0] += 1
+            enemies[:count, 5] = manager.hp[:count]
+            enemies[:count, 6] = manager.flash_timer[:count]
+            enemies[:count, 7] = manager.flashing[:count]
+            enemies[:awake, 8] = -1
+            enemies[awake:count, 8] = manager.slept_at[awake:count]
+            enemies[count:] = 0
+
+        # Zones the player is inside (each set's list is replaced when
+        # it changes), and activated checkpoints
+        inside = [zones.inside for zones in self.zone_sets]
+        checkpoint_count = len(world.activated_checkpoints)
+        if (copied is None or copied[2] != checkpoint_count or
+                any(old is not new for old, new in zip(copied[1], inside))):
+            vector[self.zone_start:self.projectile_start] = 0
+            start = self.zone_start
+            for zones in self.zone_sets:
+                for zone in zones.inside:
+                    vector[start + zone.index] = 1
+                start += len(zones.zones)
+            if world.checkpoint_zones is not None:
+                for level, index in world.activated_checkpoints:
+                    if level == world.level:
+                        vector[self.checkpoint_start + index] = 1
+
+        # Every pooled projectile's place in the pool (which only
+        # changes when the pool counts a change), and the state of the
+        # live ones
+        slots = vector[self.projectile_start:].reshape(-1, self.slot_words)
+        if copied is None or copied[3] != pool.changes:
+            slots[:] = 0
+            free = pool.free
+            if free:
+                slots[[projectile.index for projectile in free], 0] = (
+                    -np.arange(1, len(free) + 1))
+        for place, projectile in enumerate(pool.active, 1):
+            kind = projectile.kind
+            slots[projectile.index, :PROJECTILE_WORDS] = (
+                place, self.kind_ids[kind],
+                1 if projectile.frames is kind.textures["right"] else -1,
+                projectile.center_x, projectile.center_y,
+                projectile.change_x, projectile.front_x,
+                projectile.front_y, projectile.timer,
+                projectile.flicker_timer, projectile.frame,
+                projectile.hits_left)
+            if projectile.enemies_hit:
+                hits = sorted(self.enemy_serials[enemy]
+                              for enemy in projectile.enemies_hit)
+                slots[projectile.index,
+                      PROJECTILE_WORDS:PROJECTILE_WORDS + len(hits)] = hits
+
+        # What the vector now matches
+        self.copied = (manager.changes, inside, checkpoint_count,
+                       pool.changes)
+        return vector
+
+    def capture(self, world):
+        """
+        Store the world's state as the newest frame.
+        """
+        start = time.perf_counter()
+        vector = self._encode(world)
+        frame = self.newest + 1
+        previous = self.previous
+        is_keyframe = (previous is None or len(previous) != len(vector) or
+                       not self.keyframes or
+                       frame - self.keyframes[-1] >= self.keyframe_interval)
+        if is_keyframe:
+            data = vector.tobytes()
+            self.keyframes.append(frame)
+        else:
+            words = vector.view(np.uint64)
+            changed = np.flatnonzero(words != previous.view(np.uint64))
+            data = (changed.astype(self._index_type(vector)).tobytes() +
+                    words[changed].tobytes())
+
+        # Drop the oldest frame once the buffer is full
+        slot = frame % self.capacity
+        if self.count == self.capacity:
+            if self.keyframes[0] == frame - self.capacity:
+                self.keyframes.popleft()
+            self.stored_bytes -= len(self.entries[slot])
+            self.count -= 1
+        self.entries[slot] = data
+        self.stored_bytes += len(data)
+        self.newest = frame
+        self.count += 1
+        self.previous, self.current = vector, previous
+
+        elapsed = time.perf_counter() - start
+        self.captures += 1
+        self.capture_time += elapsed
+        if is_keyframe:
+            self.keyframe_max = max(self.keyframe_max, elapsed)
+        else:
+            self.delta_times.append(elapsed)
+
+    def _index_type(self, vector):
+        """
+        Return the dtype of a delta's word indices for a vector.
+        """
+        return np.uint16 if len(vector) <= 0x10000 else np.uint32
+
+    def frames_available(self):
+        """
+        Return how many steps back the history reaches.
+        """
+        if not self.keyframes:
+            return 0
+        return self.newest - self.keyframes[0]
+
+    def _rebuild(self, frame):
+        """
+        Return the vector of a stored frame, from its keyframe and the
+        deltas after it.
+        """
+        keyframe = self.keyframes[bisect_right(self.keyframes, frame) - 1]
+        vector = np.frombuffer(self.entries[keyframe % self.capacity]).copy()
+        words = vector.view(np.uint64)
+        index_type = self._index_type(vector)
+        entry_size = np.dtype(index_type).itemsize + 8
+        for delta_frame in range(keyframe + 1, frame + 1):
+            data = self.entries[delta_frame % self.capacity]
+            changed = len(data) // entry_size
+            indices = np.frombuffer(data, index_type, changed)
+            words[indices] = np.frombuffer(
+                data, np.uint64, changed, changed * (entry_size - 8))
+        return vector
+
+    def rewind(self, world):
+        """
+        Drop the newest frame and put the world back in the state of
+        the one before it. Returns False (changing nothing) if the
+        history does not reach back that far.
+        """
+        if self.frames_available() < 1:
+            return False
+        slot = self.newest % self.capacity
+        self.stored_bytes -= len(self.entries[slot])
+        self.entries[slot] = None
+        if self.keyframes[-1] == self.newest:
+            self.keyframes.pop()
+        self.newest -= 1
+        self.count -= 1
+        vector = self._rebuild(self.newest)
+        self._restore(world, vector)
+        self.previous = vector
+        self.copied = None
+        return True
+
+    def _restore(self, world, vector):
+        """
+        Put the world in the state packed in a vector.
+        """
+        values = vector.tolist()
+        player = world.player
+
+        # Player, switching character sprites if needed
+        (steps, game_won, enemy_frame, facing,
+         texture_id) = values[:WORLD_WORDS]
+        world.steps = int(steps)
+        world.game_won = bool(game_won)
+        sprite_end = WORLD_WORDS + len(SPRITE_FIELDS)
+        for (name, kind), value in zip(PLAYER_FIELDS,
+                                       values[sprite_end:HEADER_WORDS]):
+            setattr(player, name, kind(value))
+        player.facing_direction = "right" if facing > 0 else "left"
+        sprite = player.character_sprites[player.current_character_index]
+        if sprite is not player.sprite:
+            world.scene["Player"].remove(player.sprite)
+            player.sprite = sprite
+            world.scene.add_sprite("Player", sprite)
+            world.physics_engine.player_sprite = sprite
+        sprite.texture = self.textures[int(texture_id)]
+        for (name, kind), value in zip(SPRITE_FIELDS,
+                                       values[WORLD_WORDS:sprite_end]):
+            setattr(sprite, name, kind(value))
+
+        # Enemies are added back (awake, in serial order, so the
+        # sprite list keeps its order) and the far ones put to sleep
+        # again below
+        manager = world.enemy_manager
+        for enemy in list(manager.sprite_at):
+            manager.remove(enemy)
+        manager.frame = int(enemy_frame)
+        enemies = values[self.enemy_start:self.zone_start]
+        rows = sorted(enemies[start:start + ENEMY_WORDS] for start
+                      in range(0, len(enemies), ENEMY_WORDS)
+                      if enemies[start])
+        for (serial, x, y, velocity_x, velocity_y, hp, flash_timer,
+             flashing, slept_at) in rows:
+            serial = int(serial) - 1
+            enemy = self.enemy_sprites[serial]
+            (left, bottom), (right, top) = (self.enemy_low[serial],
+                                            self.enemy_high[serial])
+            manager.add(enemy, x, y, left, right, bottom, top,
+                        velocity_x, velocity_y, int(hp))
+            index = enemy.index
+            manager.serial[index] = serial
+            manager.max_hp[index] = self.enemy_max_hp[serial]
+            manager.flash_timer[index] = flash_timer
+            manager.flashing[index] = bool(flashing)
+            if slept_at >= 0:
+                # Move it to where it would be now
+                manager.slept_at[index] = int(slept_at)
+                manager.awake_count -= 1
+                x, y, velocity_x, velocity_y = manager.motion(index)
+                manager.awake_count += 1
+                manager.position[index] = (x, y)
+                manager.velocity[index] = (velocity_x, velocity_y)
+                manager.sprite_position[index] = (x, y)
+                enemy.position = (x, y)
+            dim = flashing and int(flash_timer * FLASH_RATE) % 2 == 1
+            enemy.alpha = 128 if dim else 255
+        manager.next_serial = len(self.enemy_sprites)
+
+        # Trigger zones, without calling their handlers
+        start = self.zone_start
+        for zones in self.zone_sets:
+            flags = values[start:start + len(zones.zones)]
+            zones.restore([index for index, inside in enumerate(flags)
+                           if inside])
+            start += len(zones.zones)
+        if world.checkpoint_zones is not None:
+            world.activated_checkpoints = {
+                checkpoint for checkpoint in world.activated_checkpoints
+                if checkpoint[0] != world.level}
+            flags = values[self.checkpoint_start:self.projectile_start]
+            world.activated_checkpoints.update(
+                (world.level, index)
+                for index, activated in enumerate(flags) if activated)
+
+        # Projectiles: the pool back in its old order, and the live
+        # ones' state (the pool may have grown since, in which case the
+        # newer projectiles are reused last)
+        pool = world.projectiles
+        live = []
+        free = []
+        for index in range(
+                (len(values) - self.projectile_start) // self.slot_words):
+            start = self.projectile_start + index * self.slot_words
+            (place, kind_id, facing, x, y, change_x, front_x, front_y,
+             timer, flicker_timer, frame,
+             hits_left) = values[start:start + PROJECTILE_WORDS]
+            projectile = pool.projectiles[index]
+            if place < 0:
+                free.append((-place, projectile))
+                continue
+            live.append((place, projectile))
+            kind = self.kinds[int(kind_id)]
+            projectile.kind = kind
+            projectile.frames = kind.textures[
+                "right" if facing > 0 else "left"]
+            projectile.frame = int(frame)
+            projectile.texture = projectile.frames[projectile.frame]
+            projectile.scale = kind.scale
+            projectile.center_x = x
+            projectile.center_y = y
+            projectile.change_x = change_x
+            projectile.change_y = 0
+            projectile.front_x = front_x
+            projectile.front_y = front_y
+            projectile.timer = timer
+            projectile.flicker_timer = flicker_timer
+            projectile.hits_left = int(hits_left)
+            hits_start = start + PROJECTILE_WORDS
+            projectile.enemies_hit = {
+                self.enemy_sprites[int(serial)] for serial
+                in values[hits_start:hits_start + kind.pierce - int(
+                    hits_left)]}
+        newer = pool.projectiles[len(live) + len(free):]
+        pool.rearrange([projectile for _, projectile in sorted(live)],
+                       newer + [projectile for _, projectile
+                                in sorted(free)])
+
+        # Views and derived state follow the restored player
+        world.camera_position = sprite.position
+        world.view_rect = world.camera_view_rect()
+        if world.streamer:
+            world.streamer.update(*world.view_rect)
+        region = world.enemy_sync_region()
+        manager.activate(*region)
+        manager.sync(*region)
+        world.enemy_grid.rebuild(manager, *region)
+
+    def average_capture_us(self):
+        """
+        Return the average time a capture has taken, in microseconds.
+        """
+        return self.capture_time / max(self.captures, 1) * 1e6
+
+    def capture_percentile_us(self, percent):
+        """
+        Return a percentile of the recent delta (non-keyframe) capture
+        times, in microseconds (0 before any).
+        """
+        if not self.delta_times:
+            return 0.0
+        return float(np.percentile(self.delta_times, percent)) * 1e6
+
+    def capture_text(self):
+        """
+        Return a one-line summary of the capture cost, for display.
+        """
+        return (f"rewind capture: avg {self.average_capture_us():.1f} us, "
+                f"p99 {self.capture_percentile_us(99):.1f} us, "
+                f"keyframe max {self.keyframe_max * 1e6:.1f} us "
+                f"(budget {CAPTURE_BUDGET_US}/{CAPTURE_PEAK_US} us)")
+
+    def status_text(self):
+        """
+        Return a one-line summary of the stored history, for display.
+        """
+        return (f"rewind: {self.frames_available()} frames, "
+                f"{len(self.keyframes)} keyframes, "
+                f"{self.stored_bytes / 1048576:.2f} MB")
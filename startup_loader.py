@@ -0,0 +1,169 @@
+"""
+Staged Loading and Startup Profiling
+
+Loading a level is written as a generator of stages: it yields a
+(category, label) pair before each stage, and returns its result when
+done. StagedLoader runs such a generator either all at once (finish())
+or a time budget's worth of stages per frame (advance()), so a window
+can keep drawing a loading screen while the level is built, and times
+every stage into a StartupProfile.
+
+Categories group the stages for the --profile-startup breakdown:
+"asset load", "tilemap parse", "scene build" and "physics setup".
+"""
+
+import time
+
+# Order the categories are reported in
+STARTUP_CATEGORIES = ("asset load", "tilemap parse", "scene build",
+                      "physics setup")
+
+
+class StartupProfile:
+    """
+    Durations of the steps of one startup, in milliseconds.
+    """
+
+    def __init__(self):
+        """
+        Create an empty profile.
+        """
+        # (name, milliseconds) of steps outside the staged loader,
+        # e.g. imports and opening the window, in order
+        self.phases = []
+        # (category, label, milliseconds) of every loading stage
+        self.stages = []
+        # Milliseconds from process start to named moments (e.g. the
+        # first loading frame), in order
+        self.marks = []
+
+    def add_phase(self, name, milliseconds):
+        """
+        Record a step that ran outside the staged loader.
+        """
+        self.phases.append((name, milliseconds))
+
+    def add_stage(self, category, label, milliseconds):
+        """
+        Record a loading stage.
+        """
+        self.stages.append((category, label, milliseconds))
+
+    def mark(self, name, milliseconds):
+        """
+        Record when something happened, counted from process start.
+        """
+        self.marks.append((name, milliseconds))
+
+    def category_ms(self, category):
+        """
+        Return the total time of a category's stages.
+        """
+        return sum(ms for stage_category, _, ms in self.stages
+                   if stage_category == category)
+
+    def report(self):
+        """
+        Return the breakdown as text lines: the phases, then each
+        category's total followed by its stages, then the marks.
+        """
+        lines = ["Startup profile:"]
+        for name, milliseconds in self.phases:
+            lines.append(f"  {name:<32} {milliseconds:9.1f} ms")
+        categories = list(STARTUP_CATEGORIES) + [
+            category for category, _, _ in self.stages
+            if category not in STARTUP_CATEGORIES]
+        for category in dict.fromkeys(categories):
+            stages = [(label, ms) for stage_category, label, ms
+                      in self.stages if stage_category == category]
+            if not stages:
+                continue
+            lines.append(f"  {category:<32} "
+                         f"{self.category_ms(category):9.1f} ms")
+            for label, milliseconds in stages:
+                lines.append(f"    {label:<30} {milliseconds:9.1f} ms")
+        total = (sum(ms for _, ms in self.phases) +
+                 sum(ms for _, _, ms in self.stages))
+        lines.append(f"  {'total':<32} {total:9.1f} ms")
+        for name, milliseconds in self.marks:
+            lines.append(f"  {name + ' at':<32} {milliseconds:9.1f} ms")
+        return lines
+
+
+class StagedLoader:
+    """
+    Runs a staged loading generator, timing each stage.
+    """
+
+    def __init__(self, steps, stage_count=0, profile=None):
+        """
+        Wrap a generator of (category, label) stages. stage_count is
+        how many stages it is expected to yield (for progress only).
+        """
+        self.steps = steps
+        self.stage_count = stage_count
+        self.profile = profile
+        # The stage the next call runs, None before the first one
+        self.current = None
+        self.label = "Starting"
+        self.finished_stages = 0
+        self.done = False
+        self.result = None
+
+    @property
+    def progress(self):
+        """
+        Return the fraction of the expected stages finished, 0 to 1.
+        """
+        if self.done:
+            return 1.0
+        if not self.stage_count:
+            return 0.0
+        return min(self.finished_stages / self.stage_count, 1.0)
+
+    def _run_stage(self):
+        """
+        Run the current stage, up to the generator's next yield.
+        """
+        start = time.perf_counter()
+        try:
+            stage = next(self.steps)
+        except StopIteration as finished:
+            stage = None
+            self.done = True
+            self.result = finished.value
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if self.current is not None:
+            self.finished_stages += 1
+            if self.profile is not None:
+                self.profile.add_stage(*self.current, elapsed_ms)
+        self.current = stage
+        if stage is not None:
+            self.label = stage[1]
+
+    def advance(self, budget_ms):
+        """
+        Run stages until budget_ms has passed (at least one stage, and
+        never part of one). Returns True once loading is done.
+        """
+        start = time.perf_counter()
+        while not self.done:
+            self._run_stage()
+            if (time.perf_counter() - start) * 1000 >= budget_ms:
+                break
+        return self.done
+
+    def finish(self):
+        """
+        Run every remaining stage and return the generator's result.
+        """
+        while not self.done:
+            self._run_stage()
+        return self.result
+
+
+def run_steps(steps):
+    """
+    Run a staged loading generator to the end and return its result.
+    """
+    return StagedLoader(steps).finish()
@@ -0,0 +1,14 @@
+"""
+Shared test setup: the game's modules live at the top of the
+repository, one directory up from the tests. Without a display,
+windows are opened headless (before anything imports arcade).
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+if not os.environ.get("DISPLAY"):
+    os.environ.setdefault("ARCADE_HEADLESS", "1")
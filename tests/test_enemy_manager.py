@@ -0,0 +1,102 @@
+"""
+Tests for the closed-form patrol of sleeping enemies.
+"""
+
+import arcade
+import pytest
+
+from enemy_manager import EnemyManager, patrol_advance
+from game import LEVEL_ENEMIES
+
+# (position, velocity, low, high) of one patrol axis. Speeds and
+# bounds are exact in binary floating point, as every LEVEL_ENEMIES
+# entry's are, so repeated adding and the closed form agree exactly.
+PATROLS = [
+    (100, 2, 50, 150),
+    (100, -3, 50, 150),
+    (0.5, 0.25, 0, 1.75),
+    (300, 0.5, 200, 400),
+    # Starting beyond a bound, moving away from or towards it
+    (200, 4, 0, 100),
+    (-50, -2, 0, 100),
+    (0, 5, 10, 12),
+    # Bounds closer together than one step, or equal
+    (5, 7, 3, 6),
+    (600, 1, 600, 600),
+    # Not moving
+    (42, 0, 0, 100),
+]
+
+
+def stepped_patrol(position, velocity, low, high, steps):
+    """
+    Step a one-enemy EnemyManager patrolling the x axis and return its
+    (position, velocity) after each frame.
+    """
+    manager = EnemyManager(arcade.SpriteList())
+    manager.add(arcade.SpriteSolidColor(10, 10), position, 0, low, high,
+                0, 0, velocity, 0, 1)
+    states = []
+    for _ in range(steps):
+        manager.update(1 / 60)
+        states.append((float(manager.position[0, 0]),
+                       float(manager.velocity[0, 0])))
+    return states
+
+
+@pytest.mark.parametrize("position, velocity, low, high", PATROLS)
+def test_patrol_advance_matches_stepping(position, velocity, low, high):
+    """
+    patrol_advance(t) gives the same position and velocity as t
+    updates, for every t.
+    """
+    states = stepped_patrol(position, velocity, low, high, 600)
+    for steps, state in enumerate(states, 1):
+        assert patrol_advance(position, velocity, low, high,
+                              steps) == state, steps
+
+
+def test_patrol_advance_matches_stepping_level_enemies():
+    """
+    The same holds for both axes of every enemy in the levels.
+    """
+    for configs in LEVEL_ENEMIES.values():
+        for (_, x, y, left, right, bottom, top, speed_x,
+             speed_y) in configs:
+            for axis in ((x, speed_x, left, right),
+                         (y, speed_y, bottom, top)):
+                states = stepped_patrol(*axis, 2000)
+                assert patrol_advance(*axis, 2000) == states[-1], axis
+
+
+def test_patrol_advance_without_steps():
+    """
+    Zero steps leave the patrol where it is.
+    """
+    assert patrol_advance(100, -3, 50, 150, 0) == (100, -3)
+
+
+def test_woken_enemy_continues_its_patrol():
+    """
+    An enemy put to sleep and woken later is where it would be had it
+    stayed awake.
+    """
+    managers = []
+    for _ in range(2):
+        manager = EnemyManager(arcade.SpriteList())
+        manager.add(arcade.SpriteSolidColor(10, 10), 300, 250, 200, 400,
+                    200, 300, 3, 2, 1)
+        managers.append(manager)
+    awake, sleeper = managers
+
+    sleeper.activate(10000, 10000, 11000, 11000)
+    assert sleeper.awake_count == 0
+    for _ in range(777):
+        awake.update(1 / 60)
+        sleeper.update(1 / 60)
+    assert sleeper.motion(0) == awake.motion(0)
+
+    sleeper.activate(0, 0, 1000, 1000)
+    assert sleeper.awake_count == 1
+    assert sleeper.position[:1].tolist() == awake.position[:1].tolist()
+    assert sleeper.velocity[:1].tolist() == awake.velocity[:1].tolist()
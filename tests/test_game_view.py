@@ -0,0 +1,111 @@
+"""
+Tests that draw the game window (headless when there is no display).
+"""
+
+import arcade
+import pytest
+
+from game import GameView
+
+
+@pytest.fixture
+def view():
+    """
+    Return a hidden GameView with its first level loaded, closing it
+    afterwards.
+    """
+    try:
+        window = GameView()
+    except Exception as error:  # No display / GL context
+        pytest.skip(f"cannot open a window: {error}")
+    window.set_visible(False)
+    window.setup()
+    yield window
+    window.on_close()
+
+
+def draw_frames(window, frames, delta_time=1 / 60):
+    """
+    Update and draw the window for a number of frames.
+    """
+    for _ in range(frames):
+        window.on_update(delta_time)
+        window.on_draw()
+        window.ctx.finish()
+
+
+def test_switching_level_after_drawing(view):
+    """
+    Leaving a level whose chunks have been drawn releases them and
+    the next level draws.
+    """
+    draw_frames(view, 2)
+    view.world.switch_to_next_level()
+    assert view.world.level == 2
+    draw_frames(view, 2)
+
+
+def test_entities_are_culled_in_and_out_of_view(view):
+    """
+    Enemies, health bars and projectiles are drawn while in view and
+    dropped once the view moves away, without errors.
+    """
+    world = view.world
+    renderer = view.entity_renderer
+    draw_frames(view, 2)
+    near_start = set(renderer.enemies.sprite_list)
+    assert near_start
+    assert len(near_start) < len(world.enemies)
+
+    # A damaged enemy gets a bar; an attack adds a projectile
+    enemy = next(iter(near_start))
+    world.enemy_manager.damage(enemy.index, 1)
+    view.on_key_press(arcade.key.E, 0)
+    draw_frames(view, 3)
+    view.on_key_release(arcade.key.E, 0)
+    assert enemy in renderer.health_bars.bars
+    assert len(renderer.projectiles.sprite_list) == 1
+
+    # Far away, a different group is in view and the bar is gone
+    world.player.sprite.position = (3300, 3100)
+    draw_frames(view, 3)
+    far_away = set(renderer.enemies.sprite_list)
+    assert far_away and not far_away & near_start
+    assert not renderer.health_bars.bars
+
+    # Back at the start, the first group is shown again
+    world.player.sprite.position = (300, 300)
+    draw_frames(view, 3)
+    assert set(renderer.enemies.sprite_list) == near_start
+    assert enemy in renderer.health_bars.bars
+
+
+def test_hud_draws_through_state_changes(view):
+    """
+    The HUD draws with and without the instructions, as health changes,
+    under the frame timing overlay and on the victory screen.
+    """
+    world = view.world
+    hud = view.hud
+    draw_frames(view, 2)
+    assert hud.instructions_visible
+    assert all(heart.visible for heart in hud.full_hearts)
+
+    # (away from the starting checkpoint, which heals the player)
+    world.player.sprite.position = (300, 300)
+    draw_frames(view, 2)
+    world.player.health -= 1
+    draw_frames(view, 1)
+    assert hud.full_hearts[-1].visible is False
+    assert hud.empty_hearts[-1].visible is True
+
+    view.on_key_press(arcade.key.I, 0)
+    view.on_key_press(arcade.key.F3, 0)
+    draw_frames(view, 2)
+    assert not hud.instructions_visible
+    assert not hud.panel.visible
+
+    # (as on_update does after the winning step)
+    world.game_won = True
+    hud.set_won(True)
+    draw_frames(view, 2)
@@ -0,0 +1,79 @@
+"""
+Tests for the greedy merging of solid tiles into rectangles.
+"""
+
+import random
+
+import pytest
+
+from tile_collision import greedy_merge
+
+
+def random_mask(width, height, density, seed):
+    """
+    Return a mask with roughly density of its cells solid.
+    """
+    rng = random.Random(seed)
+    return bytearray(1 if rng.random() < density else 0
+                     for _ in range(width * height))
+
+
+def coverage(rectangles, width, height):
+    """
+    Return how many rectangles cover each cell (row-major, top row
+    first, like the mask).
+    """
+    counts = [0] * (width * height)
+    for column, row, columns, rows in rectangles:
+        assert columns > 0 and rows > 0
+        assert 0 <= column and column + columns <= width
+        assert 0 <= row and row + rows <= height
+        for covered_row in range(row, row + rows):
+            start = covered_row * width + column
+            for index in range(start, start + columns):
+                counts[index] += 1
+    return counts
+
+
+MASKS = [
+    ("empty", bytearray(12), 4, 3),
+    ("full", bytearray([1] * 12), 4, 3),
+    ("checkerboard", bytearray((column + row) % 2
+                               for row in range(5) for column in range(6)),
+     6, 5),
+    ("l shape", bytearray([1, 0, 0,
+                           1, 0, 0,
+                           1, 1, 1]), 3, 3),
+    ("single row", bytearray([0, 1, 1, 0, 1, 1, 1]), 7, 1),
+    ("single column", bytearray([1, 1, 0, 1]), 1, 4),
+] + [(f"random {seed}", random_mask(40, 30, density, seed), 40, 30)
+     for seed, density in enumerate((0.2, 0.5, 0.8, 0.95))]
+
+
+@pytest.mark.parametrize("name, mask, width, height", MASKS,
+                         ids=[case[0] for case in MASKS])
+def test_rectangles_cover_exactly_the_solid_cells(name, mask, width,
+                                                  height):
+    """
+    Every solid cell is covered by exactly one rectangle and no empty
+    cell by any.
+    """
+    rectangles = greedy_merge(mask, width, height)
+    assert coverage(rectangles, width, height) == list(mask)
+
+
+def test_mask_is_not_modified():
+    """
+    Merging works on a copy of the mask.
+    """
+    mask = random_mask(20, 20, 0.6, 7)
+    original = bytes(mask)
+    greedy_merge(mask, 20, 20)
+    assert bytes(mask) == original
+
+
+def test_solid_block_merges_into_one_rectangle():
+    """
+    A fully solid mask is a single rectangle over the whole grid.
+    """
+    assert greedy_merge(bytearray([1] * 12), 4, 3) == [(0, 0, 4, 3)]
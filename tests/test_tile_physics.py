@@ -0,0 +1,114 @@
+"""
+Tests for the swept tile-grid platformer physics engine.
+"""
+
+from array import array
+
+import arcade
+
+from level_cache import LevelData
+from tile_physics import TileGridPhysicsEngine
+from tile_query import TileLayerGrid
+
+TILE_SIZE = 32
+
+
+def make_grid(rows):
+    """
+    Return a TileLayerGrid from rows of text, top row first, where
+    "#" is a solid tile.
+    """
+    level = LevelData("test.tmx", len(rows[0]), len(rows), TILE_SIZE,
+                      TILE_SIZE)
+    level.tiles = {1: ("tile.png", 0, 0, TILE_SIZE, TILE_SIZE)}
+    level.add_layer("Platforms", array(
+        "I", [1 if cell == "#" else 0 for row in rows for cell in row]))
+    return TileLayerGrid(level, "Platforms", with_shapes=False)
+
+
+def make_player(center_x, center_y):
+    """
+    Return a player-sized sprite at a position.
+    """
+    sprite = arcade.SpriteSolidColor(20, 40)
+    sprite.position = (center_x, center_y)
+    return sprite
+
+
+def test_falling_player_lands_on_the_floor():
+    """
+    Gravity pulls the player down until it rests on the floor's top
+    edge, where it can jump.
+    """
+    grid = make_grid(["......"] * 7 + ["######"])
+    player = make_player(96, 200)
+    engine = TileGridPhysicsEngine(player, grid, gravity_constant=1)
+    for _ in range(60):
+        engine.update()
+    assert player.bottom == TILE_SIZE
+    assert player.change_y == 0
+    assert engine.can_jump()
+
+
+def test_fast_fall_does_not_tunnel_through_a_thin_floor():
+    """
+    A fall many tiles long in one update stops at a one tile thick
+    floor instead of passing through it.
+    """
+    grid = make_grid(["........."] * 27 + ["#######.."] + ["........."] * 2)
+    player = make_player(96, 3 * TILE_SIZE + 400 + 20)
+    player.change_y = -500
+    engine = TileGridPhysicsEngine(player, grid, gravity_constant=0.5)
+    hits = engine.update()
+    assert player.bottom == 3 * TILE_SIZE
+    assert player.change_y == 0
+    assert hits == [(2, 2)]
+
+
+def test_fast_dash_does_not_tunnel_through_a_thin_wall():
+    """
+    A horizontal move many tiles long in one update stops at a one
+    tile wide wall, from either side.
+    """
+    rows = ["..............#..............."] * 8
+    wall_left = 14 * TILE_SIZE
+    wall_right = 15 * TILE_SIZE
+
+    player = make_player(wall_left - 300, 100)
+    player.change_x = 400
+    engine = TileGridPhysicsEngine(player, make_grid(rows),
+                                   gravity_constant=0)
+    assert engine.update() == [(14, 2)]
+    assert player.right == wall_left
+
+    player = make_player(wall_right + 300, 100)
+    player.change_x = -400
+    engine = TileGridPhysicsEngine(player, make_grid(rows),
+                                   gravity_constant=0)
+    assert engine.update() == [(14, 2)]
+    assert player.left == wall_right
+
+
+def test_moves_freely_without_walls():
+    """
+    With nothing in the way the player moves by its full velocity.
+    """
+    grid = make_grid(["........"] * 8)
+    player = make_player(100, 150)
+    player.change_x = 7
+    player.change_y = 5
+    engine = TileGridPhysicsEngine(player, grid, gravity_constant=1)
+    assert engine.update() == []
+    assert player.position == (107, 154)
+
+
+def test_embedded_player_is_pushed_out():
+    """
+    A player overlapping solid tiles is moved to the nearest free
+    spot (up, on ties) before it moves.
+    """
+    grid = make_grid(["......"] * 6 + ["######"] * 2)
+    player = make_player(96, TILE_SIZE + 10)
+    engine = TileGridPhysicsEngine(player, grid, gravity_constant=0)
+    engine.update()
+    assert player.bottom == 2 * TILE_SIZE
@@ -0,0 +1,97 @@
+"""
+Merged Tile Collision Geometry
+
+Collapses a solid tile layer into a small set of axis-aligned
+rectangles using greedy meshing over the tile grid. The rectangles are
+used as collision geometry for the physics engine and wall checks,
+while the per-tile sprites are only used for drawing.
+"""
+
+import time
+
+import arcade
+
+
+def solid_mask(level, layer_name):
+    """
+    Return a bytearray with 1 for every non-empty cell of a layer
+    (row-major, top row first).
+    """
+    grid = level.layers[layer_name]
+    return bytearray(1 if gid else 0 for gid in grid)
+
+
+def greedy_merge(mask, width, height):
+    """
+    Merge the solid cells of a mask into rectangles.
+
+    Each rectangle is grown as wide as possible along its first row and
+    then extended downwards while the full span stays solid. Returns a
+    list of (column, row, columns, rows) tuples with row 0 at the top.
+    The mask is not modified.
+    """
+    remaining = bytearray(mask)
+    rectangles = []
+
+    for row in range(height):
+        row_start = row * width
+        row_end = row_start + width
+        column_index = remaining.find(1, row_start, row_end)
+
+        while column_index != -1:
+            # Grow to the right along this row
+            span_end = remaining.find(0, column_index, row_end)
+            if span_end == -1:
+                span_end = row_end
+            span = span_end - column_index
+            full_span = b"\x01" * span
+
+            # Grow downwards while the whole span is still solid
+            rows = 1
+            below = column_index + width
+            while (row + rows < height and
+                   remaining[below:below + span] == full_span):
+                rows += 1
+                below += width
+
+            # Clear the merged cells so they are not used again
+            empty_span = bytes(span)
+            for covered in range(rows):
+                start = column_index + covered * width
+                remaining[start:start + span] = empty_span
+
+            rectangles.append((column_index - row_start, row, span, rows))
+            column_index = remaining.find(1, span_end, row_end)
+
+    return rectangles
+
+
+def build_collision_list(level, layer_name, scaling=1, lazy=False):
+    """
+    Build a spatially hashed sprite list of merged collision rectangles
+    for a tile layer (lazy=True defers OpenGL setup, for building off
+    the main thread).
+    Returns (sprite_list, stats) where stats holds the tile and
+    rectangle counts and the time taken in milliseconds.
+    """
+    start = time.perf_counter()
+    tile_width = level.tile_width * scaling
+    tile_height = level.tile_height * scaling
+    mask = solid_mask(level, layer_name)
+    rectangles = greedy_merge(mask, level.width, level.height)
+
+    walls = arcade.SpriteList(use_spatial_hash=True, lazy=lazy)
+    for column, row, columns, rows in rectangles:
+        wall = arcade.SpriteSolidColor(
+            columns * tile_width, rows * tile_height,
+            color=(0, 0, 0, 0))
+        wall.left = column * tile_width
+        wall.top = (level.height - row) * tile_height
+        walls.append(wall)
+
+    stats = {
+        "tiles": mask.count(1),
+        "rectangles": len(rectangles),
+        "ms": (time.perf_counter() - start) * 1000,
+    }
+    return walls, stats
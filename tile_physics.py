@@ -0,0 +1,211 @@
+"""
+Tile-Grid Platformer Physics
+
+A platformer physics engine that resolves the player directly against
+a level's solid tile grid (a TileLayerGrid) instead of a sprite list.
+Every wall lookup is an O(1) cell index, and movement is swept along
+each axis through every cell the leading edge of the hit box crosses,
+so a fast mover (such as the archer's dash) cannot tunnel through a
+tile however far it moves in one update.
+
+It can be used in place of ``arcade.PhysicsEnginePlatformer`` for the
+parts of that API the game uses: ``update()``, ``can_jump()``,
+``gravity_constant`` and ``player_sprite``.
+"""
+
+import math
+
+# Tolerance so that touching a tile edge does not count as overlapping
+EDGE_EPSILON = 1e-6
+
+
+class TileGridPhysicsEngine:
+    """
+    Gravity and wall collision for a single player sprite against a
+    grid of solid tiles. Cells outside the map are never solid.
+    """
+
+    def __init__(self, player_sprite, grid, gravity_constant=0.5):
+        """
+        Collide against the non-empty cells of a TileLayerGrid.
+        """
+        self.player_sprite = player_sprite
+        self.gravity_constant = gravity_constant
+        self.grid = grid
+        self.tile_width = grid.tile_width
+        self.tile_height = grid.tile_height
+        # Rows count up from the bottom of the map
+        self.is_solid = grid.is_solid
+
+    def _column_range(self, left, right):
+        """
+        Return the columns overlapped by a horizontal span.
+        """
+        return range(math.floor((left + EDGE_EPSILON) / self.tile_width),
+                     math.floor((right - EDGE_EPSILON) / self.tile_width)
+                     + 1)
+
+    def _row_range(self, bottom, top):
+        """
+        Return the rows overlapped by a vertical span.
+        """
+        return range(math.floor((bottom + EDGE_EPSILON) / self.tile_height),
+                     math.floor((top - EDGE_EPSILON) / self.tile_height)
+                     + 1)
+
+    def _solid_in_row(self, row, columns):
+        """
+        Return the first solid cell among the given columns of a row,
+        or None.
+        """
+        for column in columns:
+            if self.is_solid(column, row):
+                return column, row
+        return None
+
+    def _solid_in_column(self, column, rows):
+        """
+        Return the first solid cell among the given rows of a column,
+        or None.
+        """
+        for row in rows:
+            if self.is_solid(column, row):
+                return column, row
+        return None
+
+    def overlaps_solid(self, left, bottom, right, top):
+        """
+        Return True if a world-space rectangle overlaps a solid cell.
+        """
+        columns = self._column_range(left, right)
+        return any(self._solid_in_row(row, columns) is not None
+                   for row in self._row_range(bottom, top))
+
+    def _free_if_embedded(self, sprite):
+        """
+        Push the sprite out of any solid cells it already overlaps
+        (e.g. after spawning, or switching to a wider character next
+        to a wall). Tries every row/column boundary up to the sprite's
+        own size away in each direction and takes the nearest free one,
+        preferring up, then right, left and down on ties.
+        """
+        left, bottom, right, top = (sprite.left, sprite.bottom,
+                                    sprite.right, sprite.top)
+        if not self.overlaps_solid(left, bottom, right, top):
+            return
+
+        candidates = []
+        for offset in range(1, math.ceil(sprite.height /
+                                         self.tile_height) + 2):
+            up = ((math.floor(bottom / self.tile_height) + offset) *
+                  self.tile_height - bottom)
+            down = ((math.ceil(top / self.tile_height) - offset) *
+                    self.tile_height - top)
+            candidates.append((abs(up), 0, 0, up))
+            candidates.append((abs(down), 3, 0, down))
+        for offset in range(1, math.ceil(sprite.width /
+                                         self.tile_width) + 2):
+            push_right = ((math.floor(left / self.tile_width) + offset) *
+                          self.tile_width - left)
+            push_left = ((math.ceil(right / self.tile_width) - offset) *
+                         self.tile_width - right)
+            candidates.append((abs(push_right), 1, push_right, 0))
+            candidates.append((abs(push_left), 2, push_left, 0))
+
+        for _, _, dx, dy in sorted(candidates):
+            if not self.overlaps_solid(left + dx, bottom + dy,
+                                       right + dx, top + dy):
+                sprite.center_x += dx
+                sprite.center_y += dy
+                return
+
+    def _move_y(self, sprite, distance, hits):
+        """
+        Sweep the sprite vertically, stopping at the first solid row
+        its leading edge reaches.
+        """
+        columns = self._column_range(sprite.left, sprite.right)
+        if distance > 0:
+            # Rows whose bottom edge is at or above the current top
+            first = math.ceil((sprite.top - EDGE_EPSILON) / self.tile_height)
+            last = math.floor((sprite.top + distance - EDGE_EPSILON) /
+                              self.tile_height)
+            for row in range(first, last + 1):
+                cell = self._solid_in_row(row, columns)
+                if cell is not None:
+                    sprite.top = row * self.tile_height
+                    hits.append(cell)
+                    return True
+        else:
+            # Rows whose top edge is at or below the current bottom
+            first = math.floor(
+                (sprite.bottom + EDGE_EPSILON) / self.tile_height) - 1
+            last = math.floor((sprite.bottom + distance + EDGE_EPSILON) /
+                              self.tile_height)
+            for row in range(first, last - 1, -1):
+                cell = self._solid_in_row(row, columns)
+                if cell is not None:
+                    sprite.bottom = (row + 1) * self.tile_height
+                    hits.append(cell)
+                    return True
+        sprite.center_y += distance
+        return False
+
+    def _move_x(self, sprite, distance, hits):
+        """
+        Sweep the sprite horizontally, stopping at the first solid
+        column its leading edge reaches.
+        """
+        rows = self._row_range(sprite.bottom, sprite.top)
+        if distance > 0:
+            first = math.ceil((sprite.right - EDGE_EPSILON) / self.tile_width)
+            last = math.floor((sprite.right + distance - EDGE_EPSILON) /
+                              self.tile_width)
+            for column in range(first, last + 1):
+                cell = self._solid_in_column(column, rows)
+                if cell is not None:
+                    sprite.right = column * self.tile_width
+                    hits.append(cell)
+                    return True
+        else:
+            first = math.floor(
+                (sprite.left + EDGE_EPSILON) / self.tile_width) - 1
+            last = math.floor((sprite.left + distance + EDGE_EPSILON) /
+                              self.tile_width)
+            for column in range(first, last - 1, -1):
+                cell = self._solid_in_column(column, rows)
+                if cell is not None:
+                    sprite.left = (column + 1) * self.tile_width
+                    hits.append(cell)
+                    return True
+        sprite.center_x += distance
+        return False
+
+    def can_jump(self, y_distance=5):
+        """
+        Return True if there is solid ground within y_distance below
+        the player.
+        """
+        sprite = self.player_sprite
+        return self.overlaps_solid(sprite.left, sprite.bottom - y_distance,
+                                   sprite.right, sprite.top - y_distance)
+
+    def update(self):
+        """
+        Apply gravity, then move the player vertically and
+        horizontally, stopping at walls.
+        Returns a list of the (column, row) cells that blocked movement.
+        """
+        sprite = self.player_sprite
+        self._free_if_embedded(sprite)
+        sprite.change_y -= self.gravity_constant
+        hits = []
+
+        # Vertical first (like arcade's engine), so landing on a
+        # ledge happens before sliding along it
+        if sprite.change_y and self._move_y(sprite, sprite.change_y, hits):
+            sprite.change_y = 0
+
+        if sprite.change_x:
+            self._move_x(sprite, sprite.change_x, hits)
+        return hits
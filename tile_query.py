@@ -0,0 +1,252 @@
+"""
+Array-Backed Tile Layer Queries
+
+Gameplay questions about static tiles (is the player touching a
+climbable wall or a hazard, which checkpoint is it standing on, is
+this point inside a wall) are answered from a compact per-layer grid
+instead of sprite collision: a uint16 array of tile GIDs plus a byte
+of Tiled flip flags per cell. A query only looks at the cells it
+touches, so its cost does not depend on how many tiles the layer has.
+
+Each distinct tile (GID and flip flags) gets one shape, taken from the
+sprite the tile map would build for it: its hit box polygon and
+bounds relative to its cell. Overlap tests use the same polygon test
+as arcade's check_for_collision(), so the answers are the ones the
+tile sprites gave.
+"""
+
+import math
+from array import array
+
+from arcade.geometry import are_polygons_intersecting
+
+from assets import ASSETS
+from level_cache import GID_MASK, build_tile_sprite
+
+# Tiled flip flags, stored per cell shifted down into one byte
+FLAG_SHIFT = 29
+
+
+class TileShape:
+    """
+    Hit box of one tile relative to the bottom-left corner of its cell.
+    """
+
+    def __init__(self, sprite, cell_left, cell_bottom):
+        """
+        Take the shape of a tile sprite built in the given cell.
+        """
+        self.points = [(x - cell_left, y - cell_bottom)
+                       for x, y in sprite.hit_box.get_adjusted_points()]
+        self.left = sprite.left - cell_left
+        self.right = sprite.right - cell_left
+        self.bottom = sprite.bottom - cell_bottom
+        self.top = sprite.top - cell_bottom
+        self.center_x = sprite.center_x - cell_left
+        self.center_y = sprite.center_y - cell_bottom
+
+
+class TileLayerGrid:
+    """
+    One tile layer as arrays, with cell and hit box queries.
+    Rows count up from the bottom of the map; cells outside the map
+    are empty.
+    """
+
+    def __init__(self, level, layer_name, scaling=1, with_shapes=True):
+        """
+        Copy a layer's GIDs and flip flags into the grid, and build
+        the shape of every distinct tile in it unless with_shapes is
+        False (they are then built on first use; layers that are only
+        asked which cells are solid never need them).
+        """
+        self.level = level
+        self.scaling = scaling
+        self.columns = level.width
+        self.rows = level.height
+        self.tile_width = level.tile_width * scaling
+        self.tile_height = level.tile_height * scaling
+
+        # Rows are flipped so row 0 is the bottom one
+        source = level.layers[layer_name]
+        width = level.width
+        cells = []
+        for row in range(level.height - 1, -1, -1):
+            cells.extend(source[row * width:(row + 1) * width].tolist())
+        masked = [gid & GID_MASK for gid in cells]
+        # GIDs wider than 16 bits (huge tilesets) need a wider array
+        typecode = "H" if max(masked, default=0) <= 0xFFFF else "I"
+        self.gids = array(typecode, masked)
+        self.flags = bytearray(gid >> FLAG_SHIFT for gid in cells)
+
+        # (GID with flags) -> TileShape, built on first use
+        self.shapes = {}
+        self.texture_manager = ASSETS.texture_manager()
+        self.textures = {}
+
+        # How many cells a tile larger than its cell can reach into
+        # neighbours to the right and above
+        largest_width = max([tile[3] for tile in level.tiles.values()] +
+                            [level.tile_width])
+        largest_height = max([tile[4] for tile in level.tiles.values()] +
+                             [level.tile_height])
+        self.reach_columns = math.ceil(largest_width / level.tile_width) - 1
+        self.reach_rows = math.ceil(largest_height / level.tile_height) - 1
+
+        if with_shapes:
+            for key in set(cells) - {0}:
+                self._build_shape(key)
+
+    def tile_at(self, column, row):
+        """
+        Return the GID (without flip flags) in a cell, 0 if empty.
+        """
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            return self.gids[row * self.columns + column]
+        return 0
+
+    def flags_at(self, column, row):
+        """
+        Return the Tiled flip flags of a cell, shifted down to the low
+        three bits (horizontal 4, vertical 2, diagonal 1).
+        """
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            return self.flags[row * self.columns + column]
+        return 0
+
+    def is_solid(self, column, row):
+        """
+        Return True if a cell holds a tile.
+        """
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            return self.gids[row * self.columns + column] != 0
+        return False
+
+    def cell_at(self, x, y):
+        """
+        Return the (column, row) of the cell containing a world point.
+        """
+        return (math.floor(x / self.tile_width),
+                math.floor(y / self.tile_height))
+
+    def shape(self, column, row):
+        """
+        Return the TileShape of the tile in a cell (which must not be
+        empty).
+        """
+        index = row * self.columns + column
+        key = self.gids[index] | self.flags[index] << FLAG_SHIFT
+        shape = self.shapes.get(key)
+        if shape is None:
+            shape = self._build_shape(key)
+        return shape
+
+    def _build_shape(self, key):
+        """
+        Build the shape of a tile (GID with flip flags) from the sprite
+        the tile map would create for it in the bottom-left cell.
+        """
+        sprite = build_tile_sprite(
+            self.level, key, 0, self.rows - 1, self.scaling,
+            self.texture_manager, self.textures)
+        shape = self.shapes[key] = TileShape(sprite, 0, 0)
+        return shape
+
+    def center_of(self, column, row):
+        """
+        Return the centre of the tile sprite in a cell.
+        """
+        shape = self.shape(column, row)
+        return (column * self.tile_width + shape.center_x,
+                row * self.tile_height + shape.center_y)
+
+    def cell_range(self, left, bottom, right, top, inclusive=False):
+        """
+        Return the (first_column, first_row, last_column, last_row) of
+        the cells whose tiles could reach a world rectangle, clipped to
+        the map. With inclusive set, cells that only touch the
+        rectangle's left or bottom edge are included too.
+        """
+        if inclusive:
+            first_column = math.ceil(left / self.tile_width) - 1
+            first_row = math.ceil(bottom / self.tile_height) - 1
+        else:
+            first_column = math.floor(left / self.tile_width)
+            first_row = math.floor(bottom / self.tile_height)
+        return (max(first_column - self.reach_columns, 0),
+                max(first_row - self.reach_rows, 0),
+                min(math.floor(right / self.tile_width), self.columns - 1),
+                min(math.floor(top / self.tile_height), self.rows - 1))
+
+    def cells_in(self, cell_range):
+        """
+        Yield the non-empty cells in a cell range, top row first and
+        left to right in each row (the order the layer's sprites were
+        built in).
+        """
+        first_column, first_row, last_column, last_row = cell_range
+        gids = self.gids
+        columns = self.columns
+        for row in range(last_row, first_row - 1, -1):
+            row_index = row * columns
+            cells = gids[row_index + first_column:row_index + last_column + 1]
+            if not any(cells):
+                continue
+            for offset, gid in enumerate(cells):
+                if gid:
+                    yield first_column + offset, row
+
+    def any_in_rect(self, left, bottom, right, top):
+        """
+        Return True if any tile's hit box bounds overlap a world
+        rectangle. Edges are inclusive, so a zero-size rectangle tests
+        a single point.
+        """
+        tile_width = self.tile_width
+        tile_height = self.tile_height
+        for column, row in self.cells_in(self.cell_range(
+                left, bottom, right, top, inclusive=True)):
+            shape = self.shape(column, row)
+            x = column * tile_width
+            y = row * tile_height
+            if (x + shape.left <= right and left <= x + shape.right and
+                    y + shape.bottom <= top and bottom <= y + shape.top):
+                return True
+        return False
+
+    def _overlapping(self, sprite):
+        """
+        Yield the cells whose tiles' hit boxes overlap a sprite's,
+        exactly as arcade.check_for_collision() decides.
+        """
+        left, bottom, right, top = (sprite.left, sprite.bottom,
+                                    sprite.right, sprite.top)
+        points = None
+        tile_width = self.tile_width
+        tile_height = self.tile_height
+        for column, row in self.cells_in(self.cell_range(
+                left, bottom, right, top)):
+            shape = self.shape(column, row)
+            x = column * tile_width
+            y = row * tile_height
+            if (x + shape.left > right or left > x + shape.right or
+                    y + shape.bottom > top or bottom > y + shape.top):
+                continue
+            if points is None:
+                points = sprite.hit_box.get_adjusted_points()
+            if are_polygons_intersecting(
+                    points, [(px + x, py + y) for px, py in shape.points]):
+                yield column, row
+
+    def cells_overlapping(self, sprite):
+        """
+        Return the (column, row) of every tile whose hit box overlaps a
+        sprite's, in the layer's sprite order.
+        """
+        return list(self._overlapping(sprite))
+
+    def overlaps(self, sprite):
+        """
+        Return True if any tile's hit box overlaps a sprite's.
+        """
+        return next(self._overlapping(sprite), None) is not None
@@ -0,0 +1,172 @@
+"""
+Edge-Triggered Trigger Zones
+
+Checkpoints, exits and hazards are trigger zones: connected groups of
+tiles in one map layer, found once when the level loads. Instead of
+every gameplay check testing the player against its layer each step,
+a TriggerZones set tracks which zones the player is inside and calls
+handlers when that changes:
+
+    on_enter(zones)   zones the player has just entered
+    on_stay(zones)    every zone the player is inside, every update
+                      (the entering one included)
+    on_exit(zones)    zones the player has just left
+
+Each handler is called at most once per update, with a list of zones
+in the layer's sprite order, and only when the list is not empty.
+
+The exact hit box test only runs when it could change the answer:
+while the player's sprite, position, texture, scale and angle stay
+the same the last result is reused, and while the cells its hit box
+could reach hold no trigger tiles there is nothing to test. So a
+player standing still, or moving around away from any zone, costs a
+tuple comparison or two per update.
+"""
+
+import math
+
+
+class TriggerZone:
+    """
+    One connected group of tiles in a trigger layer.
+    """
+
+    def __init__(self, index, cells, grid):
+        """
+        Create zone number index from its (column, row) cells, which
+        are given in the layer's sprite order.
+        """
+        self.index = index
+        self.cells = cells
+        # Centre of the zone's tile sprites (a single tile's own centre)
+        centers = [grid.center_of(column, row) for column, row in cells]
+        xs = [x for x, _ in centers]
+        ys = [y for _, y in centers]
+        self.center_x = (min(xs) + max(xs)) / 2
+        self.center_y = (min(ys) + max(ys)) / 2
+
+    def __repr__(self):
+        return (f"TriggerZone({self.index}, {len(self.cells)} cells, "
+                f"center=({self.center_x}, {self.center_y}))")
+
+
+class TriggerZones:
+    """
+    The trigger zones of one tile layer and the handlers for entering,
+    staying in and leaving them. Call update() with the player's sprite
+    at the point in the step where the layer should be checked.
+    """
+
+    def __init__(self, grid, on_enter=None, on_stay=None, on_exit=None):
+        """
+        Find the zones (4-connected groups of tiles) of a TileLayerGrid.
+        """
+        self.grid = grid
+        self.on_enter = on_enter
+        self.on_stay = on_stay
+        self.on_exit = on_exit
+
+        # Flood fill every group of tiles into a zone, numbering zones
+        # (and listing their cells) in the layer's sprite order
+        columns = grid.columns
+        all_cells = list(grid.cells_in((0, 0, columns - 1, grid.rows - 1)))
+        # Cell index -> zone
+        self.zone_at = {}
+        self.zones = []
+        seen = set()
+        for start in all_cells:
+            if start in seen:
+                continue
+            seen.add(start)
+            group = []
+            stack = [start]
+            while stack:
+                column, row = stack.pop()
+                group.append((column, row))
+                for neighbour in ((column - 1, row), (column + 1, row),
+                                  (column, row - 1), (column, row + 1)):
+                    if (neighbour not in seen and
+                            grid.is_solid(*neighbour)):
+                        seen.add(neighbour)
+                        stack.append(neighbour)
+            group.sort(key=lambda cell: (-cell[1], cell[0]))
+            zone = TriggerZone(len(self.zones), group, grid)
+            self.zones.append(zone)
+            for column, row in group:
+                self.zone_at[row * columns + column] = zone
+
+        # Zones the player is inside, in order
+        self.inside = []
+        # What the last update saw: the sprite's state, the range of
+        # cells it could reach and whether that range holds any tiles
+        self.last_state = None
+        self.last_range = None
+        self.near_tiles = False
+
+        # How many updates ran the exact hit box test (for profiling)
+        self.updates = 0
+        self.exact_tests = 0
+
+    def zones_touching(self, sprite):
+        """
+        Return the zones whose tiles' hit boxes overlap a sprite's, in
+        the layer's sprite order.
+        """
+        grid = self.grid
+        # A sprite's hit box lies inside its texture's rectangle (or the
+        # circle around it, once rotated), which is much cheaper to get
+        # than the hit box's own bounds
+        half_width = sprite.width / 2
+        half_height = sprite.height / 2
+        if sprite.angle:
+            half_width = half_height = math.hypot(half_width, half_height)
+        x, y = sprite.position
+        cell_range = grid.cell_range(x - half_width, y - half_height,
+                                     x + half_width, y + half_height)
+        if cell_range != self.last_range:
+            self.last_range = cell_range
+            self.near_tiles = next(grid.cells_in(cell_range),
+                                   None) is not None
+        if not self.near_tiles:
+            return []
+
+        self.exact_tests += 1
+        columns = grid.columns
+        zones = []
+        for column, row in grid.cells_overlapping(sprite):
+            zone = self.zone_at[row * columns + column]
+            if zone not in zones:
+                zones.append(zone)
+        return zones
+
+    def update(self, sprite):
+        """
+        Work out which zones a sprite is inside and call the handlers:
+        on_exit, then on_enter, then on_stay.
+        """
+        self.updates += 1
+        state = (sprite, sprite.position, sprite.texture, sprite.scale,
+                 sprite.angle)
+        if state != self.last_state:
+            self.last_state = state
+            current = self.zones_touching(sprite)
+            exited = [zone for zone in self.inside if zone not in current]
+            entered = [zone for zone in current if zone not in self.inside]
+            self.inside = current
+            if exited and self.on_exit:
+                self.on_exit(exited)
+            if entered and self.on_enter:
+                self.on_enter(entered)
+        if self.inside and self.on_stay:
+            self.on_stay(self.inside)
+
+    def restore(self, indices):
+        """
+        Set the zones the player is inside (by index, e.g. from a
+        rewind snapshot) without calling any handler. The next update()
+        works out the player's zones afresh and compares them with
+        these.
+        """
+        self.inside = [self.zones[index] for index in indices]
+        self.last_state = None
+